@@ -0,0 +1,130 @@
+"""Benchmark: answer-cache hits versus misses on first-turn questions.
+
+Runs every first-turn message of ``bench_graph.CORPUS`` twice through
+``answer_cache.cached_ainvoke`` (offline fakes, ``--ttft-ms`` to the first
+token, ``--kb-ms`` per Knowledge Base call, retrieval cache off): the first
+call must be a miss that runs the graph, the second a hit served from the
+cache. Both are checked through the ``response_metadata["answer_cache"]``
+marker of the last message.
+
+It also asks question pairs that differ only in word or number order
+("20 micras con gramaje 30" / "30 micras con gramaje 20"); the second of
+each pair must miss, since it is a different question.
+
+Reports miss and hit p50/p95 latency and the hit speedup; exits non-zero if
+any marker is wrong.
+
+Usage:
+    python benchmarks/bench_answer_cache.py [--ttft-ms 300] [--kb-ms 150] [--json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+os.environ["KB_CACHE_TTL"] = "0"
+
+from bench_graph import CORPUS, percentiles  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import dynamo  # noqa: E402
+import tools  # noqa: E402
+from answer_cache import AnswerCache, cached_ainvoke, configure_answer_cache  # noqa: E402
+from catalog import disable_catalog  # noqa: E402
+from fakes import FakeKnowledgeBaseRetriever, fake_model_factory  # noqa: E402
+from local_dynamo import LocalDynamoResource, load_sample_items  # noqa: E402
+from models import registry  # noqa: E402
+
+ORDER_PAIRS = [
+    ("película de 20 micras con gramaje 30", "película de 30 micras con gramaje 20"),
+    ("bolsas para pan sin grasa", "bolsas para grasa sin pan"),
+]
+
+
+def setup(args) -> AnswerCache:
+    items = load_sample_items()
+    resource = LocalDynamoResource(latency=args.dynamo_ms / 1000)
+    table = resource.Table(dynamo.TABLE_NAME)
+    for item in items:
+        table.items[item["id"]] = item
+    dynamo.set_dynamodb(resource)
+    disable_catalog()
+    registry.set_factory(fake_model_factory(first_token_delay=args.ttft_ms / 1000, token_delay=args.token_ms / 1000))
+    tools.set_kb_retriever(FakeKnowledgeBaseRetriever.from_items(items, latency=args.kb_ms / 1000))
+    cache = AnswerCache()
+    configure_answer_cache(cache)
+    return cache
+
+
+async def ask(question: str) -> tuple[float, dict]:
+    """Return the latency of one first-turn call and its ``answer_cache`` marker."""
+    start = time.perf_counter()
+    output = await cached_ainvoke({"messages": [HumanMessage(content=question)]})
+    elapsed = time.perf_counter() - start
+    return elapsed, output["messages"][-1].response_metadata.get("answer_cache") or {}
+
+
+async def run(args):
+    cache = setup(args)
+    misses, hits, failures = [], [], []
+    questions = [text for text, has_history, _ in CORPUS if not has_history]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for question in questions:
+            for expected, samples in ((False, misses), (True, hits)):
+                elapsed, marker = await ask(question)
+                samples.append(elapsed)
+                if marker.get("hit") is not expected:
+                    failures.append(f"{question!r}: expected hit={expected}, marker {marker}")
+        for first, second in ORDER_PAIRS:
+            await ask(first)
+            _, marker = await ask(second)
+            if marker.get("hit") is not False:
+                failures.append(f"{second!r} was served the answer to {first!r}")
+
+    miss, hit = percentiles(misses), percentiles(hits)
+    return {
+        "ttft_ms": args.ttft_ms,
+        "kb_ms": args.kb_ms,
+        "questions": len(questions),
+        "miss": miss,
+        "hit": hit,
+        "speedup_p50": round(miss["p50_ms"] / hit["p50_ms"], 1) if hit["p50_ms"] else None,
+        "cache": cache.stats(),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ttft-ms", type=float, default=300, help="Fake model time to first token")
+    parser.add_argument("--token-ms", type=float, default=2)
+    parser.add_argument("--kb-ms", type=float, default=150, help="Knowledge Base latency per retrieval")
+    parser.add_argument("--dynamo-ms", type=float, default=10, help="DynamoDB latency per request")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+    else:
+        print(f"{result['questions']} first-turn questions, ttft {result['ttft_ms']} ms, KB {result['kb_ms']} ms")
+        for name in ("miss", "hit"):
+            r = result[name]
+            print(f"  {name:5} p50 {r['p50_ms']:>9} ms  p95 {r['p95_ms']:>9} ms")
+        print(f"  hit speedup (p50): {result['speedup_p50']}x  cache: {result['cache']}")
+        for failure in result["failures"]:
+            print(f"  FAIL {failure}")
+    if result["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Benchmark: batch runs against a throttling backend, fixed versus adaptive concurrency.
+
+Runs ``batch.run_batch`` over ``--questions`` messages through the compiled
+graph (offline fakes with ``--ttft-ms`` / ``--token-ms``) behind a
+simulated Bedrock quota: when more than ``--capacity`` calls are in flight
+the extra ones fail after ``--reject-ms`` with a botocore
+``ThrottlingException``, as Bedrock does.
+
+* ``fixed``: ``--concurrency`` calls at all times (the limiter cannot move);
+* ``adaptive``: the default AIMD limiter starting at ``--concurrency``.
+
+Both retry throttled questions with the same backoff. Reports throughput,
+throttled attempts, error rate, final concurrency and latency percentiles.
+
+Usage:
+    python benchmarks/bench_batch.py [--questions 200] [--concurrency 32] [--capacity 8] [--json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+os.environ.setdefault("KB_CACHE_TTL", "0")
+os.environ.setdefault("ANSWER_CACHE_TTL", "0")
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import dynamo  # noqa: E402
+import tools  # noqa: E402
+from batch import AdaptiveLimiter, _default_invoke, run_batch  # noqa: E402
+from fakes import FakeKnowledgeBaseRetriever, fake_model_factory  # noqa: E402
+from local_dynamo import LocalDynamoResource, load_sample_items  # noqa: E402
+from models import registry  # noqa: E402
+
+QUESTIONS = [
+    "¿Qué película me sirve para empacar café molido?",
+    "Dame la información de la SCx 30",
+    "película para envolver quesos",
+    "¿Qué gramaje tiene CL 25?",
+    "¿Cuál es la misión de la empresa?",
+    "busco película para empacar snacks con alta barrera",
+]
+
+
+class QuotaGate:
+    """Fail calls beyond ``capacity`` in flight with a ``ThrottlingException``."""
+
+    def __init__(self, capacity, reject_seconds):
+        self.capacity = capacity
+        self.reject_seconds = reject_seconds
+        self.in_flight = 0
+
+    async def __call__(self, question, config):
+        if self.in_flight >= self.capacity:
+            await asyncio.sleep(self.reject_seconds)
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Too many requests, please wait before trying again."}},
+                "ConverseStream",
+            )
+        self.in_flight += 1
+        try:
+            return await _default_invoke(question, config)
+        finally:
+            self.in_flight -= 1
+
+
+def setup(args):
+    items = load_sample_items()
+    resource = LocalDynamoResource()
+    table = resource.Table(dynamo.TABLE_NAME)
+    for item in items:
+        table.items[item["id"]] = item
+    dynamo.set_dynamodb(resource)
+    registry.set_factory(fake_model_factory(first_token_delay=args.ttft_ms / 1000, token_delay=args.token_ms / 1000))
+    tools.set_kb_retriever(FakeKnowledgeBaseRetriever.from_items(items))
+
+
+async def run_mode(name, args, directory):
+    if name == "fixed":
+        limiter = AdaptiveLimiter(initial=args.concurrency, minimum=args.concurrency, maximum=args.concurrency)
+    else:
+        limiter = AdaptiveLimiter(initial=args.concurrency, maximum=args.concurrency, cooldown=args.cooldown)
+    questions = [{"id": i, "question": QUESTIONS[i % len(QUESTIONS)]} for i in range(args.questions)]
+    report = await run_batch(
+        questions,
+        os.path.join(directory, f"{name}.jsonl"),
+        invoke=QuotaGate(args.capacity, args.reject_ms / 1000),
+        limiter=limiter,
+        max_retries=args.max_retries,
+        base_backoff=args.backoff_ms / 1000,
+    )
+    result = report.to_dict()
+    result["limit_decreases"] = limiter.decreases
+    return result
+
+
+async def run(args):
+    setup(args)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        for name in ("fixed", "adaptive"):
+            results[name] = await run_mode(name, args, directory)
+    return {
+        "questions": args.questions,
+        "capacity": args.capacity,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="Fixed level, and adaptive ceiling")
+    parser.add_argument("--capacity", type=int, default=8, help="Calls in flight before throttling")
+    parser.add_argument("--ttft-ms", type=float, default=50)
+    parser.add_argument("--token-ms", type=float, default=1)
+    parser.add_argument("--reject-ms", type=float, default=5)
+    parser.add_argument("--backoff-ms", type=float, default=50)
+    parser.add_argument("--cooldown", type=float, default=0.2, help="Adaptive limiter cooldown (s)")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['questions']} questions, capacity {result['capacity']}, concurrency {result['concurrency']}")
+    print(f"  {'mode':8} | {'q/s':>7} | {'throttled':>9} | {'failed':>6} | {'limit':>5} | {'p50 ms':>8} | {'p95 ms':>8}")
+    for name, r in result["results"].items():
+        latency = r["latency"]
+        p50 = latency.get("p50_ms", "-")
+        p95 = latency.get("p95_ms", "-")
+        print(
+            f"  {name:8} | {r['throughput']:>7} | {r['throttled']:>9} | {r['failed']:>6} | "
+            f"{r['final_concurrency']:>5} | {p50:>8} | {p95:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
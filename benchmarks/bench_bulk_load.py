@@ -0,0 +1,183 @@
+"""Benchmark: catalog bulk load, per-file ``put_item`` vs ``updateDYnamo.BulkLoader``.
+
+Writes ``--files`` synthetic film JSON files to a temporary directory and
+loads them into the in-memory DynamoDB stand-in (simulated round trip and a
+share of unprocessed items) with
+
+* the previous loop: one synchronous ``put_item`` per file, and
+* the bulk loader: parallel parsing, 25-item ``batch_write_item`` with
+  retries and bounded concurrency,
+
+then checks resume: a run whose writes start failing halfway is followed by
+a second run that must only load the files missing from the checkpoint.
+It also checks that a table throttling every few ``batch_write_item`` calls
+(``ProvisionedThroughputExceededException``) still gets every item, and that
+when two files share an id the table ends up with the later file's version.
+
+Usage:
+    python benchmarks/bench_bulk_load.py [--files 5000] [--latency 0.005] [--writers 8] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from botocore.exceptions import ClientError  # noqa: E402
+from local_dynamo import LocalDynamoResource, synthetic_items  # noqa: E402
+from updateDYnamo import TABLE_NAME, BulkLoader, json_files, parse_file  # noqa: E402
+
+
+class FailingResource(LocalDynamoResource):
+    """Stand-in whose ``batch_write_item`` fails after ``fail_after`` requests."""
+
+    def __init__(self, fail_after: int, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_after = fail_after
+
+    def batch_write_item(self, **kwargs):
+        if self.stats.requests >= self.fail_after:
+            raise ConnectionError("simulated network failure")
+        return super().batch_write_item(**kwargs)
+
+
+class ThrottlingResource(LocalDynamoResource):
+    """Stand-in whose ``batch_write_item`` rejects every ``every``-th call as throttled."""
+
+    def __init__(self, every: int, **kwargs):
+        super().__init__(**kwargs)
+        self.every = every
+        self.calls = 0
+        self.throttled = 0
+
+    def batch_write_item(self, **kwargs):
+        with self._lock:
+            self.calls += 1
+            throttle = self.calls % self.every == 0
+            self.throttled += throttle
+        if throttle:
+            raise ClientError(
+                {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Rate exceeded"}},
+                "BatchWriteItem",
+            )
+        return super().batch_write_item(**kwargs)
+
+
+def write_duplicates(directory: str, count: int) -> list[str]:
+    """Write later-sorting copies of the first ``count`` items with a ``"version": 2`` marker."""
+    ids = []
+    for item in synthetic_items(count):
+        with open(os.path.join(directory, f"zz-{item['id']}.json"), "w", encoding="utf-8") as f:
+            json.dump({**item, "version": 2}, f, ensure_ascii=False, default=str)
+        ids.append(item["id"])
+    return ids
+
+
+def write_files(directory: str, count: int) -> None:
+    for item in synthetic_items(count):
+        with open(os.path.join(directory, f"{item['id']}.json"), "w", encoding="utf-8") as f:
+            json.dump(item, f, ensure_ascii=False, default=str)
+
+
+def put_item_loop(resource, paths):
+    """The previous implementation: parse and ``put_item`` one file at a time."""
+    table = resource.Table(TABLE_NAME)
+    for path in paths:
+        _, item, error = parse_file(path)
+        if error is None:
+            table.put_item(Item=item)
+
+
+def run(files, latency, unprocessed_rate, writers):
+    with tempfile.TemporaryDirectory() as directory:
+        write_files(directory, files)
+        paths = json_files(directory)
+
+        baseline = LocalDynamoResource(latency=latency)
+        start = time.perf_counter()
+        put_item_loop(baseline, paths)
+        baseline_seconds = time.perf_counter() - start
+
+        bulk = LocalDynamoResource(latency=latency, unprocessed_rate=unprocessed_rate)
+        report = BulkLoader(bulk, writers=writers).load(paths)
+
+        checkpoint = os.path.join(directory, ".load_checkpoint")
+        failing = FailingResource(fail_after=max(1, files // 50), latency=latency)
+        interrupted = BulkLoader(failing, writers=writers, checkpoint_path=checkpoint).load(paths)
+        resumed_resource = LocalDynamoResource(latency=latency)
+        resumed = BulkLoader(resumed_resource, writers=writers, checkpoint_path=checkpoint).load(paths)
+
+        throttling = ThrottlingResource(every=5, latency=latency)
+        throttled = BulkLoader(throttling, writers=writers).load(paths)
+
+        duplicated_ids = write_duplicates(directory, min(files, 200))
+        duplicates = LocalDynamoResource(latency=latency)
+        deduplicated = BulkLoader(duplicates, writers=writers).load(json_files(directory))
+        stored = duplicates.Table(TABLE_NAME).items
+
+        return {
+            "files": files,
+            "put_item_loop": {
+                "seconds": round(baseline_seconds, 3),
+                "items_per_second": round(files / baseline_seconds, 1),
+                "requests": baseline.stats.requests,
+            },
+            "bulk_loader": report.as_dict() | {"failed": len(report.failed)},
+            "speedup": round(baseline_seconds / report.seconds, 1),
+            "resume": {
+                "first_run_loaded": interrupted.loaded,
+                "first_run_failed": len(interrupted.failed),
+                "second_run_skipped": resumed.skipped,
+                "second_run_loaded": resumed.loaded,
+                "complete": interrupted.loaded + resumed.loaded == files
+                and len(resumed_resource.Table(TABLE_NAME).items) == resumed.loaded,
+            },
+            "throttling": {
+                "throttled_requests": throttling.throttled,
+                "retries": throttled.retries,
+                "failed": len(throttled.failed),
+                "complete": len(throttling.Table(TABLE_NAME).items) == files,
+            },
+            "duplicates": {
+                "files": len(duplicated_ids),
+                "superseded": deduplicated.superseded,
+                "latest_kept": all(stored[item_id].get("version") == 2 for item_id in duplicated_ids),
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated round trip (s)")
+    parser.add_argument("--unprocessed-rate", type=float, default=0.05)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.files, args.latency, args.unprocessed_rate, args.writers)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    baseline, bulk, resume = result["put_item_loop"], result["bulk_loader"], result["resume"]
+    print(f"{result['files']} files")
+    print(f"  put_item loop : {baseline['seconds']:8.3f} s  {baseline['items_per_second']:9.1f} items/s  {baseline['requests']} requests")
+    print(f"  bulk loader   : {bulk['seconds']:8.3f} s  {bulk['items_per_second']:9.1f} items/s  {bulk['requests']} requests"
+          f"  ({bulk['retries']} retries, {bulk['consumed_capacity']:g} WCU)")
+    print(f"  speedup       : {result['speedup']}x")
+    print(f"  resume        : {resume['first_run_loaded']} loaded / {resume['first_run_failed']} failed, then "
+          f"{resume['second_run_skipped']} skipped / {resume['second_run_loaded']} loaded -> complete={resume['complete']}")
+    throttling, duplicates = result["throttling"], result["duplicates"]
+    print(f"  throttling    : {throttling['throttled_requests']} throttled requests, {throttling['retries']} retries, "
+          f"{throttling['failed']} failed -> complete={throttling['complete']}")
+    print(f"  duplicate ids : {duplicates['files']} files repeat an id, {duplicates['superseded']} superseded "
+          f"-> latest kept={duplicates['latest_kept']}")
+
+
+if __name__ == "__main__":
+    main()
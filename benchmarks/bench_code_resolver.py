@@ -0,0 +1,147 @@
+"""Benchmark: fuzzy film-code resolution, latency and hit rate on misspelled codes.
+
+Builds ``code_resolver.CodeResolver`` over catalogs of ``--sizes`` items
+(``local_dynamo.synthetic_items``: the recorded films plus renamed copies)
+and reports, per size, the build time, the number of codes and the p50/p95
+latency of exact and fuzzy resolutions.
+
+On the recorded catalog it also replays :data:`MISSPELLINGS`, codes as
+users and the model actually write them, and compares the hit rate of the
+exact lookup ``specific_search_tool`` used before (``normalize_code`` against
+the code index) with ``CodeResolver.correct``.
+
+Usage:
+    python benchmarks/bench_code_resolver.py [--sizes 10 1000 10000] [--repeat 200] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from bench_graph import percentiles  # noqa: E402
+from code_resolver import CodeResolver  # noqa: E402
+from dynamo import normalize_code  # noqa: E402
+from local_dynamo import load_sample_items, synthetic_items  # noqa: E402
+
+# (as typed, expected catalog code)
+MISSPELLINGS = [
+    ("SCX-30", "SCx 30"),
+    ("scx30 micras", "SCx 30"),
+    ("S.C.X 30", "SCx 30"),
+    ("sxc 30", "SCx 30"),
+    ("csx 30", "SCx 30"),
+    ("SCx 3o", "SCx 30"),
+    ("scx 30µ", "SCx 30"),
+    ("CL-25", "CL 25"),
+    ("C.L. 25", "CL 25"),
+    ("cl25 mic", "CL 25"),
+    ("CLL 25", "CL 25"),
+    ("cl 2 5", "CL 25"),
+    ("película CA 35", "CA 35"),
+    ("ca35micras", "CA 35"),
+    ("AC 35", "CA 35"),
+    ("AV-12", "AV 12"),
+    ("a.v 12", "AV 12"),
+    ("sl x 32", "SLx 32"),
+    ("SLX32", "SLx 32"),
+    ("SLx-25 micras", "SLx 25"),
+    ("SL-50", "SL 50"),
+    ("LS 50", "SL 50"),
+    ("scf-40", "SCf 40"),
+    ("SCF 4O", "SCf 40"),
+    ("sfc 35", "SCf 35"),
+    ("CF25", "CF 25"),
+    ("C.F 25 micras", "CF 25"),
+    ("FC 25", "CF 25"),
+    ("SC-12", "SC 12"),
+    ("sc 1 2", "SC 12"),
+    ("CCF 35", "CCf 35"),
+    ("ccf-35 µm", "CCf 35"),
+]
+
+
+def timed(fn, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            fn(query)
+            samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def latency(sizes, repeat):
+    results = []
+    exact_queries = [code for _, code in MISSPELLINGS]
+    fuzzy_queries = [typed for typed, _ in MISSPELLINGS]
+    for size in sizes:
+        items = synthetic_items(size)
+        start = time.perf_counter()
+        resolver = CodeResolver.from_items(items)
+        build = time.perf_counter() - start
+        results.append({
+            "items": size,
+            "codes": len(resolver),
+            "build_ms": round(build * 1000, 3),
+            "exact": timed(resolver.resolve, exact_queries, repeat),
+            "fuzzy": timed(resolver.resolve, fuzzy_queries, repeat),
+        })
+    return results
+
+
+def hit_rate():
+    items = load_sample_items()
+    resolver = CodeResolver.from_items(items)
+    exact_codes = {normalize_code(code) for item in items for code in item.get("Códigos de Película") or []}
+    rows = []
+    for typed, expected in MISSPELLINGS:
+        corrected = resolver.correct([typed])
+        rows.append({
+            "typed": typed,
+            "expected": expected,
+            "exact_hit": normalize_code(typed) == normalize_code(expected) and normalize_code(typed) in exact_codes,
+            "resolver": corrected,
+            "resolver_hit": expected in corrected,
+            "resolver_unique": corrected == [expected],
+        })
+    total = len(rows)
+    return {
+        "cases": total,
+        "exact_hit_rate": round(sum(r["exact_hit"] for r in rows) / total, 3),
+        "resolver_hit_rate": round(sum(r["resolver_hit"] for r in rows) / total, 3),
+        "resolver_unique_rate": round(sum(r["resolver_unique"] for r in rows) / total, 3),
+        "misses": [r for r in rows if not r["resolver_hit"]],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the queries per size")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = {"hit_rate": hit_rate(), "latency": latency(args.sizes, args.repeat)}
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    hits = result["hit_rate"]
+    print(f"misspelled codes: {hits['cases']}")
+    print(f"  exact lookup hit rate: {hits['exact_hit_rate']:.1%}")
+    print(f"  resolver hit rate:     {hits['resolver_hit_rate']:.1%} (unique {hits['resolver_unique_rate']:.1%})")
+    for miss in hits["misses"]:
+        print(f"  miss: {miss['typed']!r} -> {miss['resolver']} (expected {miss['expected']!r})")
+    print(f"  {'items':>6} | {'codes':>6} | {'build ms':>9} | {'exact p50 µs':>12} | {'fuzzy p50 µs':>12} | {'fuzzy p95 µs':>12}")
+    for r in result["latency"]:
+        print(
+            f"  {r['items']:>6} | {r['codes']:>6} | {r['build_ms']:>9} | {r['exact']['p50_ms'] * 1000:>12.1f} | "
+            f"{r['fuzzy']['p50_ms'] * 1000:>12.1f} | {r['fuzzy']['p95_ms'] * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark: film item serialization for tool results.
+
+Compares, per tool call over the recorded film items (numbers turned into
+``Decimal`` as DynamoDB returns them):
+
+* the previous path: recursive ``convert_decimals`` walk, then the JSON dump
+  LangChain puts in the ``ToolMessage``, and its Python ``repr``;
+* ``FilmCodec`` compact text and minified JSON, cold (first call) and warm
+  (cached per id and version),
+
+reporting CPU time per call and estimated prompt tokens per item.
+
+Usage:
+    python benchmarks/bench_codec.py [--items 10] [--calls 2000] [--json]
+"""
+
+import argparse
+import decimal
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from codec import FilmCodec  # noqa: E402
+from compaction import estimate_tokens  # noqa: E402
+from local_dynamo import synthetic_items  # noqa: E402
+
+
+def convert_decimals(obj):
+    """The previous ``specific_search_tool`` helper."""
+    if isinstance(obj, list):
+        return [convert_decimals(i) for i in obj]
+    elif isinstance(obj, dict):
+        return {k: convert_decimals(v) for k, v in obj.items()}
+    elif isinstance(obj, set):
+        return [convert_decimals(i) for i in obj]
+    elif isinstance(obj, decimal.Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    else:
+        return obj
+
+
+def as_dynamo(item: dict) -> dict:
+    """Round-trip through JSON so every number is a ``Decimal``, as boto3 returns it."""
+    return json.loads(json.dumps(item, default=str), parse_float=decimal.Decimal, parse_int=decimal.Decimal)
+
+
+def per_call_us(fn, calls):
+    start = time.process_time()
+    for _ in range(calls):
+        fn()
+    return round((time.process_time() - start) / calls * 1e6, 1)
+
+
+def run(count, calls):
+    items = [as_dynamo(item) for item in synthetic_items(count)]
+
+    def legacy_json():
+        return json.dumps(convert_decimals({"Items": items})["Items"], ensure_ascii=False)
+
+    def legacy_repr():
+        return str(convert_decimals({"Items": items})["Items"])
+
+    results = {}
+    for name, fn in (("legacy_json", legacy_json), ("legacy_repr", legacy_repr)):
+        results[name] = {
+            "cpu_us_per_call": per_call_us(fn, calls),
+            "tokens_per_item": round(estimate_tokens(fn()) / len(items), 1),
+        }
+
+    for fmt in ("compact", "json"):
+        for version in ("catalog", None):
+            label = f"codec_{fmt}_{'versioned' if version else 'fingerprint'}"
+
+            def cold():
+                return FilmCodec(fmt=fmt).encode_many(items, version)
+
+            codec = FilmCodec(fmt=fmt)
+            output = codec.encode_many(items, version)
+            results[label] = {
+                "cpu_us_per_call_cold": per_call_us(cold, max(1, calls // 10)),
+                "cpu_us_per_call": per_call_us(lambda: codec.encode_many(items, version), calls),
+                "tokens_per_item": round(estimate_tokens(output) / len(items), 1),
+            }
+    return {"items": len(items), "calls": calls, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10, help="Items per tool call")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.items, args.calls)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['items']} items per call, {result['calls']} calls")
+    print(f"  {'':34} {'cold us/call':>12} {'us/call':>10} {'tokens/item':>12}")
+    for name, r in result["results"].items():
+        cold = r.get("cpu_us_per_call_cold", "")
+        print(f"  {name:34} {cold:>12} {r['cpu_us_per_call']:>10} {r['tokens_per_item']:>12}")
+
+
+if __name__ == "__main__":
+    main()
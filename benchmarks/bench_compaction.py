@@ -0,0 +1,123 @@
+"""Benchmark: input tokens per model call with and without compaction.
+
+Replays a long ``semantic_search`` session (``--turns`` user questions).
+Every turn makes three model calls (hops):
+
+* ``analyze_and_route_query`` on the history plus the new question;
+* ``semantic_search`` on the same messages;
+* ``respond`` after the retrieval, whose tool result is the recorded
+  ~18 KB Knowledge Base response in ``respuesta_pelicula.txt``.
+
+For each hop it builds the prompt with ``compaction.compact_messages`` under
+the node's default budget (``AgentConfiguration.token_budget``) and reports
+the estimated input tokens of the uncompacted prompt (``[system] + every
+message``) and of the compacted one, per turn and in total.
+
+Usage:
+    python benchmarks/bench_compaction.py [--turns 12] [--keep-turns 2] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage  # noqa: E402
+
+from compaction import compact_messages  # noqa: E402
+from configuration import AgentConfiguration  # noqa: E402
+
+RETRIEVAL_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "respuesta_pelicula.txt")
+
+QUESTIONS = [
+    "¿Qué película me sirve para empacar café molido?",
+    "¿y para snacks con alta barrera?",
+    "busco película para envolver quesos",
+    "¿Qué película sirve para frutas y vegetales?",
+    "necesito algo para empaque de pastas secas",
+    "¿Tienen alguna película para bolsas de pan?",
+]
+
+ANSWER = (
+    "Para esa aplicación recomendamos la SCx 30 (CPP metalizado, alta barrera a la humedad y al oxígeno) "
+    "o la CL 25 si se laminará con otra estructura; ambas cumplen con FDA y UE para contacto con alimentos."
+)
+
+
+def _with_id(message):
+    message.id = str(uuid.uuid4())
+    return message
+
+
+def hop(history, node, system_prompt, configuration, keep_turns):
+    _, report = compact_messages(
+        system_prompt, history, configuration.token_budget(node), keep_turns=keep_turns, node=node
+    )
+    return {"node": node, "before": report.tokens_before, "after": report.tokens_after}
+
+
+def run(turns, keep_turns):
+    with open(RETRIEVAL_PATH, encoding="utf-8") as f:
+        retrieval = f.read()
+    configuration = AgentConfiguration()
+    history = []
+    rows = []
+    for turn in range(turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        history.append(_with_id(HumanMessage(content=question)))
+        hops = [
+            hop(history, "analyze_and_route_query", configuration.router_system_prompt, configuration, keep_turns),
+            hop(history, "semantic_search", configuration.general_system_prompt, configuration, keep_turns),
+        ]
+        call_id = f"call_{turn}"
+        history.append(_with_id(AIMessage(
+            content="",
+            tool_calls=[{"name": "semantic_search_tool", "args": {"query": question}, "id": call_id, "type": "tool_call"}],
+        )))
+        history.append(_with_id(ToolMessage(content=retrieval, name="semantic_search_tool", tool_call_id=call_id)))
+        hops.append(hop(history, "respond", configuration.general_system_prompt, configuration, keep_turns))
+        history.append(_with_id(AIMessage(content=ANSWER)))
+        rows.append({
+            "turn": turn + 1,
+            "hops": hops,
+            "before": sum(h["before"] for h in hops),
+            "after": sum(h["after"] for h in hops),
+        })
+    before = sum(row["before"] for row in rows)
+    after = sum(row["after"] for row in rows)
+    return {
+        "turns": turns,
+        "keep_turns": keep_turns,
+        "retrieval_chars": len(retrieval),
+        "per_turn": rows,
+        "total_before": before,
+        "total_after": after,
+        "reduction": round(1 - after / before, 3) if before else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--keep-turns", type=int, default=AgentConfiguration.context_keep_turns)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.turns, args.keep_turns)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['turns']} turns, keep_turns {result['keep_turns']}, retrieval {result['retrieval_chars']} chars")
+    nodes = [h["node"] for h in result["per_turn"][0]["hops"]]
+    print(f"  {'turn':>4} | " + " | ".join(f"{node:>31}" for node in nodes) + " |   turn total")
+    for row in result["per_turn"]:
+        cells = " | ".join(f"{h['before']:>14} -> {h['after']:>13}" for h in row["hops"])
+        print(f"  {row['turn']:>4} | {cells} | {row['before']:>6} -> {row['after']:>5}")
+    print(f"  input tokens: {result['total_before']} -> {result['total_after']} ({result['reduction']:.1%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
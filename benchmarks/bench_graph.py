@@ -0,0 +1,276 @@
+"""Benchmark: end-to-end latency and throughput of the compiled retrieval graph.
+
+Runs ``graph.graph`` offline over a fixed corpus of Spanish customer
+messages covering every ``Router`` route, with stand-ins for every external
+service:
+
+* Bedrock chat models: ``fakes.FakeStreamingChatModel`` with ``--ttft-ms``
+  before the first token and ``--token-ms`` between tokens;
+* the Knowledge Base: ``fakes.FakeKnowledgeBaseRetriever`` over the recorded
+  film items, with ``--kb-ms`` per retrieval;
+* DynamoDB: ``local_dynamo.LocalDynamoResource`` seeded from
+  ``items_from_dynamo.txt``, with ``--dynamo-ms`` per request.
+
+For every concurrency level it reports end-to-end and per-node p50/p95/p99
+latency, throughput, and requests per route; a separate pass under
+``tracemalloc`` reports peak memory. Retrieval and answer caches are off
+unless ``--cache`` is given; ``--trace`` adds the aggregated ``tracing``
+spans. ``--json`` prints a stable, key-sorted document that can be diffed
+between versions.
+
+Usage:
+    python benchmarks/bench_graph.py [--concurrency 1 4 16] [--rounds 2] [--ttft-ms 300] [--json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Any, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from langchain_core.callbacks import BaseCallbackHandler  # noqa: E402
+from langchain_core.messages import AIMessage, HumanMessage  # noqa: E402
+
+import dynamo  # noqa: E402
+import tools  # noqa: E402
+import tracing  # noqa: E402
+from catalog import FilmCatalog, disable_catalog, enable_catalog  # noqa: E402
+from fakes import FakeKnowledgeBaseRetriever, fake_model_factory  # noqa: E402
+from local_dynamo import LocalDynamoResource, load_sample_items  # noqa: E402
+from models import registry  # noqa: E402
+
+PREVIOUS_TURN = [
+    HumanMessage(content="¿Qué película me recomiendan para empacar café?"),
+    AIMessage(content=(
+        "Para café molido recomendamos la SCx 30 (CPP metalizado, alta barrera a la humedad y al "
+        "oxígeno) o la CL 25 si se laminará con otra estructura."
+    )),
+]
+
+# (mensaje, hay respuesta previa, ruta esperada)
+CORPUS = [
+    ("¿Qué película me sirve para empacar café molido?", False, "semantic_search"),
+    ("película para envolver quesos", False, "semantic_search"),
+    ("busco película para empacar snacks con alta barrera", False, "semantic_search"),
+    ("¿Qué película sirve para frutas y vegetales?", False, "semantic_search"),
+    ("Dame la información de la SCx 30", False, "technical_retriever"),
+    ("¿Qué gramaje tiene CL 25?", False, "technical_retriever"),
+    ("características de SC 20 y SL 25", False, "technical_retriever"),
+    ("¿Cuál es el espesor de la película CF 25?", False, "technical_retriever"),
+    ("¿Cuál es la misión de la empresa?", False, "respond_to_question_with_same_context"),
+    ("¿Cuántas oficinas comerciales tienen?", False, "respond_to_question_with_same_context"),
+    ("y su espesor?", True, "respond_to_question_with_same_context"),
+    ("la primera opción, ¿qué ancho tiene?", True, "respond_to_question_with_same_context"),
+    ("hola, buenos días", False, "ask_for_more_info"),
+    ("necesito una recomendación", False, "ask_for_more_info"),
+    ("¿Cuál es la mejor?", False, "ask_for_more_info"),
+]
+
+
+def percentiles(samples: list[float]) -> dict[str, Any]:
+    """Nearest-rank p50/p95/p99 and mean of ``samples`` (seconds), in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(p):
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": rank(50),
+        "p95_ms": rank(95),
+        "p99_ms": rank(99),
+    }
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Record the wall time of every graph node run (``langgraph_node`` chain runs)."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self._started: dict[Any, tuple[str, float]] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started:
+            self.samples[started[0]].append(time.perf_counter() - started[1])
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+
+def setup(args) -> LocalDynamoResource:
+    """Install the offline stand-ins for Bedrock, the Knowledge Base and DynamoDB."""
+    if not args.cache:
+        os.environ["KB_CACHE_TTL"] = "0"
+        os.environ["ANSWER_CACHE_TTL"] = "0"
+    items = load_sample_items()
+    resource = LocalDynamoResource(latency=args.dynamo_ms / 1000)
+    table = resource.Table(dynamo.TABLE_NAME)
+    for item in items:
+        table.items[item["id"]] = item
+    dynamo.set_dynamodb(resource)
+    if args.catalog:
+        enable_catalog(FilmCatalog(table=table))
+    else:
+        disable_catalog()
+    registry.set_factory(fake_model_factory(
+        first_token_delay=args.ttft_ms / 1000,
+        token_delay=args.token_ms / 1000,
+        chunk_words=args.chunk_words,
+    ))
+    tools.set_kb_retriever(FakeKnowledgeBaseRetriever.from_items(items, latency=args.kb_ms / 1000))
+    tracing.configure_tracing([tracing.MemorySink()] if args.trace else [])
+    return resource
+
+
+def inputs_for(text: str, has_history: bool) -> dict[str, Any]:
+    history = list(PREVIOUS_TURN) if has_history else []
+    return {"messages": history + [HumanMessage(content=text)]}
+
+
+async def run_level(graph, corpus, concurrency: int, rounds: int, configurable: dict) -> dict[str, Any]:
+    timer = NodeTimer()
+    config = {"configurable": configurable, "callbacks": [timer]}
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    by_route: dict[str, list[float]] = defaultdict(list)
+    errors: Counter = Counter()
+
+    async def one(text, has_history):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                output = await graph.ainvoke(inputs_for(text, has_history), config)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+                return
+            elapsed = time.perf_counter() - start
+            latencies.append(elapsed)
+            router = output.get("router") or {}
+            by_route[router.get("type", "unknown")].append(elapsed)
+
+    requests = [(text, has_history) for _ in range(rounds) for text, has_history, _ in corpus]
+    start = time.perf_counter()
+    await asyncio.gather(*(one(text, has_history) for text, has_history in requests))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(requests),
+        "errors": dict(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "end_to_end": percentiles(latencies),
+        "routes": {route: percentiles(samples) for route, samples in sorted(by_route.items())},
+        "nodes": {node: percentiles(samples) for node, samples in sorted(timer.samples.items())},
+    }
+
+
+async def peak_memory(graph, corpus, concurrency: int, configurable: dict) -> dict[str, float]:
+    tracemalloc.start()
+    await run_level(graph, corpus, concurrency, 1, configurable)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"concurrency": concurrency, "peak_mb": round(peak / 1e6, 2)}
+
+
+async def run(args) -> dict[str, Any]:
+    resource = setup(args)
+    from graph import graph
+
+    configurable = {
+        "fast_router": not args.no_fast_router,
+        "speculative_retrieval": not args.no_speculation,
+    }
+    # Quiet the nodes' prints and INFO logs; they would dominate the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run_level(graph, CORPUS, 1, 1, configurable)  # warm-up: imports, indexes, codec
+        levels = [await run_level(graph, CORPUS, c, args.rounds, configurable) for c in args.concurrency]
+        memory = await peak_memory(graph, CORPUS, max(args.concurrency), configurable)
+    sink = tracing.find_sink(tracing.MemorySink)
+    return {
+        "settings": {
+            "corpus": len(CORPUS),
+            "rounds": args.rounds,
+            "ttft_ms": args.ttft_ms,
+            "token_ms": args.token_ms,
+            "kb_ms": args.kb_ms,
+            "dynamo_ms": args.dynamo_ms,
+            "cache": args.cache,
+            "catalog": args.catalog,
+            "trace": args.trace,
+            **configurable,
+        },
+        "levels": levels,
+        "memory": memory,
+        "dynamo_requests": resource.stats.requests,
+        "spans": sink.summary() if sink is not None else None,
+    }
+
+
+def _row(name: str, stats: dict[str, Any]) -> str:
+    if not stats.get("count"):
+        return f"    {name:48} -"
+    return (
+        f"    {name:48} n={stats['count']:<5} p50 {stats['p50_ms']:9.1f}  "
+        f"p95 {stats['p95_ms']:9.1f}  p99 {stats['p99_ms']:9.1f} ms"
+    )
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the corpus per level")
+    parser.add_argument("--ttft-ms", type=float, default=300.0, help="Model time to first token")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="Model time per streamed chunk")
+    parser.add_argument("--chunk-words", type=int, default=4)
+    parser.add_argument("--kb-ms", type=float, default=150.0, help="Knowledge Base latency per retrieval")
+    parser.add_argument("--dynamo-ms", type=float, default=10.0, help="DynamoDB latency per request")
+    parser.add_argument("--cache", action="store_true", help="Keep the retrieval and answer caches on")
+    parser.add_argument("--catalog", action="store_true", help="Serve lookups from the in-memory catalog")
+    parser.add_argument("--no-fast-router", action="store_true")
+    parser.add_argument("--no-speculation", action="store_true")
+    parser.add_argument("--trace", action="store_true", help="Aggregate tracing spans (and pay their overhead)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+        return
+    settings = result["settings"]
+    print(
+        f"{settings['corpus']} queries x {settings['rounds']} rounds; model TTFT {settings['ttft_ms']} ms, "
+        f"KB {settings['kb_ms']} ms, DynamoDB {settings['dynamo_ms']} ms"
+    )
+    for level in result["levels"]:
+        print(f"  concurrency {level['concurrency']}: {level['throughput_rps']} req/s, errors {level['errors'] or 0}")
+        print(_row("end to end", level["end_to_end"]))
+        for route, stats in level["routes"].items():
+            print(_row(f"route {route}", stats))
+        for node, stats in level["nodes"].items():
+            print(_row(f"node {node}", stats))
+    memory = result["memory"]
+    print(f"  peak traced memory at concurrency {memory['concurrency']}: {memory['peak_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
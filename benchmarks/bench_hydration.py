@@ -0,0 +1,99 @@
+"""Benchmark: item hydration after a Knowledge Base retrieval.
+
+Compares the previous one-``get_item``-per-id loop with ``batch_get_items``
+(serial chunks and concurrent chunks) for growing ``numberOfResults``, on the
+in-memory DynamoDB stand-in with a simulated round trip per request. Part of
+the keys are returned as unprocessed to exercise the retry path.
+
+Usage:
+    python benchmarks/bench_hydration.py [--results 5 20 100 300] [--latency 0.005] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from dynamo import batch_get_items, batch_get_latency  # noqa: E402
+from local_dynamo import seeded_resource  # noqa: E402
+
+
+def sequential_get_items(table, ids):
+    """The previous implementation: one ``get_item`` round trip per id."""
+    items = []
+    for item_id in ids:
+        item = table.get_item(Key={"id": item_id}).get("Item")
+        if item:
+            items.append(item)
+    return items
+
+
+def timed(fn):
+    start = time.perf_counter()
+    items = fn()
+    return items, round((time.perf_counter() - start) * 1000, 3)
+
+
+def run(result_counts, latency, unprocessed_rate, workers):
+    rows = []
+    for count in result_counts:
+        resource = seeded_resource(max(count, 10) * 2, latency=latency, unprocessed_rate=unprocessed_rate)
+        table = resource.Table("obenGroup_films")
+        # Orden de relevancia arbitrario del KB: uno de cada dos ids del catálogo, al revés
+        ids = sorted(table.items)[::-2][:count]
+
+        resource.reset_stats()
+        sequential, sequential_ms = timed(lambda: sequential_get_items(table, ids))
+        sequential_requests = resource.stats.requests
+
+        resource.reset_stats()
+        batched, batched_ms = timed(lambda: batch_get_items(resource, ids, table_name=table.name))
+        batched_requests = resource.stats.requests
+
+        resource.reset_stats()
+        concurrent, concurrent_ms = timed(
+            lambda: batch_get_items(resource, ids, table_name=table.name, max_workers=workers)
+        )
+
+        assert [item["id"] for item in batched] == [item["id"] for item in sequential] == ids
+        assert [item["id"] for item in concurrent] == ids
+        rows.append({
+            "results": count,
+            "sequential_ms": sequential_ms,
+            "sequential_requests": sequential_requests,
+            "batched_ms": batched_ms,
+            "batched_requests": batched_requests,
+            "concurrent_ms": concurrent_ms,
+            "concurrent_requests": resource.stats.requests,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, nargs="+", default=[5, 20, 100, 300])
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated round trip per request (s)")
+    parser.add_argument("--unprocessed-rate", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rows = run(args.results, args.latency, args.unprocessed_rate, args.workers)
+    if args.json:
+        print(json.dumps({"rows": rows, "batch_get_latency": batch_get_latency.summary()}, indent=2))
+        return
+
+    print(f"simulated_rtt={args.latency * 1000:.1f} ms unprocessed_rate={args.unprocessed_rate} workers={args.workers}")
+    print(f"{'results':>7} | {'get_item ms':>11} {'reqs':>5} | {'batch ms':>9} {'reqs':>5} | {'concurrent ms':>13} {'reqs':>5}")
+    for row in rows:
+        print(f"{row['results']:>7} | {row['sequential_ms']:>11.2f} {row['sequential_requests']:>5} | "
+              f"{row['batched_ms']:>9.2f} {row['batched_requests']:>5} | "
+              f"{row['concurrent_ms']:>13.2f} {row['concurrent_requests']:>5}")
+    print("batch_get_latency:", batch_get_latency.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Benchmark: cold import of the retrieval graph.
+
+Imports ``graph`` (which compiles the ``StateGraph``) in fresh interpreters,
+from an empty working directory, and checks that the import is free of side
+effects: no botocore clients created, no socket connections, no files
+written. Reports the wall time of each import and exits non-zero when a side
+effect is detected or the median exceeds ``--max-ms``, so it can gate CI for
+the autoscaled workers.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 5] [--max-ms 3000] [--module graph] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+PROBE = r"""
+import json, socket, sys, time
+sys.path.insert(0, {package_dir!r})
+
+side_effects = []
+
+def _connect(self, address, *args, **kwargs):
+    side_effects.append(f"socket.connect {{address!r}}")
+    raise OSError("network disabled during import benchmark")
+
+socket.socket.connect = _connect
+
+import botocore.session
+_create_client = botocore.session.Session.create_client
+
+def create_client(self, service_name, *args, **kwargs):
+    side_effects.append(f"botocore client {{service_name}}")
+    return _create_client(self, service_name, *args, **kwargs)
+
+botocore.session.Session.create_client = create_client
+
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_ms": elapsed * 1000, "side_effects": side_effects}}))
+"""
+
+
+def run_once(module):
+    with tempfile.TemporaryDirectory() as cwd:
+        env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get("AWS_DEFAULT_REGION", "us-east-1"))
+        result = subprocess.run(
+            [sys.executable, "-c", PROBE.format(package_dir=PACKAGE_DIR, module=module)],
+            cwd=cwd, env=env, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            raise SystemExit(f"import of {module!r} failed:\n{result.stderr}")
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample["files_written"] = sorted(os.listdir(cwd))
+        return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="fail when the median import exceeds this")
+    parser.add_argument("--module", default="graph")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    samples = [run_once(args.module) for _ in range(args.runs)]
+    times = [sample["import_ms"] for sample in samples]
+    side_effects = sorted({effect for sample in samples for effect in sample["side_effects"]})
+    files_written = sorted({name for sample in samples for name in sample["files_written"]})
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "import_ms_min": round(min(times), 1),
+        "import_ms_median": round(statistics.median(times), 1),
+        "import_ms_max": round(max(times), 1),
+        "side_effects": side_effects,
+        "files_written": files_written,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for key, value in report.items():
+            print(f"{key:>18}: {value}")
+
+    failed = bool(side_effects or files_written)
+    if args.max_ms is not None and report["import_ms_median"] > args.max_ms:
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Benchmark: local hybrid retriever vs recorded Knowledge Base results.
+
+``respuesta_pelicula.txt`` holds a recorded Knowledge Base response (ten
+documents, ranked) for the sample query used in ``tools.py``. This script
+indexes the films in ``items_from_dynamo.txt`` with ``LocalHybridRetriever``
+and reports recall@k against that ranking, per-query and batched latency,
+and latency on synthetic catalogs far larger than today's. ``--live`` also
+times the real Knowledge Base (needs AWS credentials).
+
+Usage:
+    python benchmarks/bench_local_retriever.py [--sizes 1000 10000] [--live] [--json]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, "retrieval_graph"))
+
+from local_dynamo import load_sample_items, synthetic_items  # noqa: E402
+from local_retriever import LocalHybridRetriever  # noqa: E402
+
+RECORDED_QUERY = "película que sirve para empacar o envolver café"
+QUERIES = [
+    RECORDED_QUERY,
+    "película para empaque de pastas, panes y granos",
+    "película antiempañante para vegetales frescos",
+    "película metalizada con barrera a la humedad",
+    "sellado a baja temperatura para alta velocidad de empaque",
+]
+
+
+def recorded_ids(path=os.path.join(ROOT, "respuesta_pelicula.txt")):
+    with open(path, encoding="utf-8") as f:
+        uris = re.findall(r"'location': \{'s3Location': \{'uri': '([^']+)'", f.read())
+    return [re.search(r"/([^/]+)\.json$", uri).group(1) for uri in uris]
+
+
+def result_ids(documents):
+    return [re.search(r"/([^/]+)\.json$", doc.metadata["location"]["s3Location"]["uri"]).group(1) for doc in documents]
+
+
+def time_queries(retriever, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            retriever.invoke(query)
+            samples.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    retriever.search_batch(queries * repeat)
+    batch_ms = (time.perf_counter() - start) * 1000 / (len(queries) * repeat)
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(sorted(samples)[int(0.95 * (len(samples) - 1))], 3),
+        "batched_ms_per_query": round(batch_ms, 3),
+    }
+
+
+def run(sizes, live):
+    report = {}
+    expected = recorded_ids()
+    items = load_sample_items()
+
+    start = time.perf_counter()
+    retriever = LocalHybridRetriever.from_items(items, k=len(expected))
+    report["index_build_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    ranking = result_ids(retriever.invoke(RECORDED_QUERY))
+    report["recorded_query"] = RECORDED_QUERY
+    report["kb_ranking"] = expected
+    report["local_ranking"] = ranking
+    report["recall"] = {
+        f"@{k}": round(len(set(ranking[:k]) & set(expected[:k])) / k, 3) for k in (1, 3, 5)
+    }
+    report["local_latency"] = time_queries(retriever, QUERIES, repeat=20)
+
+    report["scaling"] = []
+    for size in sizes:
+        start = time.perf_counter()
+        large = LocalHybridRetriever.from_items(synthetic_items(size))
+        build_ms = (time.perf_counter() - start) * 1000
+        report["scaling"].append({
+            "documents": size,
+            "index_build_ms": round(build_ms, 1),
+            **time_queries(large, QUERIES, repeat=5),
+        })
+
+    if live:
+        sys.path.insert(0, os.path.join(ROOT, "retrieval_graph"))
+        from tools import get_kb_retriever
+
+        kb = get_kb_retriever()
+        samples = []
+        for query in QUERIES:
+            start = time.perf_counter()
+            kb.invoke(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        report["kb_latency"] = {"p50_ms": round(statistics.median(samples), 3), "max_ms": round(max(samples), 3)}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--live", action="store_true", help="also time the Bedrock Knowledge Base")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.live)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    print(f"query: {report['recorded_query']}")
+    print(f"KB ranking:    {report['kb_ranking']}")
+    print(f"local ranking: {report['local_ranking']}")
+    print(f"recall: {report['recall']}  local latency: {report['local_latency']}")
+    if "kb_latency" in report:
+        print(f"KB latency: {report['kb_latency']}")
+    for row in report["scaling"]:
+        print(f"{row['documents']:>7} docs: build {row['index_build_ms']:.0f} ms, p50 {row['p50_ms']:.2f} ms, "
+              f"p95 {row['p95_ms']:.2f} ms, batched {row['batched_ms_per_query']:.2f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Benchmark: per-node model tiers and the router/tool-call cascade.
+
+Runs ``graph.graph`` offline over ``bench_graph.CORPUS`` with the LLM router
+and the ``semantic_search`` tool-call generation always on (no fast router,
+no speculative retrieval), and two fake Bedrock models: a fast one
+(``--fast-ms`` to first token) and a strong one (``--strong-ms``). The fast
+model's router reports the local classifier's confidence, so ambiguous
+messages are the ones a cascade escalates. Modes:
+
+* ``strong``: every node on the strong model (one model for everything);
+* ``fast``: every node on the fast model;
+* ``tiered``: router and tool-call generation on the fast model, answers on
+  the strong one;
+* ``cascade``: ``tiered`` plus ``cascade_model`` = strong, escalating on
+  parse failures and router confidence below ``--min-confidence``.
+
+The strong model's router answers with the corpus label, so it is right on
+every message, while the fast one is the local classifier and misses some;
+the cascade's route accuracy over ``fast`` is what escalation buys.
+
+Reports, per mode, end-to-end p50/p95 latency, route accuracy against the
+corpus labels and, per node and model, calls, escalations, p50 latency and
+tokens (``cascade.tier_stats``).
+
+Usage:
+    python benchmarks/bench_model_tiers.py [--rounds 2] [--fast-ms 150] [--strong-ms 600] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+os.environ["KB_CACHE_TTL"] = "0"
+os.environ["ANSWER_CACHE_TTL"] = "0"
+
+from bench_graph import CORPUS, inputs_for, percentiles  # noqa: E402
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import dynamo  # noqa: E402
+import tools  # noqa: E402
+from cascade import tier_stats  # noqa: E402
+from fakes import FakeKnowledgeBaseRetriever, default_structured_output, fake_model_factory  # noqa: E402
+from local_dynamo import LocalDynamoResource, load_sample_items  # noqa: E402
+from models import registry  # noqa: E402
+
+FAST = "anthropic/anthropic.claude-3-haiku-20240307-v1:0"
+STRONG = "anthropic/anthropic.claude-3-5-sonnet-20240620-v1:0"
+FAST_NODES = ("analyze_and_route_query", "semantic_search")
+LABELS = {text: expected for text, _, expected in CORPUS}
+STRONG_CONFIDENCE = 0.95
+
+
+def strong_router(schema, messages):
+    """Structured output of the strong model: the corpus label, where the fast model guesses."""
+    result = default_structured_output(schema, messages)
+    question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+    expected = LABELS.get(question)
+    if expected is None:
+        return result
+    update = {"type": expected}
+    if "confidence" in getattr(schema, "__annotations__", {}):
+        update["confidence"] = STRONG_CONFIDENCE
+    return result.model_copy(update=update) if hasattr(result, "model_copy") else {**result, **update}
+
+
+def modes(min_confidence):
+    """``{mode: configurable}`` for the compared setups."""
+    fast_tiers = {node: {"model": FAST, "temperature": 0.0} for node in FAST_NODES}
+    return {
+        "strong": {"model": STRONG, "model_tiers": {}},
+        "fast": {"model": FAST, "model_tiers": {}},
+        "tiered": {"model": STRONG, "model_tiers": fast_tiers},
+        "cascade": {
+            "model": STRONG,
+            "model_tiers": fast_tiers,
+            "cascade_model": STRONG,
+            "cascade_min_confidence": min_confidence,
+        },
+    }
+
+
+def setup(args):
+    """Install the two fake models, the Knowledge Base and DynamoDB stand-ins."""
+    items = load_sample_items()
+    resource = LocalDynamoResource()
+    table = resource.Table(dynamo.TABLE_NAME)
+    for item in items:
+        table.items[item["id"]] = item
+    dynamo.set_dynamodb(resource)
+    tools.set_kb_retriever(FakeKnowledgeBaseRetriever.from_items(items))
+    fast = fake_model_factory(first_token_delay=args.fast_ms / 1000, token_delay=args.token_ms / 1000)
+    strong = fake_model_factory(
+        first_token_delay=args.strong_ms / 1000, token_delay=args.token_ms / 1000, structured_output=strong_router
+    )
+    strong_id = STRONG.partition("/")[2]
+    registry.set_factory(lambda model, **kwargs: (strong if model == strong_id else fast)(model, **kwargs))
+
+
+async def run_mode(graph, configurable, rounds, concurrency):
+    tier_stats.reset()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    correct = 0
+
+    async def one(index, text, has_history, expected):
+        nonlocal correct
+        config = {"configurable": {
+            **configurable,
+            "fast_router_enabled": False,
+            "speculative_retrieval": False,
+            "thread_id": f"tiers-{index}",
+        }}
+        async with semaphore:
+            start = time.perf_counter()
+            result = await graph.ainvoke(inputs_for(text, has_history), config)
+            latencies.append(time.perf_counter() - start)
+        correct += result["router"]["type"] == expected
+
+    cases = [case for _ in range(rounds) for case in CORPUS]
+    await asyncio.gather(*(one(i, *case) for i, case in enumerate(cases)))
+    return {
+        "latency": percentiles(latencies),
+        "route_accuracy": round(correct / len(cases), 3),
+        "tiers": tier_stats.summary(),
+    }
+
+
+async def run(args):
+    setup(args)
+    from graph import graph
+
+    results = {}
+    for mode, configurable in modes(args.min_confidence).items():
+        results[mode] = await run_mode(graph, configurable, args.rounds, args.concurrency)
+    return {"fast_ms": args.fast_ms, "strong_ms": args.strong_ms, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--fast-ms", type=float, default=150, help="Fast model time to first token")
+    parser.add_argument("--strong-ms", type=float, default=600, help="Strong model time to first token")
+    parser.add_argument("--token-ms", type=float, default=2)
+    parser.add_argument("--min-confidence", type=float, default=0.6)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+        return
+    for mode, r in result["results"].items():
+        print(
+            f"{mode}: p50 {r['latency']['p50_ms']} ms, p95 {r['latency']['p95_ms']} ms, "
+            f"route accuracy {r['route_accuracy']:.1%}"
+        )
+        print(f"  {'node/model':80} | {'calls':>5} | {'escalated':>9} | {'p50 ms':>8} | {'in tok':>7} | {'out tok':>7}")
+        for name, tier in r["tiers"].items():
+            print(
+                f"  {name:80} | {tier['calls']:>5} | {tier['escalations']:>9} | {tier['p50_ms']:>8} | "
+                f"{tier['input_tokens']:>7} | {tier['output_tokens']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Benchmark: decision rate and accuracy of the fast-path router.
+
+Runs ``prerouter.preroute`` over a labelled sample of customer messages (not
+the classifier's training examples) and reports, per threshold, how many
+messages skip the LLM router, how accurate those decisions are, and the
+first-hop latency saved assuming ``--llm-ms`` per LLM classification.
+
+The sample includes messages with code-shaped tokens that are not film
+codes ("pedido nro 123"). Each run is done twice: ``catalog`` checks codes
+against the catalog's code index, ``no_catalog`` (the default deployment)
+has nothing to check them against.
+
+Usage:
+    python benchmarks/bench_prerouter.py [--thresholds 0.8 0.9 0.95] [--llm-ms 900] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from catalog import build_snapshot  # noqa: E402
+from local_dynamo import load_sample_items  # noqa: E402
+from prerouter import preroute  # noqa: E402
+
+# (mensaje, hay respuesta previa, ruta esperada)
+LABELLED_SAMPLE = [
+    ("¿Qué película me sirve para empacar café molido?", False, "semantic_search"),
+    ("película para envolver quesos", False, "semantic_search"),
+    ("necesito algo para empaque de pastas secas", False, "semantic_search"),
+    ("¿Tienen alguna película para bolsas de pan?", False, "semantic_search"),
+    ("¿qué película recomiendan para etiquetas?", False, "semantic_search"),
+    ("busco película para empacar snacks con alta barrera", False, "semantic_search"),
+    ("película para empacar granos con SCx 30", False, "semantic_search"),
+    ("¿Cuál película usar para envolver carnes?", False, "semantic_search"),
+    ("¿Qué película sirve para frutas y vegetales?", False, "semantic_search"),
+    ("¿Qué película me recomiendas para chocolates?", False, "semantic_search"),
+    ("Dame la información de la SCx 30", False, "technical_retriever"),
+    ("¿Qué gramaje tiene CL 25?", False, "technical_retriever"),
+    ("características de SC 20 y SL 25", False, "technical_retriever"),
+    ("quiero ver la ficha de CA 40", False, "technical_retriever"),
+    ("¿El SLx 32 tiene tratamiento corona?", False, "technical_retriever"),
+    ("comparar cl20 con ca20", False, "technical_retriever"),
+    ("¿Cuál es el espesor de la película CF 25?", False, "technical_retriever"),
+    ("necesito una película con 25 micras de espesor", False, "technical_retriever"),
+    ("¿Cuál es la tasa de transmisión de vapor de agua?", False, "technical_retriever"),
+    ("¿Qué temperatura de sello tienen sus películas?", False, "technical_retriever"),
+    ("¿Cuál es la misión de la empresa?", False, "respond_to_question_with_same_context"),
+    ("¿Cuántas oficinas comerciales tienen?", False, "respond_to_question_with_same_context"),
+    ("¿Dónde inauguraron su primera planta?", False, "respond_to_question_with_same_context"),
+    ("¿Qué valores tiene ObenGroup?", False, "respond_to_question_with_same_context"),
+    ("muchas gracias", True, "respond_to_question_with_same_context"),
+    ("y su espesor?", True, "respond_to_question_with_same_context"),
+    ("¿cuál de ellas es más barata?", True, "respond_to_question_with_same_context"),
+    ("la primera opción, ¿qué ancho tiene?", True, "respond_to_question_with_same_context"),
+    ("me puedes resumir lo anterior", True, "respond_to_question_with_same_context"),
+    ("más detalles de esa película por favor", True, "respond_to_question_with_same_context"),
+    ("¿Cuál es la mejor?", False, "ask_for_more_info"),
+    ("hola, buenos días", False, "ask_for_more_info"),
+    ("quiero comprar película", False, "ask_for_more_info"),
+    ("necesito una recomendación", False, "ask_for_more_info"),
+    ("¿qué tienen?", False, "ask_for_more_info"),
+    ("ayuda por favor", False, "ask_for_more_info"),
+    # Números con forma de código que no son películas
+    ("pedido nro 123", False, "ask_for_more_info"),
+    ("cuanto cuesta el envio a lima 15", False, "respond_to_question_with_same_context"),
+    ("Necesito bolsas tipo PE 100 para mi tienda", False, "semantic_search"),
+    ("¿Tienen oficina en la av 28 de julio?", False, "respond_to_question_with_same_context"),
+]
+
+
+def run_mode(thresholds, llm_ms, known_codes):
+    routes = []
+    start = time.perf_counter()
+    for text, has_history, expected in LABELLED_SAMPLE:
+        route = preroute(text, has_history=has_history, known_codes=known_codes)
+        routes.append((route, expected))
+    per_message_ms = (time.perf_counter() - start) * 1000 / len(LABELLED_SAMPLE)
+
+    rows = []
+    for threshold in thresholds:
+        decided = [(route, expected) for route, expected in routes if route.confidence >= threshold]
+        correct = sum(route.type == expected for route, expected in decided)
+        decision_rate = len(decided) / len(routes)
+        rows.append({
+            "threshold": threshold,
+            "decision_rate": round(decision_rate, 3),
+            "accuracy": round(correct / len(decided), 3) if decided else None,
+            "errors": [
+                {"message": text, "expected": expected, "got": route.type, "confidence": round(route.confidence, 3)}
+                for (text, _, _), (route, expected) in zip(LABELLED_SAMPLE, routes)
+                if route.confidence >= threshold and route.type != expected
+            ],
+            "mean_first_hop_saved_ms": round(decision_rate * (llm_ms - per_message_ms), 1),
+        })
+    overall = sum(route.type == expected for route, expected in routes) / len(routes)
+    return {
+        "fast_path_ms_per_message": round(per_message_ms, 4),
+        "accuracy_without_threshold": round(overall, 3),
+        "thresholds": rows,
+    }
+
+
+def run(thresholds, llm_ms):
+    known_codes = frozenset(build_snapshot(load_sample_items(), loaded_at=0.0).code_index)
+    return {
+        "sample_size": len(LABELLED_SAMPLE),
+        "modes": {
+            "catalog": run_mode(thresholds, llm_ms, known_codes),
+            "no_catalog": run_mode(thresholds, llm_ms, None),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.9, 0.95])
+    parser.add_argument("--llm-ms", type=float, default=900.0, help="latency of one LLM router call")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    report = run(args.thresholds, args.llm_ms)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+    for mode, result in report["modes"].items():
+        print(f"{mode}: sample={report['sample_size']} fast path={result['fast_path_ms_per_message']} ms/message "
+              f"accuracy(no threshold)={result['accuracy_without_threshold']}")
+        for row in result["thresholds"]:
+            print(f"  threshold {row['threshold']:.2f}: decided {row['decision_rate']:.0%}, "
+                  f"accuracy {row['accuracy']}, saves ~{row['mean_first_hop_saved_ms']} ms/turn")
+            for error in row["errors"]:
+                print(f"      wrong: {error}")
+
+
+if __name__ == "__main__":
+    main()
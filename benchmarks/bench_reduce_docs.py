@@ -0,0 +1,197 @@
+"""Benchmark: ``shared.state.reduce_docs`` over a long accumulation.
+
+Feeds ``--steps`` reducer calls of ``--batch`` documents each (mixed strings,
+dicts and Documents, with a share of duplicates) to the previous
+list-rebuilding implementation and to the indexed ``DocumentList`` one, and
+reports total and last-step time plus peak memory. Both results are checked
+to contain the same documents.
+
+The first ``--checkpoint-steps`` batches are also accumulated through a
+graph whose state field uses ``reduce_docs``, compiled with
+``InMemorySaver`` and with ``sessions.SQLiteSessionSaver``; the documents
+read back from each checkpoint must match the reducer's. The run exits
+non-zero if any check fails.
+
+Usage:
+    python benchmarks/bench_reduce_docs.py [--steps 300] [--batch 50] [--json]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from typing import Annotated  # noqa: E402
+
+from langchain_core.documents import Document  # noqa: E402
+from langgraph.checkpoint.memory import InMemorySaver  # noqa: E402
+from langgraph.graph import END, START, StateGraph  # noqa: E402
+from typing_extensions import TypedDict  # noqa: E402
+
+from sessions import SQLiteSessionSaver  # noqa: E402
+from shared.state import reduce_docs  # noqa: E402
+
+
+def _generate_uuid(page_content: str) -> str:
+    return str(uuid.UUID(hashlib.md5(page_content.encode()).hexdigest()))
+
+
+def legacy_reduce_docs(existing, new):
+    """The previous implementation: rebuilds the id set and copies the list on every call."""
+    if new == "delete":
+        return []
+    existing_list = list(existing) if existing else []
+    if isinstance(new, str):
+        return existing_list + [Document(page_content=new, metadata={"uuid": _generate_uuid(new)})]
+    new_list = []
+    if isinstance(new, list):
+        existing_ids = set(doc.metadata.get("uuid") for doc in existing_list)
+        for item in new:
+            if isinstance(item, str):
+                item_id = _generate_uuid(item)
+                new_list.append(Document(page_content=item, metadata={"uuid": item_id}))
+                existing_ids.add(item_id)
+            elif isinstance(item, dict):
+                metadata = item.get("metadata", {})
+                item_id = metadata.get("uuid") or _generate_uuid(item.get("page_content", ""))
+                if item_id not in existing_ids:
+                    new_list.append(Document(**{**item, "metadata": {**metadata, "uuid": item_id}}))
+                    existing_ids.add(item_id)
+            elif isinstance(item, Document):
+                item_id = item.metadata.get("uuid", "")
+                if not item_id:
+                    item_id = _generate_uuid(item.page_content)
+                    with warnings.catch_warnings():
+                        warnings.simplefilter("ignore", DeprecationWarning)
+                        new_item = item.copy(deep=True)
+                    new_item.metadata["uuid"] = item_id
+                else:
+                    new_item = item
+                if item_id not in existing_ids:
+                    new_list.append(new_item)
+                    existing_ids.add(item_id)
+    return existing_list + new_list
+
+
+def make_batches(steps: int, batch: int) -> list[list]:
+    batches = []
+    for step in range(steps):
+        items = []
+        for i in range(batch):
+            # Every 10th item repeats a document from an earlier step
+            n = (step * batch + i) if i % 10 else max(0, step * batch + i - batch * 3)
+            text = f"Película {n}: descripción técnica con barrera, sello y aplicaciones {n % 97}"
+            kind = i % 3
+            if kind == 0:
+                items.append(text)
+            elif kind == 1:
+                items.append({"page_content": text, "metadata": {"source": f"s3://kb/{n}.json"}})
+            else:
+                items.append(Document(page_content=text, metadata={"source": f"s3://kb/{n}.json"}))
+        batches.append(items)
+    return batches
+
+
+def run_reducer(reducer, batches):
+    state = None
+    start = time.perf_counter()
+    last = 0.0
+    for items in batches:
+        step_start = time.perf_counter()
+        state = reducer(state, items)
+        last = time.perf_counter() - step_start
+    total = time.perf_counter() - start
+
+    # Separate pass for memory: tracemalloc distorts the timings
+    tracemalloc.start()
+    memory_state = None
+    for items in batches:
+        memory_state = reducer(memory_state, items)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return state, {
+        "total_ms": round(total * 1000, 3),
+        "last_step_ms": round(last * 1000, 3),
+        "peak_mb": round(peak / 1e6, 2),
+    }
+
+
+class DocumentsState(TypedDict):
+    documents: Annotated[list[Document], reduce_docs]
+    batch: list
+
+
+def checkpoint_round_trip(saver, batches) -> list[Document]:
+    """Accumulate ``batches`` through a one-node graph checkpointed by ``saver`` and read them back."""
+    builder = StateGraph(DocumentsState)
+    builder.add_node("add", lambda state: {"documents": state["batch"]})
+    builder.add_edge(START, "add")
+    builder.add_edge("add", END)
+    graph = builder.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench"}}
+    for items in batches:
+        graph.invoke({"batch": items}, config)
+    return graph.get_state(config).values["documents"]
+
+
+def run(steps, batch, checkpoint_steps):
+    batches = make_batches(steps, batch)
+    legacy_state, legacy = run_reducer(legacy_reduce_docs, batches)
+    indexed_state, indexed = run_reducer(reduce_docs, batches)
+    same = [d.metadata["uuid"] for d in legacy_state] == [d.metadata["uuid"] for d in indexed_state]
+
+    expected = None
+    for items in batches[:checkpoint_steps]:
+        expected = reduce_docs(expected, items)
+    round_trip = {}
+    with tempfile.TemporaryDirectory() as directory:
+        savers = {"memory": InMemorySaver(), "sqlite_session": SQLiteSessionSaver(os.path.join(directory, "s.db"))}
+        for name, saver in savers.items():
+            restored = checkpoint_round_trip(saver, batches[:checkpoint_steps])
+            round_trip[name] = restored == expected
+    return {
+        "steps": steps,
+        "batch": batch,
+        "documents": len(indexed_state),
+        "legacy": legacy,
+        "indexed": indexed,
+        "speedup": round(legacy["total_ms"] / indexed["total_ms"], 1),
+        "same_documents": same,
+        "checkpoint_round_trip": round_trip,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--checkpoint-steps", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.steps, args.batch, args.checkpoint_steps)
+    ok = result["same_documents"] and all(result["checkpoint_round_trip"].values())
+    if args.json:
+        print(json.dumps(result, indent=2))
+        sys.exit(0 if ok else 1)
+    print(f"{result['steps']} steps x {result['batch']} items -> {result['documents']} documents")
+    for name in ("legacy", "indexed"):
+        r = result[name]
+        print(f"  {name:8}: total {r['total_ms']:9.1f} ms  last step {r['last_step_ms']:7.3f} ms  peak {r['peak_mb']:7.2f} MB")
+    print(f"  speedup : {result['speedup']}x  same documents: {result['same_documents']}")
+    print(f"  checkpoint round trip: {result['checkpoint_round_trip']}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Benchmark: requests per second and tail latency of one ``server.Server`` worker.
+
+Drives the ASGI application in process (no sockets, so the numbers are the
+worker's own cost: admission, JSON, SSE framing and the graph) with
+``--clients`` closed-loop clients per level, each sending the
+``bench_graph`` corpus questions back to back for ``--seconds``. External
+services are the offline fakes of ``bench_graph`` (same latency flags).
+
+Per level it reports requests per second, p50/p95/p99 latency of ``/invoke``
+(or time to first SSE token of ``/stream`` with ``--stream``), rejected
+(503) responses and the admission queue wait.
+
+Usage:
+    python benchmarks/bench_server.py [--clients 1 8 32 64] [--max-concurrency 16] [--max-queue 32] [--stream] [--json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from bench_graph import CORPUS, percentiles, setup  # noqa: E402
+from server import Admission, Server  # noqa: E402
+
+
+async def request(app, method, path, payload=None):
+    """Send one request to ``app``; return status, body and seconds to the first SSE token."""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    sent = False
+    status = None
+    chunks = []
+    first_token = None
+    start = time.perf_counter()
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()
+
+    async def send(message):
+        nonlocal status, first_token
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        else:
+            chunk = message.get("body", b"")
+            if first_token is None and chunk.startswith(b"event: token"):
+                first_token = time.perf_counter() - start
+            chunks.append(chunk)
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [(b"content-type", b"application/json")]}
+    await app(scope, receive, send)
+    return status, b"".join(chunks), first_token
+
+
+async def run_level(app, clients, seconds, stream):
+    path = "/stream" if stream else "/invoke"
+    questions = [text for text, has_history, _ in CORPUS if not has_history]
+    latencies = []
+    statuses = Counter()
+    deadline = time.perf_counter() + seconds
+
+    async def client(index):
+        n = index
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _, first_token = await request(app, "POST", path, {"message": questions[n % len(questions)]})
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(first_token if stream and first_token is not None else time.perf_counter() - start)
+            else:
+                await asyncio.sleep(0.05)  # Retry-After simplificado
+            n += clients
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        "clients": clients,
+        "requests_per_second": round(statuses[200] / elapsed, 2),
+        "latency" if not stream else "ttft": percentiles(latencies),
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+async def run(args):
+    setup(args)
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for clients in args.clients:
+            app = Server(admission=Admission(max_concurrency=args.max_concurrency, max_queue=args.max_queue))
+            await asyncio.to_thread(app.startup)
+            level = await run_level(app, clients, args.seconds, args.stream)
+            level["queue_wait"] = app.admission.queue_latency.summary()
+            results.append(level)
+    return {
+        "endpoint": "/stream" if args.stream else "/invoke",
+        "max_concurrency": args.max_concurrency,
+        "max_queue": args.max_queue,
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each level")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--max-queue", type=int, default=32)
+    parser.add_argument("--stream", action="store_true", help="Load /stream and report time to first token")
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--token-ms", type=float, default=10)
+    parser.add_argument("--chunk-words", type=int, default=1)
+    parser.add_argument("--kb-ms", type=float, default=80)
+    parser.add_argument("--dynamo-ms", type=float, default=10)
+    parser.add_argument("--cache", action="store_true", help="Keep the retrieval and answer caches on")
+    parser.add_argument("--catalog", action="store_true", help="Serve lookups from the in-memory catalog")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    args.trace = False
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+        return
+    metric = "ttft" if args.stream else "latency"
+    print(f"{result['endpoint']}, max_concurrency {result['max_concurrency']}, max_queue {result['max_queue']}")
+    print(f"  {'clients':>7} | {'req/s':>7} | {'p50 ms':>9} | {'p95 ms':>9} | {'p99 ms':>9} | statuses")
+    for r in result["results"]:
+        p = r[metric]
+        print(
+            f"  {r['clients']:>7} | {r['requests_per_second']:>7} | {p.get('p50_ms', '-'):>9} | "
+            f"{p.get('p95_ms', '-'):>9} | {p.get('p99_ms', '-'):>9} | {r['statuses']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Benchmark: session checkpoint cost versus session length.
+
+Runs conversations of ``--turns`` user messages through the compiled graph
+(offline fakes, no latency) with two SQLite checkpointers:
+
+* ``full``: every checkpoint stores the whole ``messages`` list and pending
+  writes carry full tool results, as a generic saver does;
+* ``delta``: ``sessions.SQLiteSessionSaver`` with its message log, payload
+  deduplication and ``--window`` recent messages per read.
+
+Reports, per session length, the checkpoint write (``put`` + ``put_writes``)
+and read (``get_tuple``) time per turn, the messages loaded per turn and the
+on-disk size of the database.
+
+Usage:
+    python benchmarks/bench_sessions.py [--turns 5 20 50] [--window 40] [--json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+os.environ.setdefault("KB_CACHE_TTL", "0")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+import dynamo  # noqa: E402
+import tools  # noqa: E402
+from fakes import FakeKnowledgeBaseRetriever, fake_model_factory  # noqa: E402
+from local_dynamo import LocalDynamoResource, load_sample_items  # noqa: E402
+from models import registry  # noqa: E402
+from sessions import SQLiteSessionSaver  # noqa: E402
+
+QUESTIONS = [
+    "¿Qué película me sirve para empacar café molido?",
+    "Dame la información de la SCx 30",
+    "y su espesor?",
+    "película para envolver quesos",
+    "¿Qué gramaje tiene CL 25?",
+    "la primera opción, ¿qué ancho tiene?",
+    "busco película para empacar snacks con alta barrera",
+    "muchas gracias",
+]
+
+
+class TimedSaver(SQLiteSessionSaver):
+    """Session saver that records the time spent writing and reading checkpoints."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.write_seconds = 0.0
+        self.read_seconds = 0.0
+        self.loaded_messages = 0
+
+    def put(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().put(*args, **kwargs)
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+    def put_writes(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().put_writes(*args, **kwargs)
+        finally:
+            self.write_seconds += time.perf_counter() - start
+
+    def get_tuple(self, config):
+        start = time.perf_counter()
+        try:
+            result = super().get_tuple(config)
+        finally:
+            self.read_seconds += time.perf_counter() - start
+        if result is not None:
+            self.loaded_messages += len(result.checkpoint["channel_values"].get("messages", []))
+        return result
+
+
+def full_saver(path):
+    """Generic layout: ``messages`` is just another channel (full list per version)."""
+    return TimedSaver(path, window=None, messages_channel="__no_message_log__")
+
+
+def delta_saver(path, window):
+    return TimedSaver(path, window=window)
+
+
+def setup():
+    items = load_sample_items()
+    resource = LocalDynamoResource()
+    table = resource.Table(dynamo.TABLE_NAME)
+    for item in items:
+        table.items[item["id"]] = item
+    dynamo.set_dynamodb(resource)
+    registry.set_factory(fake_model_factory())
+    tools.set_kb_retriever(FakeKnowledgeBaseRetriever.from_items(items))
+
+
+async def run_session(builder, saver, turns):
+    graph = builder.compile(checkpointer=saver)
+    config = {"configurable": {"thread_id": "bench"}}
+    for turn in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(content=QUESTIONS[turn % len(QUESTIONS)])]}, config)
+    # Fold the WAL into the database file so the size reflects the data
+    saver._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return {
+        "write_ms_per_turn": round(saver.write_seconds / turns * 1000, 3),
+        "read_ms_per_turn": round(saver.read_seconds / turns * 1000, 3),
+        "messages_loaded_per_turn": round(saver.loaded_messages / turns, 1),
+        "db_kb": round(saver.stats()["bytes"] / 1024, 1),
+    }
+
+
+async def run(turn_counts, window):
+    setup()
+    from graph import builder
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        for turns in turn_counts:
+            row = {"turns": turns}
+            for name, make in (("full", full_saver), ("delta", lambda p: delta_saver(p, window))):
+                saver = make(os.path.join(directory, f"{name}-{turns}.db"))
+                row[name] = await run_session(builder, saver, turns)
+            results.append(row)
+    return {"window": window, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--window", type=int, default=40)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args.turns, args.window))
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"window {result['window']} messages")
+    print(f"  {'turns':>5} | {'saver':5} | {'write ms/turn':>13} | {'read ms/turn':>12} | {'msgs/read':>9} | {'db KB':>8}")
+    for row in result["results"]:
+        for name in ("full", "delta"):
+            r = row[name]
+            print(
+                f"  {row['turns']:>5} | {name:5} | {r['write_ms_per_turn']:>13} | {r['read_ms_per_turn']:>12} | "
+                f"{r['messages_loaded_per_turn']:>9} | {r['db_kb']:>8}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Benchmark: upstream calls during a burst of identical tool requests, with and without single-flight.
+
+Fires ``--callers`` concurrent calls of ``semantic_search_tool`` and of
+``specific_search_tool`` (one thread each, as the graph runs the sync tools),
+arriving uniformly within ``--spread-ms`` and drawn from ``--distinct``
+different queries, against the offline Knowledge Base (``--kb-ms`` per
+retrieval) and DynamoDB (``--dynamo-ms`` per request) stand-ins, with the
+retrieval cache off.
+
+Reports, per tool and mode, the Knowledge Base retrievals and DynamoDB
+requests that reached the stand-ins, the burst wall time, p50/p95 call
+latency and the single-flight coalescing ratio.
+
+Usage:
+    python benchmarks/bench_singleflight.py [--callers 64] [--distinct 4] [--spread-ms 50] [--json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+os.environ["KB_CACHE_TTL"] = "0"
+
+import dynamo  # noqa: E402
+import tools  # noqa: E402
+from bench_graph import percentiles  # noqa: E402
+from fakes import FakeKnowledgeBaseRetriever  # noqa: E402
+from local_dynamo import LocalDynamoResource, load_sample_items  # noqa: E402
+from singleflight import dynamo_flight, kb_flight  # noqa: E402
+
+SEMANTIC_QUERIES = [
+    "película para empacar café molido",
+    "película para envolver quesos",
+    "película para snacks con alta barrera",
+    "película para frutas y vegetales",
+    "película metalizada para laminación",
+    "película termoencogible para botellas",
+]
+CODE_QUERIES = [["SCx 30"], ["CL 25"], ["SC 20", "SL 25"], ["CF 25"], ["CC 60"], ["CWC 20"]]
+
+
+def setup(args):
+    items = load_sample_items()
+    resource = LocalDynamoResource(latency=args.dynamo_ms / 1000)
+    table = resource.Table(dynamo.TABLE_NAME)
+    for item in items:
+        table.items[item["id"]] = item
+    dynamo.set_dynamodb(resource)
+    dynamo.get_code_index(table)  # build the code index outside the burst
+    retriever = FakeKnowledgeBaseRetriever.from_items(items, latency=args.kb_ms / 1000)
+    tools.set_kb_retriever(retriever)
+    return resource, retriever
+
+
+def burst(fn, inputs, spread):
+    """Run ``fn(x)`` for every input, one thread each, arriving within ``spread`` seconds."""
+    rng = random.Random(0)
+    offsets = sorted(rng.uniform(0, spread) for _ in inputs)
+    latencies = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+
+    def call(offset, value):
+        time.sleep(max(0.0, start + offset - time.perf_counter()))
+        call_start = time.perf_counter()
+        fn(value)
+        with lock:
+            latencies.append(time.perf_counter() - call_start)
+
+    with ThreadPoolExecutor(max_workers=len(inputs)) as pool:
+        list(pool.map(call, offsets, inputs))
+    return time.perf_counter() - start, latencies
+
+
+def run_tool(name, args, resource, retriever, enabled):
+    kb_flight.enabled = dynamo_flight.enabled = enabled
+    kb_flight.reset_stats()
+    dynamo_flight.reset_stats()
+    resource.reset_stats()
+    retriever.calls = 0
+    config = {"configurable": {"retriever_backend": "kb"}}
+    if name == "semantic_search_tool":
+        queries = SEMANTIC_QUERIES[: args.distinct]
+        inputs = [queries[i % len(queries)] for i in range(args.callers)]
+        fn = lambda q: tools.semantic_search_tool.invoke({"query": q}, config=config)  # noqa: E731
+    else:
+        queries = CODE_QUERIES[: args.distinct]
+        inputs = [queries[i % len(queries)] for i in range(args.callers)]
+        fn = lambda codes: tools.specific_search_tool.invoke({"FilmCodes": codes}, config=config)  # noqa: E731
+    wall, latencies = burst(fn, inputs, args.spread_ms / 1000)
+    return {
+        "kb_retrievals": retriever.calls,
+        "dynamo_requests": resource.stats.requests,
+        "wall_ms": round(wall * 1000, 3),
+        "latency": percentiles(latencies),
+        "kb_flight": kb_flight.stats(),
+        "dynamo_flight": dynamo_flight.stats(),
+    }
+
+
+def run(args):
+    resource, retriever = setup(args)
+    results = {}
+    for name in ("semantic_search_tool", "specific_search_tool"):
+        results[name] = {
+            mode: run_tool(name, args, resource, retriever, enabled)
+            for mode, enabled in (("off", False), ("singleflight", True))
+        }
+    return {"callers": args.callers, "distinct": args.distinct, "spread_ms": args.spread_ms, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--callers", type=int, default=64)
+    parser.add_argument("--distinct", type=int, default=4, help="Different queries in the burst (max 6)")
+    parser.add_argument("--spread-ms", type=float, default=50, help="Window in which the callers arrive")
+    parser.add_argument("--kb-ms", type=float, default=80)
+    parser.add_argument("--dynamo-ms", type=float, default=10)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = run(args)
+    if args.json:
+        print(json.dumps(result, indent=2, sort_keys=True))
+        return
+    print(f"{result['callers']} callers, {result['distinct']} distinct queries within {result['spread_ms']} ms")
+    print(f"  {'tool':22} | {'mode':12} | {'KB calls':>8} | {'Dynamo req':>10} | {'wall ms':>9} | {'p95 ms':>9} | {'coalesced':>9}")
+    for name, modes in result["results"].items():
+        for mode, r in modes.items():
+            flight = r["kb_flight"] if name == "semantic_search_tool" else r["dynamo_flight"]
+            print(
+                f"  {name:22} | {mode:12} | {r['kb_retrievals']:>8} | {r['dynamo_requests']:>10} | "
+                f"{r['wall_ms']:>9} | {r['latency']['p95_ms']:>9} | {flight['coalescing_ratio']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Benchmark: range queries over film specifications, columnar masks versus a Python scan.
+
+Generates catalogs of ``--sizes`` items whose ``Dimensiones Estándar``
+tables follow the recorded SC item (one row per code with ``Espesor``,
+``Gramaje``, ``Ancho``, ``Núcleo`` and ``Largo y Peso`` as text), builds a
+``spec_index.SpecIndex`` and runs :data:`QUERIES` with
+
+* ``numpy``: ``SpecIndex.match_ids`` (vectorized masks),
+* ``python``: a loop over the same parsed rows testing each constraint, and
+* ``query+limit``: ``SpecIndex.query`` materializing ``--limit`` rows with
+  their fields, as ``spec_filter_tool`` does,
+
+reporting build time, rows, matches and per-query p50/p95 latency.
+
+Usage:
+    python benchmarks/bench_spec_index.py [--sizes 100 10000 100000] [--rows-per-item 8] [--repeat 20] [--json]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from bench_graph import percentiles  # noqa: E402
+from spec_index import PROPERTIES, SpecIndex  # noqa: E402
+
+QUERIES = {
+    "espesor 20-30, gramaje <25": {"espesor": (20, 30), "gramaje": (None, 25)},
+    "ancho 1000, núcleo 6": {"ancho": (1000, 1000), "nucleo": (6, 6)},
+    "espesor >40, largo >10000": {"espesor": (40, None), "largo": (10000, None)},
+    "gramaje 15-16": {"gramaje": (15, 16)},
+}
+THICKNESSES = [12.5, 15, 17.5, 20, 23, 25, 30, 35, 40, 50, 60]
+
+
+def synthetic_catalog(size, rows_per_item, seed=0):
+    """``size`` items with ``rows_per_item`` specification rows each, formatted like the recorded data."""
+    rng = random.Random(seed)
+    items = []
+    for serial in range(size):
+        tipo = f"T{serial}"
+        density = rng.uniform(0.85, 0.95)
+        width = rng.choice([(400, 2000), (300, 1600), (500, 2500)])
+        core = rng.choice(['3" y 6"', '3"', '6"'])
+        rows = []
+        for thickness in sorted(rng.sample(THICKNESSES, rows_per_item)):
+            length = round(230000 / thickness, -2)
+            rows.append({
+                "Código": f"{tipo} {int(thickness)}",
+                "Espesor": f"{thickness:.1f}",
+                "Gramaje": f"{thickness * density:.1f}",
+                "Ancho": f"{width[0]:,} a {width[1]:,}",
+                "Núcleo": core,
+                "Largo y Peso": {
+                    "570 mm O Diam.": {"Peso": "2.04 kg/cm", "Largo": f"{int(length):,}"},
+                    "760 mm O": {"Peso": "3.77 kg/cm", "Largo": f"{int(length * 1.84):,}"},
+                },
+            })
+        items.append({"id": tipo.lower(), "Tipo": tipo, "Dimensiones Estándar": {"Tabla": rows}})
+    return items
+
+
+def python_query(rows, ranges):
+    """The same semantics as ``SpecIndex.mask`` over a list of ``{name: (low, high)}`` dicts."""
+    matches = []
+    for row in rows:
+        for name, (minimum, maximum) in ranges.items():
+            low, high = row[name]
+            if math.isnan(low) or (minimum is not None and high < minimum) or (maximum is not None and low > maximum):
+                break
+        else:
+            matches.append(row["id"])
+    return matches
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return result, percentiles(samples)
+
+
+def run(sizes, rows_per_item, repeat, limit):
+    results = []
+    for size in sizes:
+        items = synthetic_catalog(size, rows_per_item)
+        start = time.perf_counter()
+        index = SpecIndex.from_items(items)
+        build = time.perf_counter() - start
+        rows = [
+            {"id": index.ids[i], **{name: (float(index.low[name][i]), float(index.high[name][i])) for name in PROPERTIES}}
+            for i in range(len(index))
+        ]
+        level = {"items": size, "rows": len(index), "build_ms": round(build * 1000, 3), "queries": {}}
+        for label, ranges in QUERIES.items():
+            matches, vectorized = timed(lambda: index.match_ids(ranges), repeat)
+            expected, scan = timed(lambda: python_query(rows, ranges), repeat)
+            assert matches.tolist() == expected
+            _, tool = timed(lambda: index.query(ranges, limit=limit), repeat)
+            level["queries"][label] = {"matches": len(matches), "numpy": vectorized, "python": scan, "query_limit": tool}
+        results.append(level)
+    return {"rows_per_item": rows_per_item, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 100000])
+    parser.add_argument("--rows-per-item", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=50, help="Rows materialized by the tool-style query")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = run(args.sizes, args.rows_per_item, args.repeat, args.limit)
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    for level in result["results"]:
+        print(f"{level['items']} items, {level['rows']} rows, built in {level['build_ms']} ms")
+        print(
+            f"  {'query':28} | {'matches':>8} | {'numpy p50 ms':>12} | {'numpy p95 ms':>12} | {'python p50 ms':>13} | "
+            f"{'query+limit p50 ms':>18}"
+        )
+        for label, q in level["queries"].items():
+            print(
+                f"  {label:28} | {q['matches']:>8} | {q['numpy']['p50_ms']:>12} | {q['numpy']['p95_ms']:>12} | "
+                f"{q['python']['p50_ms']:>13} | {q['query_limit']['p50_ms']:>18}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Benchmark: full-table scan vs keyed lookups for ``specific_search_tool``.
+
+Runs the old ``scan`` + ``Attr('id').is_in(...)`` path and the new code index +
+``BatchGetItem`` path against an in-memory DynamoDB stand-in of growing size
+and reports, per table size, the items read, read units and latency of one
+lookup.
+
+Usage:
+    python benchmarks/bench_specific_search.py [--sizes 10 1000 10000] [--latency 0.002] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from boto3.dynamodb.conditions import Attr
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "retrieval_graph"))
+
+from dynamo import batch_get_items, build_code_index, expand_film_codes, normalize_code, resolve_film_ids  # noqa: E402
+from local_dynamo import seeded_resource  # noqa: E402
+
+QUERY = ["CC 60", "SCx 30", "CL"]
+
+
+def scan_lookup(table, codes):
+    """The previous implementation: paginate a filtered scan over the whole table."""
+    transformed = [normalize_code(code) for code in expand_film_codes(codes)]
+    kwargs = {"FilterExpression": Attr("id").is_in(transformed)}
+    items = []
+    while True:
+        response = table.scan(**kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def keyed_lookup(resource, table, code_index, codes):
+    film_ids = resolve_film_ids(expand_film_codes(codes), code_index)
+    return batch_get_items(resource, film_ids, table_name=table.name)
+
+
+def measure(resource, fn):
+    resource.reset_stats()
+    start = time.perf_counter()
+    items = fn()
+    elapsed = time.perf_counter() - start
+    stats = resource.stats
+    return {
+        "latency_ms": round(elapsed * 1000, 3),
+        "requests": stats.requests,
+        "items_read": stats.items_read,
+        "read_units": stats.read_units,
+        "items_returned": len(items),
+    }
+
+
+def run(sizes, latency):
+    results = []
+    for size in sizes:
+        resource = seeded_resource(size, latency=latency)
+        table = resource.Table("obenGroup_films")
+
+        resource.reset_stats()
+        start = time.perf_counter()
+        code_index = build_code_index(table)
+        index_build_ms = (time.perf_counter() - start) * 1000
+
+        scan = measure(resource, lambda: scan_lookup(table, QUERY))
+        keyed = measure(resource, lambda: keyed_lookup(resource, table, code_index, QUERY))
+        results.append({
+            "table_size": size,
+            "index_build_ms": round(index_build_ms, 3),
+            "scan": scan,
+            "keyed": keyed,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 50000])
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated round trip per request (s)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.latency)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"query={QUERY} simulated_rtt={args.latency * 1000:.1f} ms")
+    print(f"{'size':>8} | {'scan read':>9} {'scan RCU':>9} {'scan ms':>9} | "
+          f"{'keyed read':>10} {'keyed RCU':>9} {'keyed ms':>9} | {'index ms':>9}")
+    for row in results:
+        scan, keyed = row["scan"], row["keyed"]
+        print(f"{row['table_size']:>8} | {scan['items_read']:>9} {scan['read_units']:>9.1f} "
+              f"{scan['latency_ms']:>9.2f} | {keyed['items_read']:>10} {keyed['read_units']:>9.1f} "
+              f"{keyed['latency_ms']:>9.2f} | {row['index_build_ms']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
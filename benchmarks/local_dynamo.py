@@ -0,0 +1,290 @@
+"""In-memory stand-in for the parts of the DynamoDB resource API the repo uses.
+
+It mimics ``boto3.resource('dynamodb')`` closely enough for the benchmarks:
+``Table(name)`` with ``scan`` / ``get_item`` / ``put_item`` and the resource
+level ``batch_get_item`` / ``batch_write_item`` (including ``UnprocessedKeys``
+/ ``UnprocessedItems``). Every request is counted together with the items it
+read and the read/write units DynamoDB would have charged, and an optional
+round-trip latency is simulated so results scale like the real service.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+SCAN_PAGE_BYTES = 1024 * 1024
+
+
+def item_size(item: dict) -> int:
+    """Approximate DynamoDB item size in bytes."""
+    return len(json.dumps(item, default=str, ensure_ascii=False).encode("utf-8"))
+
+
+def _read_units(size: int) -> float:
+    # Lectura eventualmente consistente: 0.5 RCU por cada bloque de 4 KB
+    return math.ceil(max(size, 1) / 4096) * 0.5
+
+
+def _write_units(size: int) -> float:
+    return float(math.ceil(max(size, 1) / 1024))
+
+
+def _attr_value(item: dict, name: str) -> Any:
+    return item.get(name)
+
+
+def _evaluate(condition, item: dict) -> bool:
+    """Evaluate a ``boto3.dynamodb.conditions`` expression against ``item``."""
+    operator = condition.expression_operator
+    values = condition._values
+
+    def resolve(value):
+        name = getattr(value, "name", None)
+        if name is not None and value.__class__.__name__ in ("Attr", "Key"):
+            return _attr_value(item, name)
+        return value
+
+    if operator == "AND":
+        return _evaluate(values[0], item) and _evaluate(values[1], item)
+    if operator == "OR":
+        return _evaluate(values[0], item) or _evaluate(values[1], item)
+    if operator == "NOT":
+        return not _evaluate(values[0], item)
+    if operator == "IN":
+        return resolve(values[0]) in values[1]
+    if operator == "=":
+        return resolve(values[0]) == resolve(values[1])
+    if operator == "<>":
+        return resolve(values[0]) != resolve(values[1])
+    if operator == "contains":
+        container = resolve(values[0])
+        return container is not None and resolve(values[1]) in container
+    if operator == "begins_with":
+        value = resolve(values[0])
+        return isinstance(value, str) and value.startswith(values[1])
+    if operator == "attribute_exists":
+        return values[0].name in item
+    if operator == "attribute_not_exists":
+        return values[0].name not in item
+    raise NotImplementedError(f"Unsupported condition operator: {operator}")
+
+
+def _project(item: dict, projection: Optional[str], names: Optional[dict]) -> dict:
+    if not projection:
+        return dict(item)
+    names = names or {}
+    keys = [names.get(part.strip(), part.strip()) for part in projection.split(",")]
+    return {key: item[key] for key in keys if key in item}
+
+
+@dataclass
+class DynamoStats:
+    """Counters accumulated by a :class:`LocalDynamoResource`."""
+
+    requests: int = 0
+    items_read: int = 0
+    items_written: int = 0
+    read_units: float = 0.0
+    write_units: float = 0.0
+
+
+class LocalTable:
+    """A single hash-keyed table (partition key ``id``)."""
+
+    def __init__(self, resource: "LocalDynamoResource", name: str):
+        self._resource = resource
+        self.name = name
+        self.items: dict[str, dict] = {}
+
+    def scan(
+        self,
+        FilterExpression=None,
+        ExclusiveStartKey: Optional[dict] = None,
+        ProjectionExpression: Optional[str] = None,
+        ExpressionAttributeNames: Optional[dict] = None,
+        Limit: Optional[int] = None,
+        **_: Any,
+    ) -> dict:
+        self._resource._request()
+        keys = sorted(self.items)
+        start = 0
+        if ExclusiveStartKey:
+            start = keys.index(ExclusiveStartKey["id"]) + 1
+
+        page, page_bytes, index = [], 0, start
+        while index < len(keys):
+            item = self.items[keys[index]]
+            size = item_size(item)
+            if page_bytes and page_bytes + size > SCAN_PAGE_BYTES:
+                break
+            page_bytes += size
+            index += 1
+            # Un scan paga por cada item leído, pase o no el filtro
+            self._resource._read(item, size)
+            if FilterExpression is None or _evaluate(FilterExpression, item):
+                page.append(_project(item, ProjectionExpression, ExpressionAttributeNames))
+            if Limit and index - start >= Limit:
+                break
+
+        response: dict[str, Any] = {"Items": page, "Count": len(page)}
+        if index < len(keys):
+            response["LastEvaluatedKey"] = {"id": keys[index - 1]}
+        return response
+
+    def get_item(self, Key: dict, **_: Any) -> dict:
+        self._resource._request()
+        item = self.items.get(Key["id"])
+        if item is None:
+            return {}
+        self._resource._read(item)
+        return {"Item": dict(item)}
+
+    def put_item(self, Item: dict, **_: Any) -> dict:
+        self._resource._request()
+        self._resource._write(Item)
+        self.items[Item["id"]] = dict(Item)
+        return {}
+
+
+class LocalDynamoResource:
+    """Drop-in replacement for ``boto3.resource('dynamodb')`` in benchmarks.
+
+    Args:
+        latency: Simulated round-trip time per request, in seconds.
+        unprocessed_rate: Probability that a key/item in a batch request is
+            returned as unprocessed, to exercise retry paths.
+        seed: Seed for the unprocessed-key randomness.
+    """
+
+    def __init__(self, latency: float = 0.0, unprocessed_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.unprocessed_rate = unprocessed_rate
+        self.stats = DynamoStats()
+        self._tables: dict[str, LocalTable] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def Table(self, name: str) -> LocalTable:
+        with self._lock:
+            if name not in self._tables:
+                self._tables[name] = LocalTable(self, name)
+            return self._tables[name]
+
+    def reset_stats(self) -> None:
+        self.stats = DynamoStats()
+
+    def _request(self) -> None:
+        with self._lock:
+            self.stats.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read(self, item: dict, size: Optional[int] = None) -> float:
+        units = _read_units(size or item_size(item))
+        with self._lock:
+            self.stats.items_read += 1
+            self.stats.read_units += units
+        return units
+
+    def _write(self, item: dict) -> float:
+        units = _write_units(item_size(item))
+        with self._lock:
+            self.stats.items_written += 1
+            self.stats.write_units += units
+        return units
+
+    def _unprocessed(self) -> bool:
+        return self.unprocessed_rate > 0 and self._random.random() < self.unprocessed_rate
+
+    def batch_get_item(self, RequestItems: dict, ReturnConsumedCapacity: str = "NONE", **_: Any) -> dict:
+        self._request()
+        responses: dict[str, list] = {}
+        unprocessed: dict[str, dict] = {}
+        consumed: dict[str, float] = {}
+        for table_name, request in RequestItems.items():
+            keys = request["Keys"]
+            if len(keys) > 100:
+                raise ValueError("Too many items requested for the BatchGetItem call")
+            table = self.Table(table_name)
+            for key in keys:
+                if self._unprocessed():
+                    unprocessed.setdefault(table_name, {"Keys": []})["Keys"].append(key)
+                    continue
+                item = table.items.get(key["id"])
+                if item is not None:
+                    consumed[table_name] = consumed.get(table_name, 0.0) + self._read(item)
+                    responses.setdefault(table_name, []).append(dict(item))
+        response: dict[str, Any] = {"Responses": responses, "UnprocessedKeys": unprocessed}
+        if ReturnConsumedCapacity != "NONE":
+            response["ConsumedCapacity"] = [
+                {"TableName": name, "CapacityUnits": units} for name, units in consumed.items()
+            ]
+        return response
+
+    def batch_write_item(self, RequestItems: dict, ReturnConsumedCapacity: str = "NONE", **_: Any) -> dict:
+        self._request()
+        unprocessed: dict[str, list] = {}
+        consumed: dict[str, float] = {}
+        for table_name, requests in RequestItems.items():
+            if len(requests) > 25:
+                raise ValueError("Too many items requested for the BatchWriteItem call")
+            table = self.Table(table_name)
+            for request in requests:
+                if self._unprocessed():
+                    unprocessed.setdefault(table_name, []).append(request)
+                    continue
+                item = request["PutRequest"]["Item"]
+                consumed[table_name] = consumed.get(table_name, 0.0) + self._write(item)
+                table.items[item["id"]] = dict(item)
+        response: dict[str, Any] = {"UnprocessedItems": unprocessed}
+        if ReturnConsumedCapacity != "NONE":
+            response["ConsumedCapacity"] = [
+                {"TableName": name, "CapacityUnits": units} for name, units in consumed.items()
+            ]
+        return response
+
+
+def load_sample_items(path: Optional[str] = None) -> list[dict]:
+    """Load the film items recorded in ``items_from_dynamo.txt``."""
+    import ast
+    import os
+
+    path = path or os.path.join(os.path.dirname(__file__), os.pardir, "items_from_dynamo.txt")
+    with open(path, encoding="utf-8") as f:
+        return ast.literal_eval(f.read())
+
+
+def synthetic_items(count: int, samples: Optional[list[dict]] = None) -> list[dict]:
+    """Return ``count`` items: the recorded samples followed by renamed copies.
+
+    Copies get a new ``Tipo`` / ``id`` (``'cl'`` -> ``'clz17'``) and matching
+    ``Códigos de Película`` so they never collide with the real codes.
+    """
+    samples = samples or load_sample_items()
+    items = [dict(item) for item in samples[:count]]
+    serial = 0
+    while len(items) < count:
+        template = samples[serial % len(samples)]
+        tipo = f"{template['Tipo']}z{serial}"
+        item = dict(template)
+        item["Tipo"] = tipo
+        item["id"] = tipo.lower()
+        item["Códigos de Película"] = [
+            code.replace(template["Tipo"], tipo, 1) for code in template.get("Códigos de Película", [])
+        ]
+        items.append(item)
+        serial += 1
+    return items
+
+
+def seeded_resource(count: int, table_name: str = "obenGroup_films", **kwargs: Any) -> LocalDynamoResource:
+    """Create a resource whose ``table_name`` holds ``synthetic_items(count)``."""
+    resource = LocalDynamoResource(**kwargs)
+    table = resource.Table(table_name)
+    for item in synthetic_items(count):
+        table.items[item["id"]] = item
+    return resource
@@ -0,0 +1,239 @@
+"""Whole-answer cache in front of ``graph.ainvoke`` for first turns.
+
+Many sessions open with the same question, and answering it from scratch
+costs up to three model calls plus the Knowledge Base and DynamoDB. For
+turns without prior context (the input is a single user message)
+:meth:`AnswerCache.ainvoke` looks the answer up under a key built from
+
+* the normalized question (:func:`retrieval_cache.normalize_text`: every
+  word and number in order, so "20 micras con gramaje 30" and "30 micras
+  con gramaje 20" are different questions),
+* the model settings (per-node tiers and cascade) and a hash of every
+  system prompt,
+* the retrieval settings that change the context (backend, item format and
+  fields), and
+* the catalog snapshot version (when the catalog is enabled),
+
+so a prompt, model or catalog change makes old entries unreachable; they
+then age out through the store's TTL/LRU eviction.
+
+Without the catalog there is no version that tracks DynamoDB (the table
+has no cheap change marker), so those answers are only served for
+``unversioned_ttl`` seconds (:data:`DEFAULT_UNVERSIONED_TTL`,
+``ANSWER_CACHE_UNVERSIONED_TTL``); ``0`` disables caching without the
+catalog. Entries live in the same
+stores as the retrieval cache (:class:`retrieval_cache.MemoryStore` or
+:class:`retrieval_cache.SQLiteStore`).
+
+With a session checkpointer (``sessions.py``) a turn counts as the first
+only when its thread has no messages yet, and a hit is written to the
+thread's state so the next turn sees it.
+
+Every answer returned through the cache carries
+``response_metadata["answer_cache"]`` (``hit``, ``key`` and, on hits,
+``age_seconds``), and the output has a top-level ``"answer_cache"`` entry.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage, messages_from_dict, messages_to_dict
+from langchain_core.runnables import RunnableConfig
+
+import tracing
+from catalog import get_catalog
+from configuration import AgentConfiguration
+from retrieval_cache import CacheEntry, CacheStore, MemoryStore, SQLiteStore, normalize_text
+
+DEFAULT_TTL = 3600.0
+DEFAULT_UNVERSIONED_TTL = 300.0
+DEFAULT_MAX_ENTRIES = 1024
+
+PROMPT_FIELDS = (
+    "router_system_prompt",
+    "more_info_system_prompt",
+    "general_system_prompt",
+    "research_plan_system_prompt",
+    "generate_queries_system_prompt",
+    "response_system_prompt",
+)
+CONTEXT_FIELDS = ("retriever_backend", "item_format", "item_fields")
+MODEL_FIELDS = ("model", "max_tokens", "temperature", "model_tiers", "cascade_model", "cascade_min_confidence")
+
+
+def _first_turn_question(inputs: dict[str, Any]) -> Optional[str]:
+    """Return the question if ``inputs`` is a turn without prior context."""
+    messages = inputs.get("messages") or []
+    if isinstance(messages, str):
+        return messages
+    if len(messages) != 1:
+        return None
+    message = messages[0]
+    if isinstance(message, HumanMessage):
+        content = message.content
+    elif isinstance(message, dict) and message.get("role") in ("user", "human"):
+        content = message.get("content")
+    elif isinstance(message, str):
+        content = message
+    else:
+        return None
+    return content if isinstance(content, str) and content.strip() else None
+
+
+def configuration_fingerprint(configuration: AgentConfiguration) -> str:
+    """Hash of the model settings, the system prompts and the context settings."""
+    payload = {
+        "model": {name: getattr(configuration, name) for name in MODEL_FIELDS},
+        "prompts": {name: hashlib.sha1(getattr(configuration, name).encode("utf-8")).hexdigest() for name in PROMPT_FIELDS},
+        "context": {name: getattr(configuration, name) for name in CONTEXT_FIELDS},
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _mark(messages: list[BaseMessage], marker: dict[str, Any]) -> None:
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            message.response_metadata["answer_cache"] = marker
+            return
+
+
+class AnswerCache:
+    """Cache of complete graph answers for first-turn questions.
+
+    Args:
+        store: Where entries live. Defaults to a :class:`MemoryStore` with
+            :data:`DEFAULT_TTL` and :data:`DEFAULT_MAX_ENTRIES`.
+        unversioned_ttl: Seconds an answer is served while the catalog is
+            disabled (no version to invalidate it); ``0`` disables caching then.
+    """
+
+    def __init__(self, store: Optional[CacheStore] = None, unversioned_ttl: float = DEFAULT_UNVERSIONED_TTL):
+        self.store = store if store is not None else MemoryStore(max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL)
+        self.unversioned_ttl = unversioned_ttl
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def key(self, question: str, configuration: AgentConfiguration, catalog_version: Optional[str] = None) -> str:
+        return "|".join((normalize_text(question), configuration_fingerprint(configuration), catalog_version or "-"))
+
+    @staticmethod
+    def _cacheable(messages: list[BaseMessage]) -> bool:
+        if not messages or not isinstance(messages[-1], AIMessage) or messages[-1].tool_calls:
+            return False
+        return not any(isinstance(m, ToolMessage) and m.status == "error" for m in messages)
+
+    async def ainvoke(self, inputs: dict[str, Any], config: Optional[RunnableConfig] = None, *, graph: Any = None) -> dict[str, Any]:
+        """``graph.ainvoke(inputs, config)``, answered from the cache for first turns."""
+        if graph is None:
+            from graph import graph
+
+        question = _first_turn_question(inputs)
+        session = bool(getattr(graph, "checkpointer", None)) and bool((config or {}).get("configurable", {}).get("thread_id"))
+        if question is not None and session:
+            # Con sesiones persistidas, un solo mensaje de entrada no implica un primer turno
+            snapshot = await graph.aget_state(config)
+            if snapshot.values.get("messages"):
+                question = None
+        catalog = get_catalog()
+        catalog_version = catalog.version if catalog is not None else None
+        if question is None or (catalog_version is None and self.unversioned_ttl <= 0):
+            self._count("bypassed")
+            return await graph.ainvoke(inputs, config)
+
+        key = self.key(question, AgentConfiguration.from_runnable_config(config), catalog_version)
+        with tracing.span("answer_cache", "cache") as span:
+            entry = self.store.get(key)
+            if entry is not None and catalog_version is None and self.store.now() - entry.created_at > self.unversioned_ttl:
+                # Sin versión del catálogo, un cambio en DynamoDB no invalidaría la entrada
+                entry = None
+            span.set(cache="hit" if entry is not None else "miss")
+        if entry is not None:
+            self._count("hits")
+            cached = entry.documents[0]
+            messages = [HumanMessage(content=question)] + messages_from_dict(cached["messages"])
+            marker = {"hit": True, "key": key, "age_seconds": round(self.store.now() - entry.created_at, 3)}
+            _mark(messages, marker)
+            if session:
+                await graph.aupdate_state(config, {**cached["state"], "messages": messages}, as_node="respond")
+            return {**cached["state"], "messages": messages, "answer_cache": marker}
+
+        self._count("misses")
+        output = await graph.ainvoke(inputs, config)
+        answer = list(output.get("messages", []))[1:]
+        if self._cacheable(answer):
+            state = {name: value for name, value in output.items() if name == "router"}
+            self.store.set(CacheEntry(
+                key=key,
+                documents=[{"messages": messages_to_dict(answer), "state": state}],
+                created_at=self.store.now(),
+            ))
+        marker = {"hit": False, "key": key}
+        _mark(answer, marker)
+        return {**output, "answer_cache": marker}
+
+    def stats(self) -> dict[str, Any]:
+        """Return hits, misses, bypassed (non first-turn) calls and the hit rate."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def configure_answer_cache(cache: Optional[AnswerCache]) -> None:
+    """Install ``cache`` as the process-wide answer cache (``None`` resets to the default)."""
+    global _answer_cache
+    with _answer_cache_lock:
+        _answer_cache = cache
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Return the process-wide answer cache, creating the default one on first use.
+
+    Set ``ANSWER_CACHE_PATH`` to share a SQLite file between workers,
+    ``ANSWER_CACHE_TTL`` / ``ANSWER_CACHE_MAX_ENTRIES`` /
+    ``ANSWER_CACHE_UNVERSIONED_TTL`` to tune it, or ``ANSWER_CACHE_TTL=0`` to
+    disable it.
+    """
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                ttl = float(os.environ.get("ANSWER_CACHE_TTL", DEFAULT_TTL))
+                if ttl <= 0:
+                    return None
+                max_entries = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+                path = os.environ.get("ANSWER_CACHE_PATH")
+                store = (
+                    SQLiteStore(path, max_entries=max_entries, ttl=ttl)
+                    if path
+                    else MemoryStore(max_entries=max_entries, ttl=ttl)
+                )
+                unversioned_ttl = float(os.environ.get("ANSWER_CACHE_UNVERSIONED_TTL", DEFAULT_UNVERSIONED_TTL))
+                _answer_cache = AnswerCache(store, unversioned_ttl=min(unversioned_ttl, ttl))
+    return _answer_cache
+
+
+async def cached_ainvoke(inputs: dict[str, Any], config: Optional[RunnableConfig] = None, *, graph: Any = None) -> dict[str, Any]:
+    """Invoke the graph through the process-wide answer cache (directly when it is disabled)."""
+    cache = get_answer_cache()
+    if cache is None:
+        if graph is None:
+            from graph import graph
+        return await graph.ainvoke(inputs, config)
+    return await cache.ainvoke(inputs, config, graph=graph)
@@ -0,0 +1,287 @@
+"""Batch runs of the graph over many questions (QA, catalog checks).
+
+:func:`run_batch` pushes an iterable of questions, or a JSONL file, through
+``graph.ainvoke`` and appends one JSON line per question to the output file
+as soon as it finishes::
+
+    {"id": "q-17", "question": "...", "answer": "...", "route": "semantic_search",
+     "latency_ms": 1840.2, "attempts": 1, "error": null}
+
+* Concurrency is bounded by an :class:`AdaptiveLimiter` (AIMD): it grows by
+  one slot per window of successful calls and is halved, at most once per
+  cooldown, when Bedrock or DynamoDB throttle (``ThrottlingException``,
+  ``ProvisionedThroughputExceededException``, ...). Throttled questions are
+  retried with exponential backoff and jitter.
+* Re-running with the same output file resumes: ids that already have a
+  successful line are skipped, failed ones are tried again.
+* The returned :class:`BatchReport` has throughput, error rate, throttles,
+  retries and latency percentiles.
+
+Input lines are JSON objects with an ``id`` (or ``request_id``) and a
+``question`` (or ``query`` / ``message`` / ``body``); plain strings get their
+line number as id.
+
+Usage:
+    python retrieval_graph/batch.py questions.jsonl -o results.jsonl [--concurrency 8] [--max-concurrency 32]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Iterator, Optional, Union
+
+from dynamo import THROTTLING_CODES, LatencyRecorder, is_throttling  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+ID_KEYS = ("id", "request_id")
+QUESTION_KEYS = ("question", "query", "message", "body")
+
+Question = tuple[str, str]
+"""``(id, question)``."""
+
+
+class AdaptiveLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease.
+
+    Args:
+        initial: Starting number of concurrent calls.
+        minimum: Floor of the limit.
+        maximum: Ceiling of the limit.
+        cooldown: Seconds after a decrease during which further throttles do
+            not decrease the limit again (they were caused by the old limit).
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64, cooldown: float = 2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = float("-inf")
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+                    logger.info("throttled: concurrency limit -> %d", int(self.limit))
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch run."""
+
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    """Questions already answered in the output file (resume)."""
+    throttled: int = 0
+    """Attempts rejected by throttling."""
+    retries: int = 0
+    seconds: float = 0.0
+    final_concurrency: int = 0
+    errors: dict[str, int] = field(default_factory=dict)
+    """Error type -> questions that failed with it."""
+    latency: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        """Answered questions per second."""
+        return self.succeeded / self.seconds if self.seconds else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        attempted = self.succeeded + self.failed
+        return self.failed / attempted if attempted else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "throughput": round(self.throughput, 2), "error_rate": round(self.error_rate, 4)}
+
+
+def parse_question(record: Any, line_number: int) -> Question:
+    if isinstance(record, str):
+        return str(line_number), record
+    question_id = next((str(record[key]) for key in ID_KEYS if key in record), str(line_number))
+    question = next((record[key] for key in QUESTION_KEYS if record.get(key)), None)
+    if question is None:
+        raise ValueError(f"line {line_number}: no question field ({', '.join(QUESTION_KEYS)})")
+    return question_id, question
+
+
+def read_questions(path: str) -> Iterator[Question]:
+    """Yield ``(id, question)`` from a JSONL file (blank lines are skipped)."""
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield parse_question(json.loads(line), line_number)
+
+
+def completed_ids(path: str) -> set[str]:
+    """Ids with a successful result in an existing output file."""
+    done: set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # línea cortada por una interrupción
+            if record.get("error") is None and "id" in record:
+                done.add(str(record["id"]))
+    return done
+
+
+def _answer_text(output: dict[str, Any]) -> str:
+    messages = output.get("messages") or []
+    if not messages:
+        return ""
+    content = messages[-1].content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content
+
+
+async def _default_invoke(question: str, config: Optional[dict]) -> dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+
+    from graph import graph
+
+    if graph.checkpointer and not (config or {}).get("configurable", {}).get("thread_id"):
+        # Con sesiones activas cada pregunta es una conversación nueva
+        config = {**(config or {}), "configurable": {**(config or {}).get("configurable", {}), "thread_id": f"batch-{uuid.uuid4()}"}}
+    return await graph.ainvoke({"messages": [HumanMessage(content=question)]}, config)
+
+
+async def run_batch(
+    questions: Union[str, Iterable[Union[str, dict, Question]]],
+    output_path: str,
+    *,
+    invoke: Optional[Callable[[str, Optional[dict]], Awaitable[dict[str, Any]]]] = None,
+    config: Optional[dict] = None,
+    limiter: Optional[AdaptiveLimiter] = None,
+    max_retries: int = 6,
+    base_backoff: float = 0.5,
+    max_backoff: float = 30.0,
+) -> BatchReport:
+    """Answer ``questions`` and append one JSON line per question to ``output_path``.
+
+    Args:
+        questions: A JSONL path, or an iterable of strings, dicts or ``(id, question)`` tuples.
+        output_path: JSONL results file; existing successful ids are skipped.
+        invoke: ``await invoke(question, config)`` returning the graph output;
+            defaults to ``graph.ainvoke`` on a single user message.
+        config: ``RunnableConfig`` passed to every call.
+        limiter: Concurrency control; defaults to ``AdaptiveLimiter()``.
+        max_retries: Retries per question on throttling.
+        base_backoff: First backoff in seconds (doubles per retry, with jitter).
+        max_backoff: Backoff ceiling in seconds.
+    """
+    invoke = invoke or _default_invoke
+    limiter = limiter or AdaptiveLimiter()
+    if isinstance(questions, str):
+        questions = read_questions(questions)
+    done = completed_ids(output_path)
+    report = BatchReport()
+    latency = LatencyRecorder(maxlen=100_000)
+    output_lock = asyncio.Lock()
+    start = time.perf_counter()
+
+    async def answer(question_id: str, question: str, output) -> None:
+        attempts = 0
+        record: dict[str, Any] = {"id": question_id, "question": question}
+        while True:
+            attempts += 1
+            await limiter.acquire()
+            throttled = False
+            call_start = time.perf_counter()
+            try:
+                result = await invoke(question, config)
+                elapsed = time.perf_counter() - call_start
+                latency.record(elapsed)
+                router = result.get("router") or {}
+                record.update(answer=_answer_text(result), route=router.get("type"), latency_ms=round(elapsed * 1000, 1), error=None)
+                report.succeeded += 1
+                break
+            except Exception as e:
+                throttled = is_throttling(e)
+                if throttled:
+                    report.throttled += 1
+                if throttled and attempts <= max_retries:
+                    report.retries += 1
+                    delay = min(max_backoff, base_backoff * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+                else:
+                    record.update(answer=None, route=None, latency_ms=None, error=f"{type(e).__name__}: {e}")
+                    report.failed += 1
+                    report.errors[type(e).__name__] = report.errors.get(type(e).__name__, 0) + 1
+                    break
+            finally:
+                await limiter.release(throttled)
+            await asyncio.sleep(delay)
+        record["attempts"] = attempts
+        async with output_lock:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+
+    with open(output_path, "a", encoding="utf-8") as output:
+        tasks: set[asyncio.Task] = set()
+        for line_number, item in enumerate(questions, 1):
+            question_id, question = item if isinstance(item, tuple) else parse_question(item, line_number)
+            report.total += 1
+            if question_id in done:
+                report.skipped += 1
+                continue
+            # No más tareas pendientes que el doble del límite: la entrada puede ser enorme
+            while len(tasks) >= max(2, 2 * limiter.maximum):
+                _, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            tasks.add(asyncio.create_task(answer(question_id, question, output)))
+        if tasks:
+            await asyncio.wait(tasks)
+
+    report.seconds = time.perf_counter() - start
+    report.final_concurrency = int(limiter.limit)
+    report.latency = latency.summary()
+    return report
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file (appended; reruns resume)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Initial concurrent questions")
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--max-retries", type=int, default=6)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    limiter = AdaptiveLimiter(initial=args.concurrency, maximum=args.max_concurrency)
+    report = asyncio.run(run_batch(args.input, args.output, limiter=limiter, max_retries=args.max_retries))
+    json.dump(report.to_dict(), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
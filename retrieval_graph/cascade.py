@@ -0,0 +1,171 @@
+"""Per-node model tiers and the cascade between them.
+
+Every node calls the tiers of ``AgentConfiguration.model_settings(node)``
+through :func:`run_tiers`: a cheap, fast model first and, only when its
+output is rejected, the next (stronger) one. A tier is rejected when
+
+* its structured output does not parse (the call raises one of
+  :data:`PARSE_ERRORS`, or ``include_raw`` reports a ``parsing_error``), or
+* the node's ``check`` returns a reason: a missing or invalid tool call, a
+  route outside the schema, a router confidence below
+  ``cascade_min_confidence``.
+
+The last tier's output is always returned, so a one-tier node behaves
+exactly like a plain model call.
+
+Each call is recorded per ``(node, model)`` in :data:`tier_stats` (calls,
+escalations by reason, errors, latency percentiles, input/output tokens),
+exposed by the server's ``/stats``, and, with tracing enabled, as a
+``model`` span carrying the model, the tier and the token counters.
+"""
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Optional, Sequence, TypeVar
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.language_models import BaseChatModel
+
+import tracing
+from configuration import ModelSettings
+from dynamo import LatencyRecorder
+from models import get_chat_model
+
+logger = logging.getLogger(__name__)
+
+PARSE_ERRORS = (OutputParserException, ValueError)
+"""Exceptions that mean the model answered but the answer did not parse
+(pydantic's ``ValidationError`` is a ``ValueError`` subclass). Anything
+else propagates: throttling, and ``KeyError`` / ``TypeError`` raised by node
+code, which are bugs rather than a reason to pay for a stronger tier."""
+
+T = TypeVar("T")
+
+
+class TierRecord:
+    """Totals for one model used by one node."""
+
+    def __init__(self):
+        self.errors = 0
+        self.escalations: Counter = Counter()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.latency = LatencyRecorder()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            **self.latency.summary(),
+            "errors": self.errors,
+            "escalations": sum(self.escalations.values()),
+            "escalation_reasons": dict(self.escalations),
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+class TierStats:
+    """Per ``(node, model)`` call statistics."""
+
+    def __init__(self):
+        self._records: dict[tuple[str, str], TierRecord] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        node: str,
+        model: str,
+        seconds: float,
+        usage: Optional[dict] = None,
+        escalated: Optional[str] = None,
+        error: bool = False,
+    ) -> None:
+        with self._lock:
+            entry = self._records.get((node, model))
+            if entry is None:
+                entry = self._records[(node, model)] = TierRecord()
+            entry.latency.record(seconds)
+            if error:
+                entry.errors += 1
+            if escalated:
+                entry.escalations[escalated] += 1
+            if usage:
+                entry.input_tokens += usage.get("input_tokens", 0)
+                entry.output_tokens += usage.get("output_tokens", 0)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Return ``{"node/model": totals}``."""
+        with self._lock:
+            items = sorted(self._records.items())
+        return {f"{node}/{model}": entry.summary() for (node, model), entry in items}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+tier_stats = TierStats()
+
+
+def usage_of(output: Any) -> Optional[dict]:
+    """Token usage of a model output: an ``AIMessage`` or an ``include_raw`` dict."""
+    if isinstance(output, dict) and "raw" in output:
+        output = output["raw"]
+    return getattr(output, "usage_metadata", None)
+
+
+def parsed_output(output: dict) -> Any:
+    """Return the parsed value of an ``include_raw`` structured output, raising its parse error."""
+    if output.get("parsing_error") is not None:
+        raise output["parsing_error"]
+    if output.get("parsed") is None:
+        raise ValueError("structured output did not parse")
+    return output["parsed"]
+
+
+async def run_tiers(
+    node: str,
+    tiers: Sequence[ModelSettings],
+    call: Callable[[BaseChatModel], Awaitable[T]],
+    check: Optional[Callable[[T], Optional[str]]] = None,
+) -> T:
+    """Run ``call(model)`` on each tier in turn until one is accepted.
+
+    Args:
+        node: Node name, used as the statistics and span label.
+        tiers: Model settings, cheapest first.
+        call: Calls the model (bound, structured...) and returns its output.
+        check: Returns why an output is rejected (``"low_confidence"``...),
+            or ``None`` to accept it. Not applied to the last tier.
+    """
+    for level, settings in enumerate(tiers):
+        last = level == len(tiers) - 1
+        model = get_chat_model(settings.model_id, **settings.kwargs())
+        with tracing.span(node, "model", model=settings.model_id, tier=level) as span:
+            start = time.perf_counter()
+            reason = None
+            try:
+                output = await call(model)
+            except PARSE_ERRORS:
+                if last:
+                    tier_stats.record(node, settings.model_id, time.perf_counter() - start, error=True)
+                    raise
+                output, reason = None, "parse_error"
+            except Exception:
+                tier_stats.record(node, settings.model_id, time.perf_counter() - start, error=True)
+                raise
+            else:
+                if check is not None and not last:
+                    reason = check(output)
+            usage = usage_of(output)
+            if usage:
+                span.add("input_tokens", usage.get("input_tokens", 0))
+                span.add("output_tokens", usage.get("output_tokens", 0))
+            if reason:
+                span.set(escalated=reason)
+            tier_stats.record(node, settings.model_id, time.perf_counter() - start, usage, reason)
+        if reason is None:
+            return output
+        logger.info("%s: %s rejected by %s, escalating to %s", node, reason, settings.model_id, tiers[level + 1].model_id)
+    raise ValueError(f"no model tiers configured for {node!r}")
@@ -0,0 +1,313 @@
+"""In-process snapshot of the ``obenGroup_films`` catalog.
+
+The catalog is small and changes rarely, so instead of going to DynamoDB on
+every tool call it can be loaded once, kept in memory with inverted indexes
+over ``Tipo``, ``Familia``, ``Código``, ``Códigos de Película`` and
+``Unidad de Negocio``, and refreshed after a TTL or on demand.
+
+The snapshot is optional. It is enabled with :func:`enable_catalog` or by
+setting the ``FILM_CATALOG_TTL`` environment variable (seconds); while it is
+disabled :func:`get_catalog` returns ``None`` and the tools keep querying
+DynamoDB directly.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional
+
+from code_resolver import CodeResolver
+from dynamo import DEFAULT_CODE_SCAN_TTL, TABLE_NAME, get_table, normalize_code
+from spec_index import SpecIndex
+
+logger = logging.getLogger(__name__)
+
+# Misma vigencia que el escaneo proyectado que se usa sin catálogo
+DEFAULT_TTL = DEFAULT_CODE_SCAN_TTL
+
+INDEXED_FIELDS = ("Tipo", "Familia", "Código", "Códigos de Película", "Unidad de Negocio")
+"""Fields with an inverted index. ``Código`` lives in the rows of ``Dimensiones Estándar``."""
+
+
+def _field_values(item: dict, name: str) -> list[str]:
+    """Return every string value of ``name`` in ``item`` (nested tables included)."""
+    if name == "Código":
+        rows = (item.get("Dimensiones Estándar") or {}).get("Tabla") or []
+        values = [row.get("Código") for row in rows if isinstance(row, dict)]
+    else:
+        value = item.get(name)
+        values = value if isinstance(value, (list, set, tuple)) else [value]
+    return [value for value in values if isinstance(value, str) and value.strip()]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """An immutable view of the table at ``loaded_at``."""
+
+    items: dict[str, dict]
+    indexes: dict[str, dict[str, frozenset[str]]]
+    code_index: dict[str, set[str]]
+    resolver: CodeResolver
+    """Fuzzy lookup of noisy codes (``code_resolver``)."""
+    specs: SpecIndex
+    """Numeric specifications per film code for range queries (``spec_index``)."""
+    loaded_at: float
+    version: str
+
+
+@dataclass
+class CatalogStats:
+    """Counters reported by :meth:`FilmCatalog.stats`."""
+
+    hits: int = 0
+    misses: int = 0
+    refreshes: int = 0
+    refresh_errors: int = 0
+    size: int = 0
+    version: str = ""
+    age_seconds: Optional[float] = None
+    stale: bool = False
+    last_refresh_seconds: Optional[float] = None
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def build_snapshot(items: Iterable[dict], loaded_at: float) -> CatalogSnapshot:
+    """Index ``items`` into a :class:`CatalogSnapshot`."""
+    by_id: dict[str, dict] = {}
+    indexes: dict[str, dict[str, set[str]]] = {name: {} for name in INDEXED_FIELDS}
+    code_index: dict[str, set[str]] = {}
+
+    for item in items:
+        item_id = item["id"]
+        by_id[item_id] = item
+        for name in INDEXED_FIELDS:
+            for value in _field_values(item, name):
+                indexes[name].setdefault(normalize_code(value), set()).add(item_id)
+
+        # Mismo criterio que dynamo.code_index_from_items: id, Tipo, Códigos de Película y Código, con y sin números
+        code_index.setdefault(normalize_code(item_id), set()).add(item_id)
+        for value in _field_values(item, "Tipo") + _field_values(item, "Códigos de Película") + _field_values(item, "Código"):
+            code_index.setdefault(normalize_code(value), set()).add(item_id)
+            family = normalize_code(re.sub(r"\d+", "", value))
+            if family:
+                code_index.setdefault(family, set()).add(item_id)
+
+    digest = hashlib.sha1(
+        json.dumps(by_id, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+    return CatalogSnapshot(
+        items=by_id,
+        indexes={name: {k: frozenset(v) for k, v in values.items()} for name, values in indexes.items()},
+        code_index=code_index,
+        resolver=CodeResolver.from_items(by_id.values()),
+        specs=SpecIndex.from_items(by_id.values()),
+        loaded_at=loaded_at,
+        version=digest[:16],
+    )
+
+
+def scan_table(table) -> list[dict]:
+    """Read every item of ``table`` with a paginated scan."""
+    items: list[dict] = []
+    scan_kwargs: dict[str, Any] = {}
+    while True:
+        response = table.scan(**scan_kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+class FilmCatalog:
+    """Film catalog served from memory.
+
+    Args:
+        loader: Callable returning every item of the catalog. Defaults to a
+            full scan of ``table``.
+        table: DynamoDB table used by the default loader. Defaults to
+            ``obenGroup_films`` on the shared resource from ``dynamo``.
+        ttl: Seconds after which the snapshot is considered stale. A stale
+            snapshot keeps being served while one caller reloads it.
+        clock: Monotonic clock, injectable for tests.
+    """
+
+    def __init__(
+        self,
+        loader: Optional[Callable[[], Iterable[dict]]] = None,
+        table=None,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._loader = loader
+        self._table = table
+        self.ttl = ttl
+        self._clock = clock
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._refresh_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = CatalogStats()
+
+    def _load_items(self) -> Iterable[dict]:
+        if self._loader is not None:
+            return self._loader()
+        if self._table is None:
+            self._table = get_table(TABLE_NAME)
+        return scan_table(self._table)
+
+    def refresh(self) -> CatalogSnapshot:
+        """Reload the catalog now and swap in the new snapshot."""
+        with self._refresh_lock:
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> CatalogSnapshot:
+        start = self._clock()
+        try:
+            snapshot = build_snapshot(self._load_items(), loaded_at=self._clock())
+        except Exception:
+            with self._stats_lock:
+                self._stats.refresh_errors += 1
+            raise
+        self._snapshot = snapshot
+        with self._stats_lock:
+            self._stats.refreshes += 1
+            self._stats.last_refresh_seconds = self._clock() - start
+        logger.info("Film catalog loaded: %d items, version %s", len(snapshot.items), snapshot.version)
+        return snapshot
+
+    def snapshot(self) -> CatalogSnapshot:
+        """Return the current snapshot, loading or refreshing it if needed."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    return self._refresh_locked()
+                return self._snapshot
+
+        if self._clock() - snapshot.loaded_at >= self.ttl and self._refresh_lock.acquire(blocking=False):
+            # Solo un hilo recarga; el resto sigue usando la copia anterior
+            try:
+                if self._snapshot is snapshot:
+                    try:
+                        return self._refresh_locked()
+                    except Exception as e:
+                        logger.warning(f"Film catalog refresh failed, serving stale snapshot: {e}")
+            finally:
+                self._refresh_lock.release()
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        """Content hash of the current snapshot."""
+        return self.snapshot().version
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._stats_lock:
+            self._stats.hits += hits
+            self._stats.misses += misses
+
+    def get(self, item_id: str) -> Optional[dict]:
+        """Return the item with ``item_id`` or ``None``."""
+        item = self.snapshot().items.get(item_id)
+        self._count(int(item is not None), int(item is None))
+        return item
+
+    def get_many(
+        self, ids: Iterable[str], snapshot: Optional[CatalogSnapshot] = None
+    ) -> tuple[list[dict], list[str]]:
+        """Return ``(items, missing_ids)`` for ``ids``, preserving their order.
+
+        Pass ``snapshot`` to read from a snapshot the caller already holds, so
+        the items match its ``version`` even if a refresh swaps in a new one.
+        """
+        items_by_id = (snapshot or self.snapshot()).items
+        items, missing = [], []
+        for item_id in dict.fromkeys(ids):
+            item = items_by_id.get(item_id)
+            if item is None:
+                missing.append(item_id)
+            else:
+                items.append(item)
+        self._count(len(items), len(missing))
+        return items, missing
+
+    def lookup(self, field_name: str, value: str) -> list[dict]:
+        """Return the items whose ``field_name`` equals ``value`` (case/space-insensitive)."""
+        if field_name not in INDEXED_FIELDS:
+            raise ValueError(f"{field_name!r} is not indexed; expected one of {INDEXED_FIELDS}")
+        snapshot = self.snapshot()
+        ids = snapshot.indexes[field_name].get(normalize_code(value), frozenset())
+        self._count(int(bool(ids)), int(not ids))
+        return [snapshot.items[item_id] for item_id in sorted(ids)]
+
+    def find_codes(self, codes: Iterable[str], snapshot: Optional[CatalogSnapshot] = None) -> list[dict]:
+        """Resolve film codes (``'SCx 30'``, ``'CC'``...) to items, like ``specific_search_tool``.
+
+        ``snapshot`` works as in :meth:`get_many`.
+        """
+        snapshot = snapshot or self.snapshot()
+        ids: dict[str, None] = {}
+        found = missed = 0
+        for code in codes:
+            matches = snapshot.code_index.get(normalize_code(code), ())
+            if matches:
+                found += 1
+            else:
+                missed += 1
+            for item_id in sorted(matches):
+                ids.setdefault(item_id)
+        self._count(found, missed)
+        return [snapshot.items[item_id] for item_id in ids]
+
+    def stats(self) -> CatalogStats:
+        """Return a copy of the counters plus the size, version and age of the snapshot."""
+        with self._stats_lock:
+            stats = CatalogStats(**vars(self._stats))
+        snapshot = self._snapshot
+        if snapshot is not None:
+            stats.size = len(snapshot.items)
+            stats.version = snapshot.version
+            stats.age_seconds = self._clock() - snapshot.loaded_at
+            stats.stale = stats.age_seconds >= self.ttl
+        return stats
+
+
+_catalog: Optional[FilmCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def enable_catalog(catalog: Optional[FilmCatalog] = None, **kwargs: Any) -> FilmCatalog:
+    """Install the process-wide catalog used by the tools.
+
+    Either pass a ready :class:`FilmCatalog` or the keyword arguments to build
+    one (``loader``, ``table``, ``ttl``).
+    """
+    global _catalog
+    with _catalog_lock:
+        _catalog = catalog or FilmCatalog(**kwargs)
+        return _catalog
+
+
+def disable_catalog() -> None:
+    """Stop serving the tools from memory."""
+    global _catalog
+    with _catalog_lock:
+        _catalog = None
+
+
+def get_catalog() -> Optional[FilmCatalog]:
+    """Return the process-wide catalog, or ``None`` when the snapshot is disabled."""
+    global _catalog
+    if _catalog is None and os.environ.get("FILM_CATALOG_TTL"):
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = FilmCatalog(ttl=float(os.environ["FILM_CATALOG_TTL"]))
+    return _catalog
@@ -0,0 +1,232 @@
+"""Fuzzy resolution of user-typed film codes to the codes in the catalog.
+
+Codes come from users and from the model with noise: ``"SCX-30"``,
+``"cwc20 micras"``, ``"C.C 60"``, ``"sxc 30"``. The exact lookups in
+``dynamo`` / ``catalog`` only strip spaces and lowercase, so those return
+nothing. :class:`CodeResolver` is built once from every ``id``, ``Tipo``,
+``Código`` and ``Códigos de Película`` value (plus the digit-stripped family
+of each code) and resolves a noisy code in two steps:
+
+1. :func:`canonical_code` folds case and accents, drops units and filler
+   words (``micras``, ``µm``, ``película``...) and keeps only letters and
+   digits, so ``"C.C 60"`` and ``"cc-60 micras"`` both become ``"cc60"``;
+   an exact hit is a dict lookup.
+2. Otherwise a trie of the canonical keys is walked with a bounded
+   Damerau-Levenshtein (optimal string alignment) row per node, pruning
+   every branch whose row minimum exceeds the bound, so only the few
+   prefixes near the query are visited.
+
+:meth:`CodeResolver.resolve` returns ranked :class:`CodeMatch` candidates
+with a ``score`` in ``[0, 1]``; :meth:`CodeResolver.correct` rewrites a
+list of codes to their canonical spelling for the exact lookups.
+
+The catalog snapshot carries its own resolver; without the catalog,
+:func:`get_code_resolver` builds one per table from the projected scan shared
+with the code index (:func:`dynamo.get_code_scan`), and rebuilds it when that
+scan is reloaded.
+"""
+
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from dynamo import CodeScan, get_code_scan, scan_code_attributes
+
+UNIT_PATTERN = re.compile(r"(?<=\d)\s*(micrones|micras?|mic|µm|µ|um|mm|mils?)\b")
+FILLER_PATTERN = re.compile(r"\b(pel[ií]culas?|films?|c[oó]digos?|tipo|de|del|la|el)\b")
+LETTER_O_AS_ZERO = re.compile(r"(?<=\d)o\b")
+NON_CODE = re.compile(r"[^a-z0-9]+")
+
+_END = ""
+"""Trie key under which a node stores the canonical key that ends there."""
+
+
+def canonical_code(text: str) -> str:
+    """Return the letters and digits of a code, without units, filler words or accents."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = UNIT_PATTERN.sub("", text.replace("μ", "µ"))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = FILLER_PATTERN.sub(" ", text)
+    text = LETTER_O_AS_ZERO.sub("0", text)
+    return NON_CODE.sub("", text)
+
+
+def item_codes(item: dict) -> list[str]:
+    """Return every code that names ``item``: id, ``Tipo``, ``Códigos de Película`` and ``Código``."""
+    codes = [item.get("Tipo")]
+    codes.extend(item.get("Códigos de Película") or [])
+    rows = (item.get("Dimensiones Estándar") or {}).get("Tabla") or []
+    codes.extend(row.get("Código") for row in rows if isinstance(row, dict))
+    codes.append(item.get("id"))
+    return [code for code in codes if isinstance(code, str) and code.strip()]
+
+
+def default_max_distance(key: str) -> int:
+    """Edit budget for a query: none for short family codes, then 1, then 2."""
+    if len(key) <= 3:
+        return 0
+    return 1 if len(key) <= 5 else 2
+
+
+@dataclass(frozen=True)
+class CodeMatch:
+    """One candidate for a user code."""
+
+    code: str
+    """Catalog spelling (``"SCx 30"``)."""
+    key: str
+    """Canonical key (``"scx30"``)."""
+    ids: tuple[str, ...]
+    """Items named by the code."""
+    distance: int
+    score: float
+    """``1 - distance / longest length``; 1.0 for an exact match."""
+
+
+class CodeResolver:
+    """Exact and bounded edit-distance lookup over the catalog codes."""
+
+    def __init__(self):
+        self._entries: dict[str, tuple[str, set[str]]] = {}
+        self._trie: dict[str, Any] = {}
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict]) -> "CodeResolver":
+        resolver = cls()
+        for item in items:
+            for code in item_codes(item):
+                resolver.add(code, item["id"])
+                family = re.sub(r"\d+", "", code).strip()
+                if family and family != code:
+                    resolver.add(family, item["id"])
+        return resolver
+
+    def add(self, code: str, item_id: str) -> None:
+        """Register ``code`` as a name of ``item_id`` (the first spelling seen is kept)."""
+        key = canonical_code(code)
+        if not key:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = (code, {item_id})
+            node = self._trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[_END] = key
+        else:
+            entry[1].add(item_id)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _match(self, query: str, key: str, distance: int) -> CodeMatch:
+        code, ids = self._entries[key]
+        score = 1.0 - distance / max(len(query), len(key))
+        return CodeMatch(code=code, key=key, ids=tuple(sorted(ids)), distance=distance, score=round(score, 4))
+
+    def _search(self, query: str, max_distance: int) -> dict[str, int]:
+        """Return ``{key: distance}`` for every key within ``max_distance`` of ``query``."""
+        found: dict[str, int] = {}
+        size = len(query)
+        first_row = list(range(size + 1))
+
+        def visit(node: dict, char: str, previous: list[int], before: Optional[list[int]], previous_char: str) -> None:
+            row = [previous[0] + 1]
+            for i in range(1, size + 1):
+                cost = 0 if query[i - 1] == char else 1
+                value = min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + cost)
+                if before is not None and i > 1 and query[i - 1] == previous_char and query[i - 2] == char:
+                    value = min(value, before[i - 2] + 1)
+                row.append(value)
+            key = node.get(_END)
+            if key is not None and row[size] <= max_distance:
+                found[key] = row[size]
+            # A transposition can lower the next row from the one before this
+            if min(row) <= max_distance or min(previous) < max_distance:
+                for next_char, child in node.items():
+                    if next_char != _END:
+                        visit(child, next_char, row, previous, char)
+
+        for char, child in self._trie.items():
+            if char != _END:
+                visit(child, char, first_row, None, "")
+        return found
+
+    def resolve(self, text: str, limit: int = 5, max_distance: Optional[int] = None) -> list[CodeMatch]:
+        """Return up to ``limit`` candidates for ``text``, best first.
+
+        Ties on distance prefer transpositions of the query, then candidates
+        with the same digits (the thickness is rarely the part that is
+        misspelled), then candidates of similar length.
+        """
+        query = canonical_code(text)
+        if not query:
+            return []
+        if query in self._entries:
+            return [self._match(query, query, 0)]
+        budget = default_max_distance(query) if max_distance is None else max_distance
+        if budget <= 0:
+            return []
+        digits = re.sub(r"\D", "", query)
+        letters = sorted(query)
+        found = self._search(query, budget)
+        ranked = sorted(
+            found.items(),
+            key=lambda kv: (
+                kv[1],
+                sorted(kv[0]) != letters,
+                re.sub(r"\D", "", kv[0]) != digits,
+                abs(len(kv[0]) - len(query)),
+                kv[0],
+            ),
+        )
+        return [self._match(query, key, distance) for key, distance in ranked[:limit]]
+
+    def correct(self, codes: Iterable[str], min_score: float = 0.6, max_ties: int = 3) -> list[str]:
+        """Rewrite ``codes`` to catalog spellings.
+
+        Exact and unambiguous fuzzy matches are replaced by their catalog
+        code. Among candidates tied for the best distance, those with the
+        same characters as the query (a transposition) win, then those of the
+        query's own family (``"slx 30"`` -> ``SLx 32``); if the rest differ
+        only in the digits (``"scx 31"`` -> ``SCx 30`` / ``SCx 35``) up
+        to ``max_ties`` of them are returned, but a tie between different
+        families (``"cc 60"`` -> ``CA 60`` / ``CL 60``) keeps the code as it
+        is, as do codes without a candidate above ``min_score``. Order is
+        preserved and duplicates are dropped.
+        """
+        corrected: dict[str, None] = {}
+        for code in codes:
+            matches = [match for match in self.resolve(code, limit=2 * max_ties) if match.score >= min_score]
+            best = [match for match in matches if match.distance == matches[0].distance]
+            query = canonical_code(code)
+            best = [match for match in best if sorted(match.key) == sorted(query)] or best
+            family = re.sub(r"\d+", "", query)
+            best = [match for match in best if re.sub(r"\d+", "", match.key) == family] or best
+            if not best or len({re.sub(r"\d+", "", match.key) for match in best}) > 1:
+                corrected.setdefault(code)
+                continue
+            for match in best[:max_ties]:
+                corrected.setdefault(match.code)
+        return list(corrected)
+
+
+_resolvers: dict[str, tuple[CodeScan, CodeResolver]] = {}
+_resolvers_lock = threading.Lock()
+
+
+def build_code_resolver(table) -> CodeResolver:
+    """Build a resolver for ``table`` from a fresh projected scan."""
+    return CodeResolver.from_items(scan_code_attributes(table))
+
+
+def get_code_resolver(table, refresh: bool = False) -> CodeResolver:
+    """Return the resolver for ``table``, rebuilt whenever :func:`dynamo.get_code_scan` reloads."""
+    scan = get_code_scan(table, refresh=refresh)
+    with _resolvers_lock:
+        cached = _resolvers.get(table.name)
+        if cached is None or cached[0] is not scan:
+            cached = _resolvers[table.name] = (scan, CodeResolver.from_items(scan.items))
+        return cached[1]
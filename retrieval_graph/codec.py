@@ -0,0 +1,227 @@
+"""Compact, cached serialization of film items for tool results and prompts.
+
+Film items come out of DynamoDB with ``Decimal`` numbers and sets, and used to
+reach the prompt as the JSON/``repr`` dump of the whole item: three long
+legal paragraphs under ``Condiciones Importantes`` repeated on every film,
+PDF metadata, and one ``Dimensiones Estándar`` row per code with the same
+``Ancho``/``Núcleo``/``Largo y Peso`` values spelled out each time.
+
+:class:`FilmCodec` converts an item in one pass (:func:`to_plain`), keeps only
+the projected fields, and renders either
+
+* ``"compact"`` text (default)::
+
+      ## SC · SealFilm · CPP [id: sc]
+      Códigos: SC 12, SC 15, SC 17
+      Descripción: ...
+      Dimensiones (comunes): Núcleo: 3" y 6"; Ancho: 400 a 2,000
+      Código | Espesor | Gramaje | Largo y Peso
+      SC 12 | 12.5 | 11.3 | 570 mm O Diam.: 18,100 m, 2.04 kg/cm; 760 mm O: ...
+
+  where table columns with the same value in every row are written once, or
+* ``"json"``: the projected item as JSON without whitespace.
+
+Encoded forms are cached per ``(id, version)``: pass the catalog snapshot
+version when the item comes from the catalog, otherwise a fingerprint of the
+raw item is used.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Iterable, Literal, Optional, Sequence
+
+Format = Literal["compact", "json"]
+
+DEFAULT_FIELDS: tuple[str, ...] = (
+    "Tipo",
+    "Familia",
+    "Unidad de Negocio",
+    "Códigos de Película",
+    "Descripción",
+    "Aplicaciones",
+    "Características Principales",
+    "Dimensiones Estándar",
+    "Nota",
+)
+"""Fields sent to the model by default.
+
+``Condiciones Importantes`` (storage and legal boilerplate repeated on every
+film), ``pdf_name``, ``Fuente`` and ``Última Revisión`` are left out; add them
+to the projection when a question needs them.
+"""
+
+HEADER_FIELDS = ("Tipo", "Familia", "Unidad de Negocio")
+FIELD_LABELS = {"Códigos de Película": "Códigos", "Características Principales": "Características"}
+TABLE_FIELD = "Dimensiones Estándar"
+CACHE_SIZE = 4096
+
+
+def to_plain(value: Any) -> Any:
+    """Convert DynamoDB types in one pass: ``Decimal`` -> int/float, sets -> sorted lists."""
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted((to_plain(item) for item in value), key=str)
+    return value
+
+
+def project(item: dict, fields: Optional[Sequence[str]]) -> dict:
+    """Keep ``id`` plus ``fields`` (all fields when ``None``), in projection order."""
+    if fields is None:
+        return dict(item)
+    projected = {name: item[name] for name in fields if name in item}
+    if "id" in item:
+        projected["id"] = item["id"]
+    return projected
+
+
+def _inline(value: Any) -> str:
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_inline(item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return ", ".join(_inline(item) for item in value)
+    return " ".join(str(value).split())
+
+
+def _largo_y_peso(value: Any) -> str:
+    if not isinstance(value, dict):
+        return _inline(value)
+    parts = []
+    for diameter, data in value.items():
+        if isinstance(data, dict):
+            length, weight = data.get("Largo"), data.get("Peso")
+            parts.append(f"{diameter}: {length} m, {weight}" if length is not None else f"{diameter}: {weight}")
+        else:
+            parts.append(f"{diameter}: {_inline(data)}")
+    return "; ".join(parts)
+
+
+def _cell(name: str, value: Any) -> str:
+    return _largo_y_peso(value) if name == "Largo y Peso" else _inline(value)
+
+
+def _table_lines(dimensions: Any) -> list[str]:
+    if not isinstance(dimensions, dict):
+        return [f"Dimensiones: {_inline(dimensions)}"]
+    rows = [row for row in dimensions.get("Tabla") or [] if isinstance(row, dict)]
+    lines = []
+    if rows:
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        if "Código" in columns:
+            columns.insert(0, columns.pop(columns.index("Código")))
+        cells = [{name: _cell(name, row[name]) if name in row else "" for name in columns} for row in rows]
+        common = [
+            name for name in columns
+            if len(rows) > 1 and name != "Código" and len({row[name] for row in cells}) == 1
+        ]
+        varying = [name for name in columns if name not in common]
+        if common:
+            lines.append("Dimensiones (comunes): " + "; ".join(f"{name}: {cells[0][name]}" for name in common))
+        lines.append(" | ".join(varying))
+        lines.extend(" | ".join(row[name] for name in varying) for row in cells)
+    for key, value in dimensions.items():
+        if key != "Tabla":
+            lines.append(f"Dimensiones {key}: {_inline(value)}")
+    return lines
+
+
+def encode_compact(item: dict) -> str:
+    """Render a plain, projected item as compact text."""
+    header = " · ".join(str(item[name]) for name in HEADER_FIELDS if item.get(name))
+    lines = [f"## {header or item.get('id', '')} [id: {item.get('id', '')}]"]
+    for name, value in item.items():
+        if name in HEADER_FIELDS or name == "id" or value in ("", None, [], {}):
+            continue
+        if name == TABLE_FIELD:
+            lines.extend(_table_lines(value))
+        elif isinstance(value, list) and name != "Códigos de Película":
+            lines.append(f"{FIELD_LABELS.get(name, name)}: " + "; ".join(_inline(v) for v in value))
+        else:
+            lines.append(f"{FIELD_LABELS.get(name, name)}: {_inline(value)}")
+    return "\n".join(lines)
+
+
+def encode_json(item: dict) -> str:
+    return json.dumps(item, ensure_ascii=False, separators=(",", ":"))
+
+
+class FilmCodec:
+    """Projection + serialization of film items with an LRU cache per ``(id, version)``.
+
+    Args:
+        fields: Fields to keep (``id`` is always kept); ``None`` keeps all.
+        fmt: ``"compact"`` text or ``"json"``.
+        max_entries: Size of the encoded-item cache.
+    """
+
+    def __init__(
+        self,
+        fields: Optional[Sequence[str]] = DEFAULT_FIELDS,
+        fmt: Format = "compact",
+        max_entries: int = CACHE_SIZE,
+    ):
+        self.fields = tuple(fields) if fields is not None else None
+        self.fmt = fmt
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache: "OrderedDict[tuple, tuple[dict, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(item: dict) -> int:
+        """Version of an item that has none: a hash of its ``repr`` (no conversion walk)."""
+        return hash(repr(item))
+
+    def _entry(self, item: dict, version: Any) -> tuple[dict, str]:
+        key = (item.get("id"), version if version is not None else self.fingerprint(item))
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        plain = to_plain(project(item, self.fields))
+        entry = (plain, encode_compact(plain) if self.fmt == "compact" else encode_json(plain))
+        with self._lock:
+            self._cache[key] = entry
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return entry
+
+    def plain(self, item: dict, version: Any = None) -> dict:
+        """Projected item with plain Python types (shared, do not mutate)."""
+        return self._entry(item, version)[0]
+
+    def encode(self, item: dict, version: Any = None) -> str:
+        """Serialized form of one item."""
+        return self._entry(item, version)[1]
+
+    def encode_many(self, items: Iterable[dict], version: Any = None) -> str:
+        """Serialize several items for a tool result, in order."""
+        parts = [self.encode(item, version) for item in items]
+        if self.fmt == "json":
+            return "[" + ",".join(parts) + "]"
+        return "\n\n".join(parts)
+
+
+_codecs: dict[tuple, FilmCodec] = {}
+_codecs_lock = threading.Lock()
+
+
+def get_codec(fields: Optional[Sequence[str]] = DEFAULT_FIELDS, fmt: Format = "compact") -> FilmCodec:
+    """Return the process-wide codec for a projection and format."""
+    key = (tuple(fields) if fields is not None else None, fmt)
+    with _codecs_lock:
+        codec = _codecs.get(key)
+        if codec is None:
+            codec = _codecs[key] = FilmCodec(fields, fmt)
+        return codec
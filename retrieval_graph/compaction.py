@@ -0,0 +1,224 @@
+"""Token-budgeted compaction of the conversation sent to the model.
+
+Every node used to send ``[system] + state.messages`` to Bedrock, i.e. the
+whole history plus every raw tool payload (a single retrieval is ~18 KB).
+:func:`compact_messages` fits the history into a per-node token budget:
+
+1. Up to ``keep_turns`` latest turns (a turn starts at each human message)
+   are kept verbatim, except that tool payloads of every turn but the last
+   are replaced by a short stub: they are stale once the model has answered.
+   They count against the budget: a kept turn that does not fit is
+   summarized like an older one. The last turn is always kept as is.
+2. Older turns are condensed into one summary line each. Summaries are
+   extractive (no LLM call) and cached per message id, so each turn is
+   summarized once, not on every hop.
+3. If the summaries still do not fit, the oldest ones are dropped.
+
+The summary is appended to the system prompt, because Anthropic models on
+Bedrock only accept a system message at the start of the conversation.
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage, BaseMessage, HumanMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 3.5
+SUMMARY_CHARS = {"human": 240, "ai": 360}
+SUMMARY_HEADER = "\n\nResumen de la conversación anterior (más antigua primero):\n"
+SUMMARY_CACHE_SIZE = 10_000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for Spanish text on Claude models (~3.5 characters per token)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _content_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def message_tokens(message: BaseMessage, count: Callable[[str], int] = estimate_tokens) -> int:
+    """Tokens of a message: its content plus the arguments of its tool calls."""
+    tokens = count(_content_text(message.content)) + 4
+    for tool_call in getattr(message, "tool_calls", None) or []:
+        tokens += count(tool_call.get("name", "")) + count(json.dumps(tool_call.get("args", {}), ensure_ascii=False))
+    return tokens
+
+
+def split_turns(messages: Sequence[BaseMessage]) -> list[list[BaseMessage]]:
+    """Group messages into turns, each starting at a human message."""
+    turns: list[list[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([message])
+        else:
+            turns[-1].append(message)
+    return turns
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = re.sub(r"\s+", " ", text).strip()
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _tool_stub(message: ToolMessage) -> str:
+    ids = re.findall(r"""['"]id['"]:\s*['"]([^'"]+)['"]|\[id: ([^\]]+)\]""", _content_text(message.content))
+    ids = [json_id or compact_id for json_id, compact_id in ids]
+    name = message.name or "herramienta"
+    if ids:
+        return f"[{name}: resultados {', '.join(dict.fromkeys(ids))}]"
+    return f"[{name}: {_shorten(_content_text(message.content), 120)}]"
+
+
+class TurnSummarizer:
+    """Extractive one-line summaries of turns, cached by message ids."""
+
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.summarized = 0
+        self._cache: "OrderedDict[tuple, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(turn: Sequence[BaseMessage]) -> Optional[tuple]:
+        ids = tuple(message.id for message in turn)
+        return ids if all(ids) else None
+
+    def summarize(self, turn: Sequence[BaseMessage]) -> str:
+        key = self._key(turn)
+        if key is not None:
+            with self._lock:
+                summary = self._cache.get(key)
+                if summary is not None:
+                    self._cache.move_to_end(key)
+                    return summary
+
+        parts = []
+        for message in turn:
+            if isinstance(message, HumanMessage):
+                parts.append(f"Usuario: {_shorten(_content_text(message.content), SUMMARY_CHARS['human'])}")
+            elif isinstance(message, ToolMessage):
+                parts.append(_tool_stub(message))
+            elif isinstance(message, AIMessage):
+                text = _content_text(message.content)
+                if text.strip():
+                    parts.append(f"Asistente: {_shorten(text, SUMMARY_CHARS['ai'])}")
+                for tool_call in message.tool_calls:
+                    parts.append(f"(consulta {tool_call['name']}: {json.dumps(tool_call.get('args', {}), ensure_ascii=False)})")
+        summary = "- " + " ".join(parts)
+
+        with self._lock:
+            self.summarized += 1
+            if key is not None:
+                self._cache[key] = summary
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return summary
+
+
+summarizer = TurnSummarizer()
+
+
+def _prune_tool_payloads(turn: Sequence[BaseMessage]) -> list[BaseMessage]:
+    return [
+        message.model_copy(update={"content": _tool_stub(message)}) if isinstance(message, ToolMessage) else message
+        for message in turn
+    ]
+
+
+@dataclass
+class CompactionReport:
+    """Token counts of one compaction (system prompt included)."""
+
+    node: str
+    budget: int
+    tokens_before: int
+    tokens_after: int
+    turns_total: int
+    turns_verbatim: int
+    turns_summarized: int
+    turns_dropped: int
+
+    @property
+    def saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def compact_messages(
+    system_prompt: str,
+    messages: Sequence[AnyMessage],
+    budget: int,
+    keep_turns: int = 2,
+    node: str = "",
+    count: Callable[[str], int] = estimate_tokens,
+) -> tuple[list, CompactionReport]:
+    """Build ``[system] + history`` for a model call within ``budget`` tokens.
+
+    Earlier turns among the latest ``keep_turns`` are only kept verbatim while
+    they fit; the last turn is never altered, even if it alone exceeds the
+    budget.
+
+    Returns:
+        The message list to send to the model and a :class:`CompactionReport`.
+    """
+    turns = split_turns(messages)
+    system_tokens = count(system_prompt)
+    tokens_before = system_tokens + sum(message_tokens(m, count) for m in messages)
+
+    # El último turno va siempre; los anteriores de keep_turns solo mientras quepan
+    candidates = turns[-max(1, keep_turns):]
+    kept: list[list[BaseMessage]] = [list(candidates[-1])] if candidates else []
+    used = system_tokens + sum(message_tokens(m, count) for turn in kept for m in turn)
+    for turn in reversed(candidates[:-1]):
+        pruned = _prune_tool_payloads(turn)
+        cost = sum(message_tokens(m, count) for m in pruned)
+        if used + cost > budget:
+            break
+        kept.insert(0, pruned)
+        used += cost
+    older_turns = turns[:len(turns) - len(kept)]
+    verbatim = [message for turn in kept for message in turn]
+
+    # Los resúmenes más recientes tienen prioridad; los más antiguos se descartan primero
+    summaries: list[str] = []
+    remaining = budget - used - count(SUMMARY_HEADER)
+    for turn in reversed(older_turns):
+        summary = summarizer.summarize(turn)
+        cost = count(summary) + 1
+        if cost > remaining:
+            break
+        summaries.append(summary)
+        remaining -= cost
+    summaries.reverse()
+
+    system_content = system_prompt + (SUMMARY_HEADER + "\n".join(summaries) if summaries else "")
+    compacted = [{"role": "system", "content": system_content}] + verbatim
+    report = CompactionReport(
+        node=node,
+        budget=budget,
+        tokens_before=tokens_before,
+        tokens_after=count(system_content) + sum(message_tokens(m, count) for m in verbatim),
+        turns_total=len(turns),
+        turns_verbatim=len(kept),
+        turns_summarized=len(summaries),
+        turns_dropped=len(older_turns) - len(summaries),
+    )
+    logger.debug(
+        "compaction %s: %d -> %d tokens (budget %d, %d verbatim / %d summarized / %d dropped turns)",
+        node, report.tokens_before, report.tokens_after, budget,
+        report.turns_verbatim, report.turns_summarized, report.turns_dropped,
+    )
+    return compacted, report
@@ -2,12 +2,45 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Annotated
+from dataclasses import dataclass, field, fields
+from typing import Annotated, Any, Literal, Optional, Type, TypeVar
+
+from langchain_core.runnables import RunnableConfig, ensure_config
 
 import prompts
 
 
+CASCADE_NODES = frozenset({"analyze_and_route_query", "semantic_search"})
+"""Nodes with structured output that ``cascade_model`` applies to. ``respond``
+streams its answer to the user, so it only cascades when ``model_tiers``
+lists several tiers for it."""
+
+
+@dataclass(frozen=True)
+class ModelSettings:
+    """The model a node calls and its generation parameters."""
+
+    model: str
+    """``provider/model-name`` or a bare Bedrock model id."""
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+    @property
+    def model_id(self) -> str:
+        """The Bedrock model id, without the ``provider/`` prefix (ARNs are kept as they are)."""
+        provider, _, name = self.model.partition("/")
+        return name if name and ":" not in provider else self.model
+
+    def kwargs(self) -> dict[str, Any]:
+        """Keyword arguments for the model factory; unset parameters are left out."""
+        kwargs: dict[str, Any] = {}
+        if self.max_tokens is not None:
+            kwargs["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            kwargs["temperature"] = self.temperature
+        return kwargs
+
+
 @dataclass(kw_only=True)
 class AgentConfiguration():
     """The configuration for the agent."""
@@ -21,6 +54,44 @@ class AgentConfiguration():
         },
     )
 
+    max_tokens: Optional[int] = field(
+        default=None,
+        metadata={
+            "description": "Maximum tokens generated per model call by nodes without their own max_tokens in model_tiers; None keeps the provider default."
+        },
+    )
+
+    temperature: Optional[float] = field(
+        default=None,
+        metadata={
+            "description": "Sampling temperature of nodes without their own temperature in model_tiers; None keeps the provider default."
+        },
+    )
+
+    model_tiers: dict[str, Any] = field(
+        default_factory=lambda: {
+            "analyze_and_route_query": {"temperature": 0.0, "max_tokens": 512},
+            "semantic_search": {"temperature": 0.0, "max_tokens": 1024},
+        },
+        metadata={
+            "description": "Per-node model settings keyed by node name: a dict with model (provider/model-name), max_tokens and temperature, or a list of them tried in order as a cascade. Missing keys fall back to model, max_tokens and temperature."
+        },
+    )
+
+    cascade_model: Optional[str] = field(
+        default=None,
+        metadata={
+            "description": "Stronger model (provider/model-name) that the nodes with structured output (router, tool-call generation) escalate to when the output does not parse or its confidence is low. None disables the cascade."
+        },
+    )
+
+    cascade_min_confidence: float = field(
+        default=0.6,
+        metadata={
+            "description": "Router confidence below which a cascading router escalates to the next tier."
+        },
+    )
+
     # prompts
 
     router_system_prompt: str = field(
@@ -62,3 +133,153 @@ class AgentConfiguration():
         default=prompts.RESPOND_TO_SAME_CONTEXT_PROMPT,
         metadata={"description": "The system prompt used for generating responses."},
     )
+
+    # retrieval
+
+    retriever_backend: Literal["bedrock_kb", "local"] = field(
+        default="bedrock_kb",
+        metadata={
+            "description": "Where semantic_search_tool retrieves documents from: the Bedrock Knowledge Base or the local dense + BM25 index."
+        },
+    )
+
+    local_retriever_path: str = field(
+        default="./obenGroup_films",
+        metadata={
+            "description": "Directory of film JSON documents indexed by the local retriever backend."
+        },
+    )
+
+    speculative_retrieval: bool = field(
+        default=True,
+        metadata={
+            "description": "Start the semantic retrieval on the raw user message while the LLM router classifies it, and use it if the route is semantic_search."
+        },
+    )
+
+    item_format: Literal["compact", "json"] = field(
+        default="compact",
+        metadata={
+            "description": "How film items are serialized in tool results: compact text or minified JSON."
+        },
+    )
+
+    item_fields: Optional[list[str]] = field(
+        default=None,
+        metadata={
+            "description": "Film fields included in tool results (id is always kept); None uses codec.DEFAULT_FIELDS."
+        },
+    )
+
+    # tools
+
+    tool_timeout: float = field(
+        default=20.0,
+        metadata={
+            "description": "Seconds a single tool call may take before semantic_retriever returns an error ToolMessage for it."
+        },
+    )
+
+    max_tool_rounds: int = field(
+        default=3,
+        metadata={
+            "description": "Maximum tool-call rounds per turn; once reached, respond answers with what it already has instead of calling more tools."
+        },
+    )
+
+    max_concurrent_tools: int = field(
+        default=4,
+        metadata={
+            "description": "Maximum number of tool calls semantic_retriever runs at the same time."
+        },
+    )
+
+    # routing
+
+    fast_router_enabled: bool = field(
+        default=True,
+        metadata={
+            "description": "Classify obvious messages (explicit film codes, follow-ups, clear intents) without calling the LLM router."
+        },
+    )
+
+    fast_router_threshold: float = field(
+        default=0.9,
+        metadata={
+            "description": "Minimum fast-router confidence to skip the LLM classification call."
+        },
+    )
+
+    # context
+
+    context_token_budget: int = field(
+        default=8000,
+        metadata={
+            "description": "Token budget of the system prompt plus history sent to the model by nodes without an entry in context_token_budgets."
+        },
+    )
+
+    context_token_budgets: dict[str, int] = field(
+        default_factory=lambda: {
+            "analyze_and_route_query": 3000,
+            "ask_for_more_info": 3000,
+            "semantic_search": 3000,
+            "respond_to_question_with_same_context": 12000,
+            "technical_retriever": 12000,
+            "respond": 16000,
+        },
+        metadata={
+            "description": "Per-node token budgets for the compacted conversation, keyed by node name."
+        },
+    )
+
+    context_keep_turns: int = field(
+        default=2,
+        metadata={
+            "description": "Number of latest turns sent verbatim; older turns are summarized or dropped to fit the budget."
+        },
+    )
+
+    def token_budget(self, node: str) -> int:
+        """Return the context token budget of ``node``."""
+        return self.context_token_budgets.get(node, self.context_token_budget)
+
+    def model_settings(self, node: str) -> list[ModelSettings]:
+        """Return the model tiers of ``node``, cheapest first.
+
+        A node has one tier unless ``model_tiers`` lists several for it or,
+        for the nodes in ``CASCADE_NODES``, ``cascade_model`` is set.
+        """
+        entries = self.model_tiers.get(node) or {}
+        if isinstance(entries, dict):
+            entries = [entries]
+            if self.cascade_model and node in CASCADE_NODES:
+                entries.append({**entries[0], "model": self.cascade_model})
+        return [
+            ModelSettings(
+                model=entry.get("model", self.model),
+                max_tokens=entry.get("max_tokens", self.max_tokens),
+                temperature=entry.get("temperature", self.temperature),
+            )
+            for entry in entries
+        ]
+
+    @classmethod
+    def from_runnable_config(
+        cls: Type[T], config: Optional[RunnableConfig] = None
+    ) -> T:
+        """Create an AgentConfiguration instance from a RunnableConfig object.
+
+        Args:
+            config (Optional[RunnableConfig]): The configuration object to use.
+
+        Returns:
+            T: An instance of AgentConfiguration with the specified configuration.
+        """
+        config = ensure_config(config)
+        configurable = config.get("configurable") or {}
+        _fields = {f.name for f in fields(cls) if f.init}
+        return cls(**{k: v for k, v in configurable.items() if k in _fields})
+
+
+T = TypeVar("T", bound=AgentConfiguration)
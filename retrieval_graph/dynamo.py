@@ -0,0 +1,368 @@
+"""DynamoDB access helpers for the ObenGroup film catalog.
+
+This module groups the keyed lookups used by the tools against the
+``obenGroup_films`` table. Exact ids are fetched with ``BatchGetItem`` and
+family-level codes (``"CC"``, ``"SCx 30"``, ...) are resolved to ids through a
+precomputed code index, so a lookup only reads the items that match instead of
+scanning the whole table.
+
+Without the catalog snapshot, the code index, the code resolver and the spec
+index are all built from one projected scan per table (:func:`get_code_scan`),
+which is reloaded after ``FILM_CATALOG_TTL`` seconds like the catalog.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Optional
+
+TABLE_NAME = "obenGroup_films"
+REGION_NAME = "us-east-1"
+BATCH_GET_LIMIT = 100
+MAX_UNPROCESSED_RETRIES = 8
+DEFAULT_CODE_SCAN_TTL = 300.0
+
+CODE_ATTRIBUTES = ("id", "Tipo", "Códigos de Película", "Dimensiones Estándar")
+"""Attributes read by :func:`scan_code_attributes`: every code plus the specification table."""
+
+logger = logging.getLogger(__name__)
+
+
+THROTTLING_CODES = frozenset({
+    "ThrottlingException",
+    "ThrottledException",
+    "TooManyRequestsException",
+    "ProvisionedThroughputExceededException",
+    "RequestLimitExceeded",
+    "ServiceQuotaExceededException",
+})
+"""AWS error codes that mean "slow down" rather than "this request is wrong"."""
+
+
+def is_throttling(error: BaseException) -> bool:
+    """Whether ``error`` (or its cause) is an AWS throttling error.
+
+    Checks botocore's ``response["Error"]["Code"]``, the exception class name
+    and, since ``langchain_aws`` re-raises some errors as ``ValueError``, the
+    message text.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        code = getattr(error, "response", {}).get("Error", {}).get("Code") if hasattr(error, "response") else None
+        if code in THROTTLING_CODES or type(error).__name__ in THROTTLING_CODES:
+            return True
+        if any(name in str(error) for name in THROTTLING_CODES):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class LatencyRecorder:
+    """Keep the latency (seconds) of the last ``maxlen`` calls of an operation."""
+
+    def __init__(self, maxlen: int = 1024):
+        self.calls = 0
+        self._samples: deque[float] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self._samples.append(seconds)
+
+    @property
+    def last(self) -> Optional[float]:
+        return self._samples[-1] if self._samples else None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the ``q`` percentile (0-100) of the recorded samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(round(q / 100 * (len(samples) - 1))))]
+
+    def summary(self) -> dict[str, Any]:
+        """Return call count and last/p50/p95/max latency in milliseconds."""
+        with self._lock:
+            samples = list(self._samples)
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            "calls": self.calls,
+            "last_ms": ms(samples[-1] if samples else None),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "max_ms": ms(max(samples) if samples else None),
+        }
+
+
+batch_get_latency = LatencyRecorder()
+"""Latency of every :func:`batch_get_items` call, across all its chunks."""
+
+_code_scans: dict[str, "CodeScan"] = {}
+_code_scans_lock = threading.Lock()
+_code_scan_refresh_lock = threading.Lock()
+
+_code_indexes: dict[str, tuple["CodeScan", dict[str, set[str]]]] = {}
+_code_indexes_lock = threading.Lock()
+
+_resource = None
+_resource_lock = threading.Lock()
+
+
+def get_dynamodb():
+    """Return the shared DynamoDB resource, creating it on first use.
+
+    Nothing touches AWS at import time; boto3 itself is only imported here.
+    """
+    global _resource
+    if _resource is None:
+        with _resource_lock:
+            if _resource is None:
+                import boto3
+
+                _resource = boto3.resource("dynamodb", region_name=REGION_NAME)
+    return _resource
+
+
+def set_dynamodb(resource) -> None:
+    """Use ``resource`` instead of the boto3 one (local stand-ins, tests)."""
+    global _resource
+    with _resource_lock:
+        _resource = resource
+
+
+def get_table(table_name: str = TABLE_NAME):
+    """Return the ``Table`` for ``table_name`` on the shared resource."""
+    return get_dynamodb().Table(table_name)
+
+
+def normalize_code(code: str) -> str:
+    """Normalize a film code the same way ids are stored (``'SCx 30'`` -> ``'scx30'``)."""
+    return code.replace(" ", "").lower()
+
+
+def expand_film_codes(codes: Iterable[str]) -> list[str]:
+    """Return the codes plus their digit-stripped (family-level) variants.
+
+    ``['CC 60', 'SCx']`` becomes ``['CC 60', 'SCx', 'CC']`` (order preserved,
+    duplicates removed).
+    """
+    extended = dict.fromkeys(codes)
+    for code in list(extended):
+        code_without_numbers = re.sub(r"\d+", "", code).strip()
+        if code_without_numbers and code_without_numbers != code:
+            extended.setdefault(code_without_numbers)
+    return list(extended)
+
+
+def scan_code_attributes(table) -> list[dict]:
+    """Read :data:`CODE_ATTRIBUTES` of every item in ``table`` with a paginated, projected scan."""
+    names = {f"#a{i}": name for i, name in enumerate(CODE_ATTRIBUTES)}
+    scan_kwargs: dict[str, Any] = {
+        "ProjectionExpression": ", ".join(names),
+        "ExpressionAttributeNames": names,
+    }
+    items: list[dict] = []
+    while True:
+        response = table.scan(**scan_kwargs)
+        items.extend(response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return items
+        scan_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+@dataclass(frozen=True)
+class CodeScan:
+    """Result of one :func:`scan_code_attributes` call.
+
+    Caches derived from it keep a reference to the scan they were built from
+    and rebuild when :func:`get_code_scan` returns a different one.
+    """
+
+    items: list[dict]
+    loaded_at: float
+
+
+def code_scan_ttl() -> float:
+    """Seconds a :class:`CodeScan` is served before reloading (``FILM_CATALOG_TTL``)."""
+    return float(os.environ.get("FILM_CATALOG_TTL") or DEFAULT_CODE_SCAN_TTL)
+
+
+def get_code_scan(table, refresh: bool = False) -> CodeScan:
+    """Return the cached projected scan of ``table``, loading it on first use.
+
+    Once older than :func:`code_scan_ttl` it is reloaded by one caller while
+    the others keep getting the stale one; if the reload fails the stale scan
+    keeps being served.
+    """
+    key = table.name
+    scan = _code_scans.get(key)
+    if scan is None or refresh:
+        with _code_scans_lock:
+            if refresh or key not in _code_scans:
+                _code_scans[key] = CodeScan(scan_code_attributes(table), time.monotonic())
+            return _code_scans[key]
+    if time.monotonic() - scan.loaded_at >= code_scan_ttl() and _code_scan_refresh_lock.acquire(blocking=False):
+        try:
+            if _code_scans.get(key) is scan:
+                try:
+                    _code_scans[key] = CodeScan(scan_code_attributes(table), time.monotonic())
+                except Exception as e:
+                    logger.warning(f"Code scan of {key} failed, serving stale scan: {e}")
+        finally:
+            _code_scan_refresh_lock.release()
+    return _code_scans[key]
+
+
+def code_index_from_items(items: Iterable[dict]) -> dict[str, set[str]]:
+    """Build a ``normalized code -> ids`` mapping for ``items``.
+
+    Every ``id``, and each ``Tipo``, ``Códigos de Película`` entry and
+    ``Dimensiones Estándar.Tabla[].Código`` (with and without its numeric
+    part) is mapped to the id of the item that owns it; these are the codes
+    :func:`code_resolver.item_codes` corrects to, and the ones the catalog's
+    ``code_index`` maps.
+    """
+    index: dict[str, set[str]] = {}
+
+    def add(code: Any, item_id: str) -> None:
+        if not isinstance(code, str) or not code.strip():
+            return
+        index.setdefault(normalize_code(code), set()).add(item_id)
+
+    for item in items:
+        item_id = item["id"]
+        add(item_id, item_id)
+        rows = (item.get("Dimensiones Estándar") or {}).get("Tabla") or []
+        codes = [item.get("Tipo"), *(item.get("Códigos de Película") or [])]
+        codes.extend(row.get("Código") for row in rows if isinstance(row, dict))
+        for code in codes:
+            if isinstance(code, str):
+                add(code, item_id)
+                add(re.sub(r"\d+", "", code), item_id)
+    return index
+
+
+def build_code_index(table) -> dict[str, set[str]]:
+    """Build the code index of ``table`` from a fresh projected scan."""
+    return code_index_from_items(scan_code_attributes(table))
+
+
+def get_code_index(table, refresh: bool = False) -> dict[str, set[str]]:
+    """Return the code index for ``table``, rebuilt whenever :func:`get_code_scan` reloads."""
+    scan = get_code_scan(table, refresh=refresh)
+    with _code_indexes_lock:
+        cached = _code_indexes.get(table.name)
+        if cached is None or cached[0] is not scan:
+            cached = _code_indexes[table.name] = (scan, code_index_from_items(scan.items))
+        return cached[1]
+
+
+def resolve_film_ids(
+    codes: Iterable[str], code_index: Optional[dict[str, set[str]]] = None
+) -> list[str]:
+    """Map user codes to item ids.
+
+    The normalized code itself is always kept as a candidate id (that is what
+    the old ``is_in`` filter matched), and any ids the code index knows for it
+    are added after it.
+    """
+    ids: dict[str, None] = {}
+    for code in codes:
+        normalized = normalize_code(code)
+        if not normalized:
+            continue
+        ids.setdefault(normalized)
+        if code_index:
+            for item_id in sorted(code_index.get(normalized, ())):
+                ids.setdefault(item_id)
+    return list(ids)
+
+
+def consumed_units(response: dict) -> float:
+    """Sum the ``ConsumedCapacity`` of a response (``ReturnConsumedCapacity="TOTAL"``)."""
+    capacity = response.get("ConsumedCapacity") or []
+    if isinstance(capacity, dict):
+        capacity = [capacity]
+    return float(sum(entry.get("CapacityUnits", 0) for entry in capacity))
+
+
+def _batch_get_chunk(dynamodb, table_name: str, chunk: list[str], max_retries: int) -> tuple[list[dict], float]:
+    """Fetch one chunk of at most 100 ids, retrying ``UnprocessedKeys``.
+
+    Returns the items and the read capacity units consumed by every attempt.
+    """
+    items: list[dict] = []
+    units = 0.0
+    request = {table_name: {"Keys": [{"id": item_id} for item_id in chunk]}}
+    attempt = 0
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request, ReturnConsumedCapacity="TOTAL")
+        units += consumed_units(response)
+        items.extend(response.get("Responses", {}).get(table_name, []))
+        request = response.get("UnprocessedKeys") or {}
+        if request:
+            attempt += 1
+            if attempt > max_retries:
+                raise RuntimeError(
+                    f"BatchGetItem left {len(request[table_name]['Keys'])} "
+                    f"unprocessed keys after {max_retries} retries"
+                )
+            time.sleep(min(0.025 * 2 ** attempt, 2.0))
+    return items, units
+
+
+def batch_get_items(
+    dynamodb,
+    ids: Iterable[str],
+    table_name: str = TABLE_NAME,
+    max_retries: int = MAX_UNPROCESSED_RETRIES,
+    max_workers: int = 1,
+) -> list[dict]:
+    """Fetch items by id with ``BatchGetItem``.
+
+    Keys are deduplicated and sent in chunks of 100 (the service limit).
+    ``UnprocessedKeys`` are retried with exponential backoff. Items come back
+    in the order of ``ids``; ids that do not exist are skipped. The latency of
+    the whole call is recorded in :data:`batch_get_latency`, and the consumed
+    read capacity is added to the active :mod:`tracing` span (``read_units``).
+
+    Args:
+        dynamodb: A boto3 DynamoDB service resource.
+        ids: Partition key values to fetch.
+        table_name: Name of the table to read from.
+        max_retries: Attempts for a chunk that keeps returning unprocessed keys.
+        max_workers: Chunks requested concurrently. ``1`` keeps them serial.
+    """
+    import tracing  # tracing builds on LatencyRecorder from this module
+
+    start = time.perf_counter()
+    ordered_ids = list(dict.fromkeys(ids))
+    chunks = [
+        ordered_ids[offset:offset + BATCH_GET_LIMIT]
+        for offset in range(0, len(ordered_ids), BATCH_GET_LIMIT)
+    ]
+
+    if max_workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(
+                lambda chunk: _batch_get_chunk(dynamodb, table_name, chunk, max_retries), chunks
+            ))
+    else:
+        results = [_batch_get_chunk(dynamodb, table_name, chunk, max_retries) for chunk in chunks]
+
+    found = {item["id"]: item for items, _ in results for item in items}
+    batch_get_latency.record(time.perf_counter() - start)
+    tracing.count("read_units", sum(units for _, units in results))
+    tracing.count("requests", len(chunks))
+    return [found[item_id] for item_id in ordered_ids if item_id in found]
@@ -0,0 +1,293 @@
+"""Offline stand-ins for the Bedrock chat model and Knowledge Base.
+
+:class:`FakeStreamingChatModel` behaves like ``ChatBedrock`` as far as the
+graph is concerned, without network access or credentials:
+
+* it streams its reply chunk by chunk (sync and async), with configurable
+  first-token and per-chunk delays, so streaming and latency can be measured;
+* ``bind_tools(..., tool_choice="<tool>")`` makes it answer with a call to
+  that tool, whose first argument is the latest user message;
+* ``with_structured_output(schema)`` returns the fast router's
+  classification for the ``Router`` schema, or ``structured_output(schema,
+  messages)`` when given (wrapped with usage under ``include_raw=True``);
+* replies carry ``usage_metadata`` estimated with :func:`compaction.estimate_tokens`.
+
+Install it for the whole process with::
+
+    from models import registry
+    registry.set_factory(fake_model_factory(token_delay=0.01))
+
+:class:`FakeKnowledgeBaseRetriever` ranks film items with the local hybrid
+retriever and adds a simulated Knowledge Base round trip; install it with
+``tools.set_kb_retriever``.
+"""
+
+import asyncio
+import itertools
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import ConfigDict
+
+from compaction import estimate_tokens
+from local_retriever import LocalHybridRetriever
+
+TOOL_CHOICES_WITHOUT_NAME = {"auto", "any", "none"}
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content
+
+
+def _last_human_text(messages: Sequence[BaseMessage]) -> str:
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            return _text(message)
+    return ""
+
+
+def default_reply(messages: Sequence[BaseMessage]) -> str:
+    """Deterministic Spanish reply that mentions the question and the last tool result."""
+    question = _last_human_text(messages)
+    return (
+        f"Con base en la información disponible, respecto a «{question}»: "
+        "la película recomendada combina buena barrera a la humedad, sellabilidad y "
+        "brillo. Si necesitas más detalles técnicos, indícame el código de la película."
+    )
+
+
+def default_structured_output(schema: Any, messages: Sequence[BaseMessage]) -> Any:
+    """Classify with the fast router; only the ``Router`` / ``ScoredRouter`` schemas are supported."""
+    from prerouter import preroute
+
+    fast_route = preroute(_last_human_text(messages))
+    result = {"type": fast_route.type, "logic": fast_route.logic}
+    if "confidence" in getattr(schema, "__annotations__", {}):
+        result["confidence"] = fast_route.confidence
+    if isinstance(schema, type) and hasattr(schema, "model_validate"):
+        return schema.model_validate(result)
+    return result
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Chat model that streams canned replies with simulated latency."""
+
+    model_name: str = "fake-streaming-chat"
+    responses: Optional[list[str]] = None
+    """Replies used in turn (cycling); defaults to :func:`default_reply`."""
+    first_token_delay: float = 0.0
+    """Seconds before the first chunk (time to first token)."""
+    token_delay: float = 0.0
+    """Seconds between chunks."""
+    chunk_words: int = 1
+    """Words per streamed chunk."""
+    structured_output: Optional[Callable[[Any, Sequence[BaseMessage]], Any]] = None
+    calls: int = 0
+
+    _counter: Any = None
+
+    def model_post_init(self, __context: Any) -> None:
+        self._counter = itertools.count()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming-chat"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def _reply(self, messages: Sequence[BaseMessage]) -> str:
+        if self.responses:
+            return self.responses[self.calls % len(self.responses)]
+        return default_reply(messages)
+
+    def _tool_call(self, messages: Sequence[BaseMessage], tools: Sequence[dict], tool_choice: Any) -> Optional[dict]:
+        if isinstance(tool_choice, dict):
+            tool_choice = tool_choice.get("name") or tool_choice.get("function", {}).get("name")
+        if not isinstance(tool_choice, str) or tool_choice in TOOL_CHOICES_WITHOUT_NAME:
+            return None
+        tool = next((t for t in tools if t["function"]["name"] == tool_choice), None)
+        if tool is None:
+            return None
+        parameters = list(tool["function"].get("parameters", {}).get("properties", {}))
+        args = {parameters[0]: _last_human_text(messages)} if parameters else {}
+        return {"name": tool_choice, "args": args, "id": f"call_{next(self._counter)}"}
+
+    def _chunks(self, text: str) -> list[str]:
+        words = re.findall(r"\S+\s*", text)
+        return ["".join(words[i:i + self.chunk_words]) for i in range(0, len(words), self.chunk_words)]
+
+    def _usage(self, messages: Sequence[BaseMessage], output: str) -> dict[str, int]:
+        input_tokens = sum(estimate_tokens(_text(message)) for message in messages)
+        output_tokens = estimate_tokens(output)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _plan(self, messages: list[BaseMessage], kwargs: dict) -> tuple[str, Optional[dict]]:
+        self.calls += 1
+        tool_call = self._tool_call(messages, kwargs.get("tools") or [], kwargs.get("tool_choice"))
+        return ("", tool_call) if tool_call else (self._reply(messages), None)
+
+    def _message(self, messages: list[BaseMessage], text: str, tool_call: Optional[dict]) -> AIMessage:
+        output = text or (json.dumps(tool_call["args"], ensure_ascii=False) if tool_call else "")
+        return AIMessage(
+            content=text,
+            tool_calls=[tool_call] if tool_call else [],
+            usage_metadata=self._usage(messages, output),
+            response_metadata={"model_name": self.model_name},
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text, tool_call = self._plan(messages, kwargs)
+        time.sleep(self.first_token_delay + self.token_delay * max(0, len(self._chunks(text)) - 1))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, text, tool_call))])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text, tool_call = self._plan(messages, kwargs)
+        await asyncio.sleep(self.first_token_delay + self.token_delay * max(0, len(self._chunks(text)) - 1))
+        return ChatResult(generations=[ChatGeneration(message=self._message(messages, text, tool_call))])
+
+    def _stream_chunks(self, messages: list[BaseMessage], kwargs: dict) -> Iterator[ChatGenerationChunk]:
+        text, tool_call = self._plan(messages, kwargs)
+        if tool_call:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="",
+                tool_call_chunks=[{
+                    "name": tool_call["name"],
+                    "args": json.dumps(tool_call["args"], ensure_ascii=False),
+                    "id": tool_call["id"],
+                    "index": 0,
+                }],
+            ))
+        else:
+            for piece in self._chunks(text):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        message = self._message(messages, text, tool_call)
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", usage_metadata=message.usage_metadata, response_metadata=message.response_metadata
+        ))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        for index, chunk in enumerate(self._stream_chunks(messages, kwargs)):
+            time.sleep(self.first_token_delay if index == 0 else self.token_delay)
+            if run_manager and chunk.message.content:
+                run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        for index, chunk in enumerate(self._stream_chunks(messages, kwargs)):
+            await asyncio.sleep(self.first_token_delay if index == 0 else self.token_delay)
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    def bind_tools(self, tools: Sequence[Any], *, tool_choice: Any = None, **kwargs: Any) -> Runnable:
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def with_structured_output(self, schema: Any, *, include_raw: bool = False, **kwargs: Any) -> Runnable:
+        build = self.structured_output or default_structured_output
+
+        def result(messages: list[BaseMessage]) -> Any:
+            parsed = build(schema, messages)
+            if not include_raw:
+                return parsed
+            raw = AIMessage(
+                content="",
+                usage_metadata=self._usage(messages, json.dumps(parsed, ensure_ascii=False, default=str)),
+                response_metadata={"model_name": self.model_name},
+            )
+            return {"raw": raw, "parsed": parsed, "parsing_error": None}
+
+        def classify(value: Any) -> Any:
+            messages = self._convert_input(value).to_messages()
+            self.calls += 1
+            time.sleep(self.first_token_delay)
+            return result(messages)
+
+        async def aclassify(value: Any) -> Any:
+            messages = self._convert_input(value).to_messages()
+            self.calls += 1
+            await asyncio.sleep(self.first_token_delay)
+            return result(messages)
+
+        return RunnableLambda(classify, afunc=aclassify, name="FakeStructuredOutput")
+
+
+def fake_model_factory(**defaults: Any) -> Callable[..., FakeStreamingChatModel]:
+    """Return a :class:`models.ModelRegistry` factory that builds fake models.
+
+    ``defaults`` are :class:`FakeStreamingChatModel` fields; Bedrock-only
+    keyword arguments passed by the nodes (``temperature``, ``max_tokens``,
+    ``config``...) are ignored.
+    """
+    known = set(FakeStreamingChatModel.model_fields)
+
+    def factory(model: str, **kwargs: Any) -> FakeStreamingChatModel:
+        options = {**defaults, **{k: v for k, v in kwargs.items() if k in known}}
+        return FakeStreamingChatModel(model_name=model, **options)
+
+    return factory
+
+
+class FakeKnowledgeBaseRetriever(BaseRetriever):
+    """Knowledge Base stand-in with deterministic rankings and a simulated round trip."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retriever: LocalHybridRetriever
+    latency: float = 0.0
+    """Seconds per retrieval."""
+    calls: int = 0
+
+    @classmethod
+    def from_items(cls, items: Sequence[dict], latency: float = 0.0, k: int = 5) -> "FakeKnowledgeBaseRetriever":
+        return cls(retriever=LocalHybridRetriever.from_items(items, k=k), latency=latency)
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.retriever.search_batch([query])[0]
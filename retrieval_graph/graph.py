@@ -5,32 +5,138 @@ retrieval graph. It includes the main graph definition, state management,
 and key functions for processing & routing user queries, generating research plans to answer user questions,
 conducting research, and formulating responses.
 """
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, HumanMessage
 import asyncio
+import functools
+import logging
+import time
+from collections import defaultdict
 
 from langchain_core.messages import ToolMessage
-from typing import Any, Literal, TypedDict, cast
+from typing import Any, Callable, Literal, Optional, TypedDict, cast, get_args
 from langchain_core.tools import StructuredTool
 
 from langchain_core.messages import BaseMessage
 from langchain_core.runnables import RunnableConfig
-from langgraph.graph import END, START, StateGraph, MessagesState
+from langgraph.graph import END, START, StateGraph
+from cascade import parsed_output, run_tiers
+from compaction import compact_messages
 from configuration import AgentConfiguration
-from state import AgentState, InputState, Router
-from langchain_core.language_models import BaseChatModel
-from langchain_aws import ChatBedrock
-from tools import tools, semantic_search_tool 
-
-
-def load_chat_model() -> BaseChatModel:
-    return ChatBedrock(
-    model="anthropic.claude-3-haiku-20240307-v1:0",
-    # other params...
-)
+from dynamo import LatencyRecorder, is_throttling
+from state import AgentState, InputState, Router, ScoredRouter
+from models import registry
+from prerouter import preroute
+from sessions import get_session_saver
+import speculation
+import tracing
+from tools import tools, technical_tools, semantic_search_tool, spec_filter_tool, specific_search_tool
+
+logger = logging.getLogger(__name__)
+
+TOOLS_BY_NAME = {tool.name: tool for tool in (semantic_search_tool, specific_search_tool, spec_filter_tool)}
+"""Herramientas que puede ejecutar ``semantic_retriever``, por nombre."""
+
+RESPOND_TOOLS = list(TOOLS_BY_NAME.values())
+"""Herramientas enlazadas en ``respond``: todas las que pueden aparecer en el historial."""
+
+ROUTES = get_args(Router.__annotations__["type"])
+"""Tipos de ruta válidos del enrutador."""
+
+tool_latency: defaultdict[str, LatencyRecorder] = defaultdict(LatencyRecorder)
+"""Latencia de cada ejecución de herramienta, por nombre de herramienta."""
+
+
+def get_message_text(message) -> str:
+    """Devuelve el texto de un mensaje, ya sea un ``BaseMessage`` o un dict ``{"role", "content"}``."""
+    content = message.get("content", "") if isinstance(message, dict) else message.content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return content
+
+
+def _route_check(min_confidence: float) -> Callable[[dict], Optional[str]]:
+    """Devuelve el criterio de escalamiento del enrutador: ``None`` si la clasificación es válida, o el motivo."""
+
+    def check(output: dict) -> Optional[str]:
+        if output.get("parsing_error") is not None or output.get("parsed") is None:
+            return "parse_error"
+        route = output["parsed"]
+        if route.get("type") not in ROUTES:
+            return "invalid_route"
+        if route.get("confidence", 1.0) < min_confidence:
+            return "low_confidence"
+        return None
+
+    return check
+
+
+def _check_tool_call(message: AIMessage) -> Optional[str]:
+    """Escala cuando el modelo no generó la llamada a la herramienta o sus argumentos no se pudieron leer."""
+    if message.invalid_tool_calls or not message.tool_calls:
+        return "parse_error"
+    return None
+
+
+def tool_rounds(messages: list) -> int:
+    """Cuenta los mensajes del modelo con llamadas a herramientas desde el último mensaje del usuario."""
+    rounds = 0
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            break
+        if isinstance(message, AIMessage) and message.tool_calls:
+            rounds += 1
+    return rounds
+
+
+def _check_tool_calls(message: AIMessage) -> Optional[str]:
+    """Escala cuando alguna llamada a herramienta no se pudo leer (responder sin herramientas es válido)."""
+    return "parse_error" if message.invalid_tool_calls else None
+
+
+def _record_output(span, output: Any) -> None:
+    """Anota en el span la ruta elegida y los tokens de los mensajes del modelo."""
+    if not isinstance(output, dict):
+        return
+    router = output.get("router")
+    if router:
+        span.set(route=router["type"])
+    for message in output.get("messages", []):
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            span.add("input_tokens", usage.get("input_tokens", 0))
+            span.add("output_tokens", usage.get("output_tokens", 0))
+
+
+def traced_node(node):
+    """Envuelve un nodo del grafo en un span de ``tracing`` (sin costo si está deshabilitado)."""
+
+    @functools.wraps(node)
+    async def wrapper(state: AgentState, *, config: RunnableConfig):
+        with tracing.span(node.__name__, "node") as span:
+            output = await node(state, config=config)
+            _record_output(span, output)
+            return output
+
+    return wrapper
+
+
+def build_messages(
+    system_prompt: str, state: AgentState, configuration: AgentConfiguration, node: str
+) -> list:
+    """Arma ``[system] + historial`` compactado al presupuesto de tokens del nodo."""
+    messages, report = compact_messages(
+        system_prompt,
+        state.messages,
+        configuration.token_budget(node),
+        keep_turns=configuration.context_keep_turns,
+        node=node,
+    )
+    tracing.annotate(tokens_before=report.tokens_before, tokens_after=report.tokens_after)
+    return messages
 
 
 async def analyze_and_route_query(
-    state: AgentState, 
+    state: AgentState, *, config: RunnableConfig
 ) -> dict[str, Router]:
     """Analiza la consulta del usuario y determina la ruta apropiada.
 
@@ -45,18 +151,57 @@ async def analyze_and_route_query(
         dict[str, Router]: Un diccionario que contiene la clave 'router' con el resultado de la clasificación
                             (tipo de clasificación y lógica).
     """
-    configuration = AgentConfiguration
-    model = load_chat_model()
-    print("estamos en el nodo: analyze_and_route_query")
-    messages = [
-        {"role": "system", "content": configuration.router_system_prompt}
-    ] + state.messages
-
-    response = await cast(
-        Router, model.with_structured_output(Router).ainvoke(messages)
-    )
+    configuration = AgentConfiguration.from_runnable_config(config)
 
-    return {"router": response}
+    if configuration.fast_router_enabled:
+        # Ruta rápida: códigos explícitos, seguimientos y consultas obvias sin llamar al LLM
+        has_history = any(isinstance(message, AIMessage) for message in state.messages[:-1])
+        fast_route = preroute(get_message_text(state.messages[-1]), has_history=has_history)
+        if fast_route.confidence >= configuration.fast_router_threshold:
+            tracing.annotate(router="fast")
+            return {
+                "router": Router(type=fast_route.type, logic=fast_route.logic),
+                "speculative_result": None,
+            }
+
+    # Mientras el LLM clasifica, la búsqueda semántica ya corre sobre el mensaje del usuario
+    speculative = None
+    if configuration.speculative_retrieval:
+        speculative = speculation.start(
+            semantic_search_tool, get_message_text(state.messages[-1]), config
+        )
+
+    tracing.annotate(router="llm")
+    messages = build_messages(
+        configuration.router_system_prompt, state, configuration, "analyze_and_route_query"
+    )
+    # Con cascada el modelo rápido también estima su confianza para decidir si se escala
+    tiers = configuration.model_settings("analyze_and_route_query")
+    schema = ScoredRouter if len(tiers) > 1 else Router
+
+    try:
+        output = await run_tiers(
+            "analyze_and_route_query",
+            tiers,
+            lambda model: registry.with_structured_output(model, schema, include_raw=True).ainvoke(messages, config),
+            _route_check(configuration.cascade_min_confidence),
+        )
+        response = cast(Router, parsed_output(output))
+    except BaseException:
+        if speculative is not None:
+            speculative.cancel()
+        raise
+
+    speculative_result = None
+    if speculative is not None:
+        if response["type"] == "semantic_search":
+            speculative_result = await speculative.resolve(
+                time.perf_counter(), timeout=configuration.tool_timeout
+            )
+        else:
+            speculative.cancel()
+
+    return {"router": response, "speculative_result": speculative_result}
 
 
 def route_query(
@@ -74,14 +219,13 @@ def route_query(
         ValueError: If an unknown router type is encountered.
     """
 
-    print("estamos en el nodo: route_query")
-    print(state.router["type"])
+    logger.debug("route: %s", state.router["type"])
     return state.router["type"]
 
 
 
 async def ask_for_more_info(
-    state: AgentState,
+    state: AgentState, *, config: RunnableConfig
 ): #-> dict[str, list[BaseMessage]]:
     """Genera una respuesta pidiendo más detalles al usuario sobre sus necesidades específicas.
 
@@ -95,12 +239,15 @@ async def ask_for_more_info(
         dict[str, list[str]]: Un diccionario con una clave 'messages' que contiene la respuesta generada.
     """
 
-    configuration = AgentConfiguration
-    model = load_chat_model()
+    configuration = AgentConfiguration.from_runnable_config(config)
     #system_prompt = configuration.more_info_system_prompt.format(logic=state.router["logic"])
     system_prompt = configuration.more_info_system_prompt
-    messages = [{"role": "system", "content": system_prompt}] + state.messages
-    response = await model.ainvoke(messages)
+    messages = build_messages(system_prompt, state, configuration, "ask_for_more_info")
+    response = await run_tiers(
+        "ask_for_more_info",
+        configuration.model_settings("ask_for_more_info"),
+        lambda model: model.ainvoke(messages, config),
+    )
     #print(response)
     #return {"messages": [{"role": "assistant", "content": "ask_for_more_info"}]}
 
@@ -109,7 +256,7 @@ async def ask_for_more_info(
 
 
 async def semantic_search(
-    state: AgentState,
+    state: AgentState, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Genera una respuesta a una consulta abierta, por ejemplo que películas le recomendaría para café o carnes.
 
@@ -123,81 +270,113 @@ async def semantic_search(
         dict[str, list[str]]: Un diccionario con una clave 'messages' que contiene la respuesta generada.
     """
 
-    configuration = AgentConfiguration
-    model = load_chat_model()
-    model_with_tools = model.bind_tools(tools, tool_choice = "semantic_search_tool")
+    if state.speculative_result is not None:
+        # La búsqueda ya se hizo durante el enrutamiento: se emite la llamada sin consultar al modelo
+        tool_call = {
+            "name": semantic_search_tool.name,
+            "args": {"query": get_message_text(state.messages[-1])},
+            "id": state.speculative_result.tool_call_id,
+            "type": "tool_call",
+        }
+        return {"messages": [AIMessage(content="", tool_calls=[tool_call])]}
+
+    configuration = AgentConfiguration.from_runnable_config(config)
     system_prompt = configuration.general_system_prompt
-    messages = [{"role": "system", "content": system_prompt}] + state.messages
-    ai_msg = await model_with_tools.ainvoke(messages)
+    messages = build_messages(system_prompt, state, configuration, "semantic_search")
+    ai_msg = await run_tiers(
+        "semantic_search",
+        configuration.model_settings("semantic_search"),
+        lambda model: registry.bind_tools(model, tools, tool_choice="semantic_search_tool").ainvoke(messages, config),
+        _check_tool_call,
+    )
     return {"messages": [ai_msg]}
-    #print(ai_msg)
-    #query sise usa la api de converse
-    #query = ai_msg.content[0]['input']['query']
-    #print(type(ai_msg))
-    #print(dir(ai_msg))  # Esto te mostrará los atributos disponibles de la clase
-
-    tool_calls = ai_msg.tool_calls
-    print("query:")
-    query = tool_calls[0].get('args', {}).get('query', None)
-
-    print(query)
-    #print(tools)
-    tool_output = semantic_search.invoke(query)
-    tool_response = ToolMessage(content=tool_output,artifact=tool_output["items"], tool_call_id="semantic_search")
-    #print("tool_response: ")
-    #print(tool_response)
-    #messages.append(tool_response)
 
-    return {"messages": [tool_response]}
+
+def _tool_error(tool_call: dict, error: str) -> ToolMessage:
+    return ToolMessage(
+        content=f"Error: {error}",
+        name=tool_call["name"],
+        tool_call_id=tool_call["id"],
+        status="error",
+    )
+
+
+async def _run_tool_call(
+    tool_call: dict,
+    config: RunnableConfig,
+    semaphore: asyncio.Semaphore,
+    timeout: float,
+    speculative_result: Optional[ToolMessage] = None,
+) -> ToolMessage:
+    """Ejecuta una llamada a herramienta con límite de tiempo y registra su latencia."""
+    if speculative_result is not None and tool_call["id"] == speculative_result.tool_call_id:
+        return speculative_result
+
+    selected_tool = TOOLS_BY_NAME.get(tool_call["name"].lower())
+    if selected_tool is None:
+        return _tool_error(tool_call, f"herramienta desconocida '{tool_call['name']}'")
+
+    async with semaphore:
+        start = time.perf_counter()
+        with tracing.span(selected_tool.name, "tool") as span:
+            try:
+                # ainvoke ejecuta las herramientas síncronas en un hilo sin bloquear el event loop
+                message = await asyncio.wait_for(selected_tool.ainvoke(tool_call, config), timeout)
+                span.set(status=getattr(message, "status", "success"))
+                return message
+            except asyncio.TimeoutError:
+                logger.warning("tool %s timed out after %.1f s", selected_tool.name, timeout)
+                span.set(status="timeout")
+                return _tool_error(tool_call, f"la herramienta no respondió en {timeout:g} s")
+            except Exception as e:
+                logger.error("tool %s failed: %s", selected_tool.name, e)
+                span.set(status="error")
+                if is_throttling(e):
+                    # Sin datos la respuesta sería incorrecta: el throttling falla la ejecución
+                    # para que se reintente (run_batch) o se devuelva 503 (server)
+                    raise
+                return _tool_error(tool_call, str(e))
+            finally:
+                elapsed = time.perf_counter() - start
+                tool_latency[selected_tool.name].record(elapsed)
+                logger.debug("tool %s: %.1f ms", selected_tool.name, elapsed * 1000)
+
 
 async def semantic_retriever(
-    state: AgentState,
+    state: AgentState, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
-    """Genera una respuesta a una consulta abierta, por ejemplo que películas le recomendaría para café o carnes.
+    """Ejecuta todas las llamadas a herramientas del último mensaje del modelo.
 
-    Este nodo se activa cuando el enrutador clasifica la consulta como una pregunta general.
+    Sirve a ``semantic_search``, a ``technical_retriever`` y a ``respond``, y siempre continúa en ``respond``.
+
+    Las llamadas se ejecutan concurrentemente (como máximo ``max_concurrent_tools`` a la vez
+    y cada una con ``tool_timeout`` segundos). Se devuelve un ``ToolMessage`` por llamada, en
+    el mismo orden en que el modelo las pidió; una llamada que falla o excede el tiempo produce
+    un ``ToolMessage`` con ``status="error"`` sin afectar a las demás. La llamada que
+    corresponde a la búsqueda especulativa devuelve el resultado ya obtenido.
 
     Args:
-        state (AgentState): El estado actual del agente, incluyendo el historial de la conversación y la lógica del enrutador.
-        config (RunnableConfig): Configuración con el modelo utilizado para responder.
+        state (AgentState): El estado actual del agente; el último mensaje contiene las llamadas a herramientas.
+        config (RunnableConfig): Configuración con el límite de tiempo y de concurrencia.
 
     Returns:
-        dict[str, list[str]]: Un diccionario con una clave 'messages' que contiene la respuesta generada.
+        dict[str, list[str]]: Un diccionario con una clave 'messages' que contiene un ToolMessage por llamada.
     """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    tool_calls = state.messages[-1].tool_calls
+    semaphore = asyncio.Semaphore(max(1, configuration.max_concurrent_tools))
+    tool_messages = await asyncio.gather(*(
+        _run_tool_call(
+            tool_call, config, semaphore, configuration.tool_timeout, state.speculative_result
+        )
+        for tool_call in tool_calls
+    ))
+    return {"messages": list(tool_messages)}
+
+
 
-    #print(ai_msg)
-    #query sise usa la api de converse
-    #query = ai_msg.content[0]['input']['query']
-    #print(type(ai_msg))
-    #print(dir(ai_msg))  # Esto te mostrará los atributos disponibles de la clase
-
-    query = state.messages[-1].tool_calls[0].get('args', {}).get('query', None)
-
-    #print(tools)
-    #tool_output = semantic_search.invoke(query)
-    #print("query que debería encontrar en el tool response:")
-    #print(query)
-    #tool_call_id = state.messages[-1].tool_calls[0].get('id', {})
-    #print(tool_call_id)
-
-    #tool_response = ToolMessage(content=tool_output,tool_call_id=tool_call_id)
-    #print("tool_response: ")
-    #print(tool_response)
-    #messages.append(tool_response)
-    print("Recorriendo toll calls")
-    for tool_call in state.messages[-1].tool_calls:
-        selected_tool = {"semantic_search_tool": semantic_search_tool}[tool_call["name"].lower()]
-        print("selected_tool: ")
-        print(selected_tool)
-        tool_msg = selected_tool.invoke(tool_call)
-        print("tool_msg: ")
-        print(tool_msg)
-        return {"messages": [tool_msg]}
-
-
-
-def respond_to_question_with_same_context(
-    state: AgentState, 
+async def respond_to_question_with_same_context(
+    state: AgentState, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Genera una respuesta a una consulta que puede ser respondida con el mismo contexto de los mensajes previos.
 
@@ -211,17 +390,21 @@ def respond_to_question_with_same_context(
         dict[str, list[str]]: Un diccionario con una clave 'messages' que contiene la respuesta generada.
     """
 
-    configuration = AgentConfiguration
-    model = load_chat_model()
+    configuration = AgentConfiguration.from_runnable_config(config)
     #system_prompt = configuration.general_system_prompt.format(logic=state.router["logic"])
     system_prompt = configuration.general_system_prompt
-    messages = [{"role": "system", "content": system_prompt}] + state.messages
-    print("nodo: respond_to_question_with_same_context")
-    response = model.ainvoke(messages)
+    messages = build_messages(
+        system_prompt, state, configuration, "respond_to_question_with_same_context"
+    )
+    response = await run_tiers(
+        "respond_to_question_with_same_context",
+        configuration.model_settings("respond_to_question_with_same_context"),
+        lambda model: model.ainvoke(messages, config),
+    )
 
     return {"messages": [response]}
 
-def technical_retriever(
+async def technical_retriever(
     state: AgentState, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Genera una respuesta a una consulta sobre una propiedad específica. dentro de la base de datos
@@ -236,34 +419,24 @@ def technical_retriever(
         dict[str, list[str]]: Un diccionario con una clave 'messages' que contiene la respuesta generada.
     """
     configuration = AgentConfiguration.from_runnable_config(config)
-    model = load_chat_model()
     system_prompt = configuration.general_system_prompt.format(
         logic=state.router["logic"]
     )
-    messages = [{"role": "system", "content": system_prompt}] + state.messages
-    tool_response = model.ainvoke(messages)
-    print("nodo: semantic_search")
-    print(tool_response)
+    messages = build_messages(system_prompt, state, configuration, "technical_retriever")
+    # El modelo busca por código (specific_search_tool) o filtra por especificaciones
+    # (spec_filter_tool); sus llamadas las ejecuta semantic_retriever antes de responder
+    tool_response = await run_tiers(
+        "technical_retriever",
+        configuration.model_settings("technical_retriever"),
+        lambda model: registry.bind_tools(model, technical_tools).ainvoke(messages, config),
+        _check_tool_calls,
+    )
     return {"messages": [tool_response]}
 
 
 
-def save_to_txt(data, filename: str):
-    """Guardar los datos tal cual en un archivo txt."""
-    # Convertir el dato a string si no es string (esto es para asegurar que todo se pueda guardar en el archivo)
-    data_str = str(data)
-    
-    # Definir la ruta del archivo .txt
-    file_path = f"./{filename}.txt"
-    
-    # Guardar el archivo en formato texto
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(data_str)
-    
-    print(f"El contenido se ha guardado en {file_path}")
-
 async def respond(
-    state: AgentState,
+    state: AgentState, *, config: RunnableConfig
 ) -> dict[str, list[BaseMessage]]:
     """Genera una respuesta final a la consulta del usuario basándose en la investigación realizada.
 
@@ -276,30 +449,44 @@ async def respond(
     Returns:
         dict[str, list[str]]: Un diccionario con la clave 'messages' que contiene la respuesta generada.
     """
-    print("estamos en el nodo: respond")
-    configuration = AgentConfiguration
-    model = load_chat_model()
-    model = model.bind_tools(tools)
+    configuration = AgentConfiguration.from_runnable_config(config)
     system_prompt = configuration.general_system_prompt    
-    messages = [{"role": "system", "content": system_prompt}] + state.messages
-    print("messages: ")
-    print(messages)
-    save_to_txt(messages, "messages")
-    response =  await model.ainvoke(messages)
-    save_to_txt(response, "response")
-    print(response)
+    messages = build_messages(system_prompt, state, configuration, "respond")
+    logger.debug("respond: %d mensajes en el prompt", len(messages))
+    response = await run_tiers(
+        "respond",
+        configuration.model_settings("respond"),
+        lambda model: registry.bind_tools(model, RESPOND_TOOLS).ainvoke(messages, config),
+        _check_tool_calls,
+    )
+    if response.tool_calls and tool_rounds(state.messages) >= configuration.max_tool_rounds:
+        # Sin más rondas de herramientas: se responde con lo obtenido y no se deja la llamada pendiente
+        logger.warning("respond: límite de %d rondas de herramientas alcanzado", configuration.max_tool_rounds)
+        response = response.model_copy(update={"tool_calls": [], "invalid_tool_calls": []})
     return {"messages": [response]}
 
 
+def route_tool_calls(state: AgentState) -> Literal["semantic_retriever", "respond"]:
+    """Ejecuta las llamadas a herramientas del modelo, si las hizo, antes de responder."""
+    last = state.messages[-1]
+    return "semantic_retriever" if isinstance(last, AIMessage) and last.tool_calls else "respond"
+
+
+def route_after_respond(state: AgentState) -> Literal["semantic_retriever", "__end__"]:
+    """Si la respuesta final pide herramientas, se ejecutan y se vuelve a responder."""
+    last = state.messages[-1]
+    return "semantic_retriever" if isinstance(last, AIMessage) and last.tool_calls else END
+
+
 # Define the graph
-builder = StateGraph(MessagesState, config_schema=AgentConfiguration)
-builder.add_node(analyze_and_route_query)
-builder.add_node(ask_for_more_info)
-builder.add_node(semantic_search)
-builder.add_node(semantic_retriever)
-builder.add_node(technical_retriever)
-builder.add_node(respond_to_question_with_same_context)
-builder.add_node(respond)
+builder = StateGraph(AgentState, input=InputState, config_schema=AgentConfiguration)
+builder.add_node(traced_node(analyze_and_route_query))
+builder.add_node(traced_node(ask_for_more_info))
+builder.add_node(traced_node(semantic_search))
+builder.add_node(traced_node(semantic_retriever))
+builder.add_node(traced_node(technical_retriever))
+builder.add_node(traced_node(respond_to_question_with_same_context))
+builder.add_node(traced_node(respond))
 
 #define the flow
 builder.add_edge(START, "analyze_and_route_query")
@@ -310,29 +497,43 @@ builder.add_edge("respond_to_question_with_same_context", END)
 builder.add_edge("ask_for_more_info", END)
 builder.add_edge("semantic_search", "semantic_retriever")
 builder.add_edge("semantic_retriever", "respond")
-builder.add_edge("technical_retriever", "respond")
-builder.add_edge("respond", END)
+builder.add_conditional_edges("technical_retriever", route_tool_calls)
+builder.add_conditional_edges("respond", route_after_respond)
 
 # Compile into a graph object that you can invoke and deploy.
-graph = builder.compile()
+# Con SESSION_DB_PATH las conversaciones se guardan por thread_id (ver sessions.py)
+graph = builder.compile(checkpointer=get_session_saver())
 graph.name = "RetrievalGraph"
 
-from IPython.display import Image, display
 
-graph_data = graph.get_graph(xray=1).draw_mermaid_png()
+def draw_graph(path: str = "graph.png") -> str:
+    """Renderiza el diagrama Mermaid del grafo y lo guarda como PNG.
+
+    Es opcional y explícito: ``draw_mermaid_png`` llama a un servicio externo,
+    así que no se ejecuta al importar el módulo.
+    """
+    graph_data = graph.get_graph(xray=1).draw_mermaid_png()
 
-# Guardar el gráfico como archivo PNG
-with open('graph.png', 'wb') as f:
-    f.write(graph_data)
+    # Guardar el gráfico como archivo PNG
+    with open(path, 'wb') as f:
+        f.write(graph_data)
+    return path
 
 
 async def main():
-    #output = await graph.ainvoke({"messages": [HumanMessage(content="Cual es la mejor pelicula?")]})
-    output = await graph.ainvoke({"messages": [HumanMessage(content="¿Cuál es el tipo de película me srive para empacar o envovler café?")]})
+    from streaming import stream_graph
 
-    #output["messages"][-1].pretty_print()  # output contains all messages in state
-    for message in output["messages"]:
-        message.pretty_print()
+    #output = await graph.ainvoke({"messages": [HumanMessage(content="Cual es la mejor pelicula?")]})
+    inputs = {"messages": [HumanMessage(content="¿Cuál es el tipo de película me srive para empacar o envovler café?")]}
+
+    # Imprime los tokens conforme llegan en lugar de esperar la respuesta completa
+    async for event in stream_graph(inputs):
+        if event.type == "token":
+            print(event.text, end="", flush=True)
+        elif event.type == "node_start":
+            print(f"\n[{event.node}]", flush=True)
+        elif event.type == "done":
+            print(f"\n\nTTFT: {event.metrics.ttft_ms} ms, total: {event.metrics.total_ms} ms")
 
 # Para ejecutarlo en un script normal
 if __name__ == "__main__":
@@ -0,0 +1,320 @@
+"""Local hybrid retriever over the film JSON documents.
+
+An offline alternative to the Bedrock Knowledge Base: the same film documents
+are indexed in process with
+
+* a dense index: one L2-normalized embedding per film in a NumPy matrix,
+  queried with a single matrix product and ``argpartition`` top-k (batched
+  for many queries at once), and
+* a BM25 keyword index over ``Aplicaciones``, ``Características Principales``
+  and ``Descripción``,
+
+and both rankings are merged with reciprocal rank fusion. Results are
+``Document`` objects with the Knowledge Base metadata shape
+(``location.s3Location.uri`` ending in ``/<id>.json``), so ``extract_uris``
+and the Dynamo hydration step work unchanged.
+
+Embeddings default to a dependency-free hashing embedder (word and character
+n-grams); pass ``embed_documents`` / ``embed_query`` (e.g. from
+``BedrockEmbeddings``) for model embeddings.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Callable, Iterable, Optional, Sequence
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from retrieval_cache import STOPWORDS
+
+KB_BUCKET = "knowledge-bases-obengroup-test"
+
+DOCUMENT_FIELDS = (
+    "Aplicaciones",
+    "Características Principales",
+    "Descripción",
+    "Familia",
+    "Tipo",
+    "Fuente",
+    "Unidad de Negocio",
+    "Códigos de Película",
+)
+"""Fields of each film that the Knowledge Base documents contain."""
+
+KEYWORD_FIELDS = ("Aplicaciones", "Características Principales", "Descripción")
+
+EmbedDocuments = Callable[[list[str]], Sequence[Sequence[float]]]
+EmbedQuery = Callable[[str], Sequence[float]]
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, strip accents and stopwords, and crudely singularize Spanish words."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+", text):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("es"):
+            token = token[:-2]
+        elif len(token) > 3 and token.endswith("s"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def _field_text(item: dict, name: str) -> str:
+    value = item.get(name)
+    if isinstance(value, (list, tuple, set)):
+        return " ".join(str(v) for v in value)
+    return str(value) if value is not None else ""
+
+
+class HashingEmbedder:
+    """Feature-hashing bag of words and character trigrams, L2-normalized."""
+
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+        self._features: dict[str, np.ndarray] = {}
+
+    def _token_features(self, token: str) -> np.ndarray:
+        features = self._features.get(token)
+        if features is None:
+            features = np.zeros(self.dim, dtype=np.float32)
+            features[zlib.crc32(token.encode()) % self.dim] += 1.0
+            padded = f"#{token}#"
+            for i in range(len(padded) - 2):
+                features[zlib.crc32(padded[i:i + 3].encode()) % self.dim] += 0.5
+            self._features[token] = features
+        return features
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token, count in Counter(tokenize(text)).items():
+            vector += count * self._token_features(token)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> np.ndarray:
+        return np.stack([self._vector(text) for text in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self._vector(text)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the ``k`` highest scores per row, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+class DenseIndex:
+    """Cosine-similarity index backed by a NumPy matrix."""
+
+    def __init__(self, embeddings: np.ndarray):
+        self.matrix = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+    def search(self, query_embeddings: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(indices, scores)`` of shape ``(n_queries, k)``."""
+        queries = _normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+        scores = queries @ self.matrix.T
+        indices = _top_k(scores, k)
+        return indices, np.take_along_axis(scores, indices, axis=1)
+
+
+class BM25Index:
+    """Okapi BM25 over pre-tokenized documents."""
+
+    def __init__(self, documents: Sequence[list[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        lengths = np.array([len(tokens) for tokens in documents], dtype=np.float32)
+        average = float(lengths.mean()) if self.size else 0.0
+        self._norm = k1 * (1 - b + b * lengths / (average or 1.0))
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+        postings: dict[str, list[tuple[int, int]]] = {}
+        for doc_index, tokens in enumerate(documents):
+            for term, frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_index, frequency))
+        for term, entries in postings.items():
+            docs = np.array([doc for doc, _ in entries], dtype=np.int64)
+            freqs = np.array([freq for _, freq in entries], dtype=np.float32)
+            self._postings[term] = (docs, freqs)
+        self._idf = {
+            term: math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, (docs, _) in self._postings.items()
+        }
+
+    def scores(self, query_tokens: Iterable[str]) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(query_tokens):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            docs, freqs = posting
+            scores[docs] += self._idf[term] * freqs * (self.k1 + 1) / (freqs + self._norm[docs])
+        return scores
+
+
+class LocalHybridRetriever(BaseRetriever):
+    """Dense + BM25 retriever over film items, returning Knowledge Base shaped documents.
+
+    Build it with :meth:`from_items` or :meth:`from_directory`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    k: int = 5
+    """Number of documents returned per query."""
+    rrf_k: int = 60
+    """Rank offset of reciprocal rank fusion."""
+    dense_weight: float = 1.0
+    keyword_weight: float = 1.0
+    candidates: int = 50
+    """How many hits of each index take part in the fusion."""
+    bucket: str = KB_BUCKET
+
+    _items: list[dict] = PrivateAttr(default_factory=list)
+    _documents: list[str] = PrivateAttr(default_factory=list)
+    _dense: Optional[DenseIndex] = PrivateAttr(default=None)
+    _bm25: Optional[BM25Index] = PrivateAttr(default=None)
+    _embed_query: Optional[EmbedQuery] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_items(
+        cls,
+        items: Iterable[dict],
+        embed_documents: Optional[EmbedDocuments] = None,
+        embed_query: Optional[EmbedQuery] = None,
+        **kwargs,
+    ) -> "LocalHybridRetriever":
+        """Index film items (DynamoDB / JSON shape, with an ``id``)."""
+        if (embed_documents is None) != (embed_query is None):
+            raise ValueError("embed_documents and embed_query must be given together")
+        if embed_documents is None:
+            embedder = HashingEmbedder()
+            embed_documents, embed_query = embedder.embed_documents, embedder.embed_query
+
+        retriever = cls(**kwargs)
+        retriever._items = [item for item in items if item.get("id")]
+        retriever._documents = [
+            json.dumps(
+                {name: item[name] for name in DOCUMENT_FIELDS if name in item}, default=str
+            )
+            for item in retriever._items
+        ]
+        dense_texts = [
+            " ".join(_field_text(item, name) for name in DOCUMENT_FIELDS) for item in retriever._items
+        ]
+        retriever._dense = DenseIndex(np.asarray(embed_documents(dense_texts), dtype=np.float32))
+        retriever._bm25 = BM25Index([
+            tokenize(" ".join(_field_text(item, name) for name in KEYWORD_FIELDS))
+            for item in retriever._items
+        ])
+        retriever._embed_query = embed_query
+        return retriever
+
+    @classmethod
+    def from_directory(cls, path: str, **kwargs) -> "LocalHybridRetriever":
+        """Index every ``*.json`` film file in ``path`` (the layout ``updateDYnamo.py`` loads)."""
+        items = []
+        for filename in sorted(os.listdir(path)):
+            if filename.endswith(".json"):
+                with open(os.path.join(path, filename), encoding="utf-8") as f:
+                    items.append(json.load(f))
+        return cls.from_items(items, **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _document(self, index: int, score: float) -> Document:
+        uri = f"s3://{self.bucket}/{self._items[index]['id']}.json"
+        return Document(
+            page_content=self._documents[index],
+            metadata={
+                "location": {"s3Location": {"uri": uri}, "type": "S3"},
+                "score": score,
+                "source_metadata": {"x-amz-bedrock-kb-source-uri": uri},
+            },
+        )
+
+    def search_batch(self, queries: Sequence[str], k: Optional[int] = None) -> list[list[Document]]:
+        """Retrieve the top ``k`` documents for each query; the dense search runs as one batch."""
+        k = k or self.k
+        if not self._items or not queries:
+            return [[] for _ in queries]
+
+        candidates = max(self.candidates, k)
+        query_embeddings = np.stack([
+            np.asarray(self._embed_query(query), dtype=np.float32) for query in queries
+        ])
+        dense_hits, _ = self._dense.search(query_embeddings, candidates)
+
+        results = []
+        for query, dense_row in zip(queries, dense_hits):
+            keyword_scores = self._bm25.scores(tokenize(query))
+            keyword_row = _top_k(keyword_scores[np.newaxis, :], candidates)[0]
+            fused: dict[int, float] = {}
+            for rank, index in enumerate(dense_row):
+                fused[int(index)] = fused.get(int(index), 0.0) + self.dense_weight / (self.rrf_k + rank + 1)
+            for rank, index in enumerate(keyword_row):
+                if keyword_scores[index] <= 0:
+                    break
+                fused[int(index)] = fused.get(int(index), 0.0) + self.keyword_weight / (self.rrf_k + rank + 1)
+            ranked = sorted(fused.items(), key=lambda pair: (-pair[1], pair[0]))[:k]
+            results.append([self._document(index, score) for index, score in ranked])
+        return results
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return self.search_batch([query])[0]
+
+
+_local_retrievers: dict[str, LocalHybridRetriever] = {}
+_local_retrievers_lock = threading.Lock()
+
+
+def get_local_retriever(path: str) -> LocalHybridRetriever:
+    """Return the retriever for ``path``, building its indexes once per process.
+
+    ``path`` is a directory of film JSON files. When the catalog snapshot is
+    enabled and ``path`` does not exist, the snapshot items are indexed instead.
+    """
+    with _local_retrievers_lock:
+        retriever = _local_retrievers.get(path)
+        if retriever is None:
+            if os.path.isdir(path):
+                retriever = LocalHybridRetriever.from_directory(path)
+            else:
+                from catalog import get_catalog
+
+                catalog = get_catalog()
+                if catalog is None:
+                    raise FileNotFoundError(
+                        f"Local retriever source {path!r} does not exist and the catalog snapshot is disabled"
+                    )
+                retriever = LocalHybridRetriever.from_items(catalog.snapshot().items.values())
+            _local_retrievers[path] = retriever
+        return retriever
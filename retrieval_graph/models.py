@@ -0,0 +1,120 @@
+"""Process-wide registry of chat models.
+
+Building a ``ChatBedrock`` creates a boto3 session, a ``bedrock-runtime``
+client and its HTTP connection pool, so constructing one inside every node
+pays for client setup and a fresh TLS handshake on each hop. The registry
+builds one model per distinct configuration and shares it, together with its
+tool-bound and structured-output runnables, across nodes and requests.
+
+Lookups only hold a ``threading.Lock`` while reading or filling the cache and
+never await inside it, so the registry is safe to use from worker threads and
+from concurrent asyncio tasks alike.
+"""
+
+import threading
+from typing import Any, Callable, Optional, Sequence
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+DEFAULT_MODEL = "anthropic.claude-3-haiku-20240307-v1:0"
+MAX_POOL_CONNECTIONS = 50
+
+ModelFactory = Callable[..., BaseChatModel]
+
+
+def _freeze(value: Any) -> Any:
+    """Turn kwargs into a hashable cache key."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+def _tool_key(tool: Any) -> Any:
+    return getattr(tool, "name", None) or getattr(tool, "__name__", None) or repr(tool)
+
+
+def bedrock_model_factory(model: str, **kwargs: Any) -> BaseChatModel:
+    """Build a ``ChatBedrock`` whose boto3 client keeps a larger connection pool."""
+    from botocore.config import Config
+    from langchain_aws import ChatBedrock
+
+    kwargs.setdefault("config", Config(max_pool_connections=MAX_POOL_CONNECTIONS))
+    return ChatBedrock(model=model, **kwargs)
+
+
+class ModelRegistry:
+    """Cache of chat models and the runnables derived from them.
+
+    Args:
+        factory: Callable ``(model, **kwargs) -> BaseChatModel`` used on a cache
+            miss. Defaults to :func:`bedrock_model_factory`.
+    """
+
+    def __init__(self, factory: ModelFactory = bedrock_model_factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._models: dict[Any, BaseChatModel] = {}
+        self._runnables: dict[Any, tuple[BaseChatModel, Runnable]] = {}
+        self.created = 0
+        self.reused = 0
+
+    def set_factory(self, factory: ModelFactory) -> None:
+        """Replace the model factory and drop everything built by the old one."""
+        with self._lock:
+            self._factory = factory
+            self._models.clear()
+            self._runnables.clear()
+
+    def clear(self) -> None:
+        """Drop every cached model and runnable."""
+        with self._lock:
+            self._models.clear()
+            self._runnables.clear()
+
+    def get(self, model: str = DEFAULT_MODEL, **kwargs: Any) -> BaseChatModel:
+        """Return the shared model for ``model`` and ``kwargs``, building it once."""
+        key = (model, _freeze(kwargs))
+        with self._lock:
+            chat_model = self._models.get(key)
+            if chat_model is None:
+                chat_model = self._factory(model, **kwargs)
+                self._models[key] = chat_model
+                self.created += 1
+            else:
+                self.reused += 1
+            return chat_model
+
+    def _derived(self, chat_model: BaseChatModel, key: Any, build: Callable[[], Runnable]) -> Runnable:
+        # El modelo se guarda junto al runnable para que su id() no se reutilice
+        key = (id(chat_model), key)
+        with self._lock:
+            entry = self._runnables.get(key)
+            if entry is None:
+                entry = (chat_model, build())
+                self._runnables[key] = entry
+            return entry[1]
+
+    def bind_tools(self, chat_model: BaseChatModel, tools: Sequence[Any], **kwargs: Any) -> Runnable:
+        """Return ``chat_model.bind_tools(tools, **kwargs)``, built once per combination."""
+        key = ("tools", tuple(_tool_key(tool) for tool in tools), _freeze(kwargs))
+        return self._derived(chat_model, key, lambda: chat_model.bind_tools(tools, **kwargs))
+
+    def with_structured_output(self, chat_model: BaseChatModel, schema: Any, **kwargs: Any) -> Runnable:
+        """Return ``chat_model.with_structured_output(schema, **kwargs)``, built once."""
+        key = ("structured", _tool_key(schema), _freeze(kwargs))
+        return self._derived(chat_model, key, lambda: chat_model.with_structured_output(schema, **kwargs))
+
+
+registry = ModelRegistry()
+
+
+def get_chat_model(model: Optional[str] = None, **kwargs: Any) -> BaseChatModel:
+    """Return the shared chat model from the process-wide :data:`registry`."""
+    return registry.get(model or DEFAULT_MODEL, **kwargs)
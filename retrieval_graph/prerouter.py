@@ -0,0 +1,257 @@
+"""Deterministic fast path in front of the LLM router.
+
+Many messages can be classified without an LLM call: ones naming explicit
+film codes (``CC 60``, ``CWC 20``, ``SCx 30``), company questions ("¿Cuál es
+la misión de ObenGroup?"), obvious follow-ups to the previous answer, or
+application searches ("película para empacar café"). :func:`preroute`
+combines code matching with a small multinomial naive Bayes classifier
+trained on the examples below and returns a ``Router`` type with a
+confidence; ``analyze_and_route_query`` only calls the LLM when the
+confidence is below the configured threshold.
+"""
+
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from typing import Collection, Optional, Sequence
+
+from dynamo import normalize_code
+from retrieval_cache import STOPWORDS
+
+CODE_PATTERN = re.compile(r"\b([A-Za-z]{1,4})\s?-?\s?(\d{2,3})\b")
+"""Film codes as users type them: ``CC 60``, ``CWC20``, ``SCx-30``."""
+
+NON_CODE_WORDS = STOPWORDS | frozenset(
+    "ante bajo cada casi dame entre hace hasta mas menos mayor menor mide sin sobre tras unas"
+    " cm gr kg mm um ppm psi".split()
+)
+"""Short words that precede numbers in normal Spanish ("de 100", "entre 20")."""
+
+APPLICATION_WORDS = frozenset(
+    "aplicacion aplicaciones empacar empaque empaques envolver envoltura sirve sirven usar uso"
+    " alimentos cafe carnes pan panes pastas granos snacks galletas dulces vegetales frutas".split()
+)
+"""Words that signal an application; code + application goes to semantic search."""
+
+CATALOG_CODE_CONFIDENCE = 0.97
+"""Confidence of a route on codes that exist in the catalog."""
+
+UNVALIDATED_CODE_CONFIDENCE = 0.75
+"""Confidence of a route on code-shaped tokens that could not be checked
+against the catalog ("pedido nro 123", "lima 15") or only match a family
+("av 28" for the AV family); kept below the default ``fast_router_threshold``
+so the LLM router decides them."""
+
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(y\b|y\s+(la|el|las|los|su|sus)\b|de\s+(esa|ese|esas|esos)\b|(esa|ese|esta|este)\s+pel[ií]cula"
+    r"|la\s+(primera|segunda|tercera|anterior|[uú]ltima)|cu[aá]l\s+de\s+(ellas|ellos|esas|esos)"
+    r"|(me\s+)?puedes\s+(ampliar|resumir|repetir|explicar)|m[aá]s\s+detalles|y\s+cu[aá]l)",
+    re.IGNORECASE,
+)
+
+TRAINING_EXAMPLES: dict[str, Sequence[str]] = {
+    "semantic_search": (
+        "¿Cuál es el tipo de película más óptima para empacar o envolver café?",
+        "Necesito una película para empaque de snacks",
+        "¿Qué película me recomiendas para carnes frías?",
+        "película para envolver pan de molde",
+        "¿Tienen películas para empacar galletas?",
+        "busco una película para etiquetas de botellas",
+        "¿Qué película sirve para empaques de alimentos congelados?",
+        "película con buena barrera a la humedad para granos",
+        "¿Cuál película sirve para laminar con papel?",
+        "quiero una película para bolsas de vegetales frescos",
+        "¿Qué película usar para empaque de dulces y chocolates?",
+        "película antiempañante para frutas",
+    ),
+    "technical_retriever": (
+        "Quiero una película con una tasa de transmisión de oxígeno de 100 ppm",
+        "¿Qué espesor tiene la película de 20 micras?",
+        "película con gramaje menor a 20 g/m2",
+        "¿Cuál es la temperatura de inicio de sello?",
+        "necesito el coeficiente de fricción de la película",
+        "¿Qué películas tienen núcleo de 6 pulgadas?",
+        "dame la ficha técnica completa",
+        "¿Cuál es la resistencia a la tensión en dirección máquina?",
+        "película de 30 micras de espesor",
+        "¿Qué ancho máximo tienen las bobinas?",
+    ),
+    "respond_to_question_with_same_context": (
+        "¿Cuál es la misión de ObenGroup?",
+        "¿Cuál es la visión de la empresa?",
+        "¿Cuántas plantas tiene ObenGroup?",
+        "¿En qué países están presentes?",
+        "¿Cuáles son los valores de la empresa?",
+        "cuéntame la historia de ObenGroup",
+        "¿Qué es una unidad de negocio?",
+        "¿Qué productos fabrica ObenGroup?",
+        "gracias",
+        "¿Qué significa familia de películas?",
+    ),
+    "ask_for_more_info": (
+        "¿Cuál es la mejor película?",
+        "quiero una película",
+        "necesito ayuda",
+        "hola",
+        "¿Qué me recomiendas?",
+        "busco algo bueno",
+        "dame una opción",
+        "¿cuál es mejor?",
+        "información por favor",
+        "quiero comprar",
+    ),
+}
+
+
+def _tokens(text: str) -> list[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.findall(r"[a-z]+|\d+", text)
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over words and word bigrams, with add-one smoothing."""
+
+    def __init__(self, examples: dict[str, Sequence[str]]):
+        self.labels = sorted(examples)
+        self._counts: dict[str, Counter] = {}
+        self._totals: dict[str, int] = {}
+        vocabulary: set[str] = set()
+        total_examples = sum(len(texts) for texts in examples.values())
+        self._priors = {}
+        for label, texts in examples.items():
+            counts = Counter(feature for text in texts for feature in self._features(text))
+            self._counts[label] = counts
+            self._totals[label] = sum(counts.values())
+            self._priors[label] = math.log(len(texts) / total_examples)
+            vocabulary.update(counts)
+        self._vocabulary_size = len(vocabulary)
+
+    @staticmethod
+    def _features(text: str) -> list[str]:
+        tokens = _tokens(text)
+        return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Return the most likely label and its posterior probability."""
+        features = [f for f in self._features(text) if any(f in c for c in self._counts.values())]
+        scores = {}
+        for label in self.labels:
+            denominator = self._totals[label] + self._vocabulary_size
+            scores[label] = self._priors[label] + sum(
+                math.log((self._counts[label][f] + 1) / denominator) for f in features
+            )
+        best = max(scores, key=scores.get)
+        peak = scores[best]
+        normalizer = sum(math.exp(score - peak) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+@dataclass
+class PreRoute:
+    """Fast-path classification of a message."""
+
+    type: str
+    logic: str
+    confidence: float
+    source: str
+    """``"codes"``, ``"follow_up"`` or ``"classifier"``."""
+
+
+_classifier: Optional[NaiveBayesRouter] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> NaiveBayesRouter:
+    """Return the classifier trained on :data:`TRAINING_EXAMPLES` (built once)."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = NaiveBayesRouter(TRAINING_EXAMPLES)
+    return _classifier
+
+
+def find_codes(text: str, known_codes: Optional[Collection[str]] = None) -> list[str]:
+    """Return the film codes in ``text`` (``'SCx 30'`` style).
+
+    With ``known_codes`` (normalized, e.g. the catalog code index keys) only
+    codes that exist in the catalog, as a full code or as a family, are
+    returned. It is only tested with ``in``, so pass a set or a dict's keys.
+    """
+    found = []
+    for match in CODE_PATTERN.finditer(text):
+        if match.group(1).lower() in NON_CODE_WORDS:
+            continue
+        code = f"{match.group(1)} {match.group(2)}"
+        if known_codes is None or normalize_code(code) in known_codes or normalize_code(match.group(1)) in known_codes:
+            found.append(code)
+    return found
+
+
+_known_codes_cache: tuple[Optional[str], frozenset[str]] = (None, frozenset())
+
+
+def _known_codes() -> Optional[Collection[str]]:
+    """The catalog's normalized codes, built once per snapshot version."""
+    global _known_codes_cache
+    from catalog import get_catalog
+
+    catalog = get_catalog()
+    if catalog is None:
+        return None
+    snapshot = catalog.snapshot()
+    version, codes = _known_codes_cache
+    if version != snapshot.version:
+        codes = frozenset(snapshot.code_index)
+        _known_codes_cache = (snapshot.version, codes)
+    return codes
+
+
+def preroute(text: str, has_history: bool = False, known_codes: Optional[Collection[str]] = None) -> PreRoute:
+    """Classify the latest user message without an LLM call.
+
+    Args:
+        text: The latest user message.
+        has_history: Whether the conversation already has an assistant answer,
+            which makes follow-up questions possible.
+        known_codes: Normalized catalog codes. Defaults to the catalog snapshot
+            when it is enabled; otherwise any code-shaped token counts, with
+            :data:`UNVALIDATED_CODE_CONFIDENCE`, which leaves it to the LLM.
+    """
+    if known_codes is None:
+        known_codes = _known_codes()
+    tokens = set(_tokens(text))
+
+    codes = find_codes(text, known_codes)
+    if codes and not tokens & APPLICATION_WORDS:
+        exact = known_codes is not None and all(normalize_code(code) in known_codes for code in codes)
+        confidence = CATALOG_CODE_CONFIDENCE if exact else UNVALIDATED_CODE_CONFIDENCE
+        return PreRoute(
+            type="technical_retriever",
+            logic=f"El usuario pregunta por códigos de película explícitos: {', '.join(codes)}",
+            confidence=confidence,
+            source="codes",
+        )
+
+    if has_history and FOLLOW_UP_PATTERN.search(text.strip()):
+        return PreRoute(
+            type="respond_to_question_with_same_context",
+            logic="Pregunta de seguimiento sobre la respuesta anterior",
+            confidence=0.92,
+            source="follow_up",
+        )
+
+    label, probability = get_classifier().predict(text)
+    if codes:
+        # Código + aplicación: el prompt del router pide búsqueda semántica
+        label, probability = "semantic_search", max(probability if label == "semantic_search" else 0.0, 0.8)
+    return PreRoute(
+        type=label,
+        logic=f"Clasificador local ({probability:.2f})",
+        confidence=probability,
+        source="classifier",
+    )
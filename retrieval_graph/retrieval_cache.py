@@ -0,0 +1,466 @@
+"""Cache for Knowledge Base retrievals.
+
+Customers ask the same few questions in many phrasings ("película para
+empacar café", "¿Qué película sirve para envolver café?"...). Retrievals are
+cached under a normalized form of the query, with LRU eviction and a TTL, so
+repeated questions skip the Knowledge Base round trip. Optionally, a miss on
+the normalized key can still be served from a cached query whose embedding is
+within ``similarity_threshold`` (cosine) of the new one; cached embeddings
+are kept as one normalized matrix, so that lookup is a single product.
+
+Two stores are provided: :class:`MemoryStore` (per process) and
+:class:`SQLiteStore` (a file shared by every worker on the host). Both keep
+documents as plain ``{"page_content", "metadata"}`` dicts.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional, Protocol, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEFAULT_TTL = 900.0
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+STOPWORDS = frozenset(
+    "a al algo algun alguna alguno como con cual cuales de del el en es esta este"
+    " esto hay la las le lo los me mi mas para por que quiero se ser si sirve"
+    " sirven su sus tiene un una uno unos unas y o u usar puedo puede pueden".split()
+)
+
+Embedding = Sequence[float]
+
+
+def normalize_text(text: str) -> str:
+    """Casefold, strip accents and punctuation and collapse whitespace.
+
+    Every word, stopwords and numbers included, is kept in its order:
+    ``"¿Película de 20 micras?"`` becomes ``"pelicula de 20 micras"``.
+    """
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query for use as a cache key.
+
+    Accents, case, punctuation, Spanish stopwords and repeated words are
+    ignored, but word order is kept so numbers stay next to what they measure:
+    ``"¿Qué película sirve para empacar café?"`` and ``"pelicula para empacar
+    cafe"`` share the key ``"pelicula empacar cafe"``, while ``"20 micras
+    gramaje 30"`` and ``"30 micras gramaje 20"`` do not.
+    """
+    tokens = normalize_text(query).split()
+    kept = [token for token in tokens if token not in STOPWORDS] or tokens
+    return " ".join(dict.fromkeys(kept))
+
+
+def _numbers(key: str) -> tuple[str, ...]:
+    """The tokens of a normalized key that contain digits, in order."""
+    return tuple(token for token in key.split() if any(char.isdigit() for char in token))
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows (or a single vector) to unit length; zero vectors stay zero."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+@dataclass
+class CacheEntry:
+    """A cached retrieval."""
+
+    key: str
+    documents: list[dict]
+    created_at: float
+    embedding: Optional[list[float]] = None
+
+
+class CacheStore(Protocol):
+    """Storage backend used by :class:`RetrievalCache`."""
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the live entry for ``key`` and mark it as recently used."""
+
+    def set(self, entry: CacheEntry) -> None:
+        """Insert or replace an entry, evicting the least recently used ones."""
+
+    def entries_with_embeddings(self) -> Iterable[CacheEntry]:
+        """Yield live entries that carry an embedding."""
+
+    def clear(self) -> None:
+        """Remove every entry."""
+
+    def now(self) -> float:
+        """Current time on the store's clock, used for ``created_at`` and expiry."""
+
+    # Optional: ``generation() -> Hashable`` changes whenever entries are
+    # added or removed, so :class:`RetrievalCache` can keep its embedding
+    # matrix between lookups; without it the matrix is rebuilt on every miss.
+
+
+@dataclass
+class StoreCounters:
+    evictions: int = 0
+    expirations: int = 0
+
+
+class MemoryStore:
+    """In-process LRU store with a TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.counters = StoreCounters()
+        self._clock = clock
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def now(self) -> float:
+        return self._clock()
+
+    def _expired(self, entry: CacheEntry) -> bool:
+        return self._clock() - entry.created_at >= self.ttl
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                self.counters.expirations += 1
+                self._generation += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[entry.key] = entry
+            self._entries.move_to_end(entry.key)
+            self._generation += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters.evictions += 1
+
+    def entries_with_embeddings(self) -> Iterable[CacheEntry]:
+        with self._lock:
+            entries = list(self._entries.values())
+        return [entry for entry in entries if entry.embedding is not None and not self._expired(entry)]
+
+    def generation(self) -> int:
+        return self._generation
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+
+class SQLiteStore:
+    """LRU store with a TTL in a SQLite file, shared by every process that opens it."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.counters = StoreCounters()
+        self._clock = clock
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS retrievals ("
+                " key TEXT PRIMARY KEY, documents TEXT NOT NULL, embedding TEXT,"
+                " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS retrievals_last_used ON retrievals (last_used)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def now(self) -> float:
+        return self._clock()
+
+    @staticmethod
+    def _entry(row: tuple) -> CacheEntry:
+        key, documents, embedding, created_at = row
+        return CacheEntry(
+            key=key,
+            documents=json.loads(documents),
+            created_at=created_at,
+            embedding=json.loads(embedding) if embedding else None,
+        )
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        now = self._clock()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT key, documents, embedding, created_at FROM retrievals WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[3] >= self.ttl:
+                conn.execute("DELETE FROM retrievals WHERE key = ?", (key,))
+                self.counters.expirations += 1
+                self._writes += 1
+                return None
+            conn.execute("UPDATE retrievals SET last_used = ? WHERE key = ?", (now, key))
+        return self._entry(row)
+
+    def set(self, entry: CacheEntry) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO retrievals (key, documents, embedding, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (
+                    entry.key,
+                    json.dumps(entry.documents, default=str, ensure_ascii=False),
+                    json.dumps(entry.embedding) if entry.embedding is not None else None,
+                    entry.created_at,
+                    self._clock(),
+                ),
+            )
+            evicted = conn.execute(
+                "DELETE FROM retrievals WHERE key IN (SELECT key FROM retrievals"
+                " ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            self.counters.evictions += max(evicted, 0)
+            self._writes += 1
+
+    def entries_with_embeddings(self) -> Iterable[CacheEntry]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT key, documents, embedding, created_at FROM retrievals"
+                " WHERE embedding IS NOT NULL AND created_at > ?",
+                (self._clock() - self.ttl,),
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def generation(self) -> tuple[int, int]:
+        # data_version changes when another connection (worker) commits; our own writes are counted
+        with self._connect() as conn:
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return data_version, self._writes
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM retrievals")
+        self._writes += 1
+
+
+def _to_dicts(documents: Sequence[Document]) -> list[dict]:
+    return [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+
+
+def _to_documents(documents: Sequence[dict]) -> list[Document]:
+    return [Document(page_content=doc["page_content"], metadata=doc["metadata"]) for doc in documents]
+
+
+class RetrievalCache:
+    """Cache of retrieved documents keyed on the normalized query.
+
+    Args:
+        store: Where entries live. Defaults to a :class:`MemoryStore`.
+        embed: Optional ``query -> embedding`` callable. When set, a miss on
+            the normalized key is served by the most similar cached query if
+            its cosine similarity reaches ``similarity_threshold`` and it has
+            the same numbers in the same order.
+        similarity_threshold: Minimum cosine similarity for a near-duplicate hit.
+    """
+
+    def __init__(
+        self,
+        store: Optional[CacheStore] = None,
+        embed: Optional[Callable[[str], Embedding]] = None,
+        similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+    ):
+        self.store = store if store is not None else MemoryStore()
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (store generation, entries, their numbers, created_at, unit-length embeddings)
+        self._matrix: Optional[tuple[Any, list[CacheEntry], list[tuple[str, ...]], np.ndarray, np.ndarray]] = None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _embedding_matrix(
+        self, dimension: int
+    ) -> tuple[list[CacheEntry], list[tuple[str, ...]], np.ndarray, np.ndarray]:
+        """Return the cached entries with a ``dimension``-long embedding as one normalized matrix."""
+        generation_fn = getattr(self.store, "generation", None)
+        generation = generation_fn() if generation_fn is not None else None
+        cached = self._matrix
+        if generation is not None and cached is not None and cached[0] == generation and cached[4].shape[1] == dimension:
+            return cached[1:]
+        entries = [entry for entry in self.store.entries_with_embeddings() if len(entry.embedding) == dimension]
+        numbers = [_numbers(entry.key) for entry in entries]
+        created = np.array([entry.created_at for entry in entries], dtype=np.float64)
+        matrix = np.array([entry.embedding for entry in entries], dtype=np.float64).reshape(len(entries), dimension)
+        matrix = _normalized(matrix)
+        if generation is not None:
+            self._matrix = (generation, entries, numbers, created, matrix)
+        return entries, numbers, created, matrix
+
+    def _nearest(self, key: str, embedding: Embedding) -> Optional[CacheEntry]:
+        query = _normalized(np.asarray(embedding, dtype=np.float64))
+        entries, numbers, created, matrix = self._embedding_matrix(len(query))
+        if not entries:
+            return None
+        scores = matrix @ query
+        ttl = getattr(self.store, "ttl", None)
+        if ttl is not None:
+            # entries that expired after the matrix was built
+            scores[self.store.now() - created >= ttl] = -np.inf
+        # embeddings barely see number order: "20 micras gramaje 30" is not "30 micras gramaje 20"
+        wanted = _numbers(key)
+        scores[[index for index, found in enumerate(numbers) if found != wanted]] = -np.inf
+        best = int(np.argmax(scores))
+        return entries[best] if scores[best] >= self.similarity_threshold else None
+
+    def _lookup(self, query: str) -> tuple[Optional[list[Document]], Optional[Embedding]]:
+        """Return the cached documents for ``query`` (``None`` on a miss) and its embedding, if computed."""
+        key = normalize_query(query)
+        entry = self.store.get(key)
+        embedding = None
+        if entry is None and self.embed is not None:
+            embedding = self.embed(query)
+            entry = self._nearest(key, embedding)
+            if entry is not None:
+                self._count("semantic_hits")
+                return _to_documents(entry.documents), embedding
+        if entry is None:
+            self._count("misses")
+            return None, embedding
+        self._count("hits")
+        return _to_documents(entry.documents), embedding
+
+    def get(self, query: str) -> Optional[list[Document]]:
+        """Return the cached documents for ``query``, or ``None`` on a miss."""
+        return self._lookup(query)[0]
+
+    def put(self, query: str, documents: Sequence[Document], embedding: Optional[Embedding] = None) -> None:
+        """Store ``documents`` as the result of ``query``."""
+        if embedding is None and self.embed is not None:
+            embedding = self.embed(query)
+        self.store.set(CacheEntry(
+            key=normalize_query(query),
+            documents=_to_dicts(documents),
+            created_at=self.store.now(),
+            embedding=[float(value) for value in embedding] if embedding is not None else None,
+        ))
+
+    def get_or_retrieve(self, query: str, retrieve: Callable[[str], Sequence[Document]]) -> list[Document]:
+        """Return the cached documents for ``query`` or call ``retrieve`` and cache its result."""
+        documents, embedding = self._lookup(query)
+        if documents is None:
+            documents = list(retrieve(query))
+            # reuse the embedding computed for the nearest-neighbour lookup
+            self.put(query, documents, embedding=embedding)
+        return documents
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit/miss counters, hit rate and store evictions/expirations."""
+        lookups = self.hits + self.semantic_hits + self.misses
+        counters = getattr(self.store, "counters", StoreCounters())
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            "evictions": counters.evictions,
+            "expirations": counters.expirations,
+        }
+
+
+_retrieval_cache: Optional[RetrievalCache] = None
+_retrieval_cache_lock = threading.Lock()
+
+
+def configure_retrieval_cache(cache: Optional[RetrievalCache]) -> None:
+    """Install ``cache`` as the process-wide retrieval cache (``None`` disables caching)."""
+    global _retrieval_cache
+    with _retrieval_cache_lock:
+        _retrieval_cache = cache
+
+
+def query_embedder(name: str) -> Callable[[str], Embedding]:
+    """Return the ``query -> embedding`` callable named by ``KB_CACHE_EMBEDDINGS``.
+
+    ``"hashing"`` is the local, dependency-free embedder of
+    :mod:`local_retriever`; anything else is a Bedrock embedding model id
+    (``"amazon.titan-embed-text-v2:0"``).
+    """
+    if name == "hashing":
+        from local_retriever import HashingEmbedder
+
+        return HashingEmbedder().embed_query
+    from langchain_aws import BedrockEmbeddings
+
+    return BedrockEmbeddings(model_id=name).embed_query
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """Return the process-wide retrieval cache, creating the default one on first use.
+
+    The default keeps entries in memory. Set ``KB_CACHE_PATH`` to share a
+    SQLite file between workers, ``KB_CACHE_TTL`` / ``KB_CACHE_MAX_ENTRIES`` to
+    tune it, or ``KB_CACHE_TTL=0`` to disable it. Near-duplicate lookups are
+    off unless ``KB_CACHE_EMBEDDINGS`` names an embedder (:func:`query_embedder`);
+    ``KB_CACHE_SIMILARITY`` sets their threshold.
+    """
+    global _retrieval_cache
+    if _retrieval_cache is None:
+        with _retrieval_cache_lock:
+            if _retrieval_cache is None:
+                ttl = float(os.environ.get("KB_CACHE_TTL", DEFAULT_TTL))
+                if ttl <= 0:
+                    return None
+                max_entries = int(os.environ.get("KB_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+                path = os.environ.get("KB_CACHE_PATH")
+                store = (
+                    SQLiteStore(path, max_entries=max_entries, ttl=ttl)
+                    if path
+                    else MemoryStore(max_entries=max_entries, ttl=ttl)
+                )
+                embeddings = os.environ.get("KB_CACHE_EMBEDDINGS")
+                _retrieval_cache = RetrievalCache(
+                    store,
+                    embed=query_embedder(embeddings) if embeddings else None,
+                    similarity_threshold=float(os.environ.get("KB_CACHE_SIMILARITY", DEFAULT_SIMILARITY_THRESHOLD)),
+                )
+    return _retrieval_cache
@@ -0,0 +1,383 @@
+"""ASGI service over the compiled retrieval graph.
+
+One :class:`Server` per worker process shares the compiled ``graph`` and,
+through the module-level singletons, the Bedrock models, the Knowledge Base
+retriever, the DynamoDB resource, the catalog and the caches, across every
+in-flight request. Endpoints:
+
+* ``POST /invoke``: ``{"message": "...", "thread_id": "...", "configurable": {...}}``
+  (or ``"messages": [{"role": "user", "content": "..."}, ...]``) answered in one
+  JSON document, through the answer cache (``answer_cache.cached_ainvoke``);
+  with sessions on (``SESSION_DB_PATH``) a request without ``thread_id``
+  starts a new thread, returned as ``thread_id`` (``X-Thread-Id`` on ``/stream``);
+* ``POST /stream``: same body, answered as server-sent events
+  (``node_start`` / ``node_end`` / ``token`` / ``done``) from
+  ``streaming.stream_graph``;
+* ``GET /healthz``: liveness, always 200 while the process serves;
+* ``GET /readyz``: 200 once the graph and clients are built and while the
+  queue has room, 503 otherwise;
+* ``GET /stats``: admission counters, latency, cache and single-flight
+  counters and per-node model tier statistics;
+* ``GET /metrics``: the ``tracing.OpenMetricsSink`` text, when configured.
+
+At most ``max_concurrency`` graph runs execute at once per worker; up to
+``max_queue`` more wait for a slot (at most ``queue_timeout`` seconds) and
+anything beyond that is rejected at once with 503 and ``Retry-After``, so an
+overloaded worker sheds load instead of piling up requests that would time
+out anyway.
+
+Plain ASGI (no web framework); serve it with any ASGI server::
+
+    uvicorn server:app --app-dir retrieval_graph --workers 4
+
+``SERVER_MAX_CONCURRENCY``, ``SERVER_MAX_QUEUE`` and ``SERVER_QUEUE_TIMEOUT``
+configure the module-level :data:`app`.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+import tracing
+from dynamo import LatencyRecorder, is_throttling
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+ROLES = {"user": HumanMessage, "human": HumanMessage, "assistant": AIMessage, "ai": AIMessage}
+
+
+class HTTPError(Exception):
+    """Error answered to the client with ``status`` and a JSON ``{"error": message}`` body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[list[tuple[bytes, bytes]]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or []
+
+
+class Admission:
+    """Per-worker concurrency limit with a bounded wait queue.
+
+    Args:
+        max_concurrency: Graph runs executing at once.
+        max_queue: Requests allowed to wait for a slot; more are rejected.
+        queue_timeout: Seconds a request may wait before it is rejected.
+    """
+
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 64, queue_timeout: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queue_latency = LatencyRecorder()
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def saturated(self) -> bool:
+        """Every slot is taken and the queue is full."""
+        return self.in_flight + self.waiting >= self.max_concurrency + self.max_queue
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Hold one execution slot; raise :class:`HTTPError` 503 when overloaded."""
+        if self.saturated:
+            self.rejected += 1
+            raise HTTPError(503, "overloaded", [(b"retry-after", b"1")])
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise HTTPError(503, "queue timeout", [(b"retry-after", b"1")]) from None
+        finally:
+            self.waiting -= 1
+        self.queue_latency.record(time.perf_counter() - start)
+        self.in_flight += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait": self.queue_latency.summary(),
+        }
+
+
+def parse_request(body: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Return the graph ``inputs`` and ``config`` for an ``/invoke`` or ``/stream`` body."""
+    if isinstance(body.get("message"), str) and body["message"].strip():
+        messages: list[BaseMessage] = [HumanMessage(content=body["message"])]
+    elif isinstance(body.get("messages"), list) and body["messages"]:
+        messages = []
+        for message in body["messages"]:
+            role = message.get("role", "user") if isinstance(message, dict) else None
+            if role not in ROLES or not isinstance(message.get("content"), str):
+                raise HTTPError(400, "messages must be {role: user|assistant, content: str}")
+            messages.append(ROLES[role](content=message["content"]))
+    else:
+        raise HTTPError(400, "expected 'message' or 'messages'")
+    configurable = body.get("configurable") or {}
+    if not isinstance(configurable, dict):
+        raise HTTPError(400, "'configurable' must be an object")
+    if body.get("thread_id"):
+        configurable = {**configurable, "thread_id": str(body["thread_id"])}
+    return {"messages": messages}, {"configurable": configurable}
+
+
+def ensure_thread_id(config: dict[str, Any], graph) -> dict[str, Any]:
+    """Give a request without ``thread_id`` its own new thread when ``graph`` has a checkpointer.
+
+    The checkpointer (``SESSION_DB_PATH``) rejects runs without one; the
+    generated id is returned to the client so it can continue the conversation.
+    """
+    if graph.checkpointer and not config["configurable"].get("thread_id"):
+        config = {**config, "configurable": {**config["configurable"], "thread_id": f"http-{uuid.uuid4()}"}}
+    return config
+
+
+def _answer_text(output: dict[str, Any]) -> str:
+    from streaming import chunk_text
+
+    messages = output.get("messages") or []
+    return chunk_text(messages[-1]) if messages else ""
+
+
+class Server:
+    """ASGI application serving one compiled graph.
+
+    Args:
+        graph: Compiled graph; defaults to ``graph.graph``, built at startup.
+        admission: Concurrency limit and queue; defaults to :class:`Admission`.
+    """
+
+    def __init__(self, graph: Any = None, admission: Optional[Admission] = None):
+        self.graph = graph
+        self.admission = admission
+        self.ready = False
+        self.latency = {"invoke": LatencyRecorder(), "stream": LatencyRecorder()}
+        self.errors = 0
+        self._startup_lock = asyncio.Lock()
+        self._routes = {
+            ("GET", "/healthz"): self.healthz,
+            ("GET", "/readyz"): self.readyz,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/metrics"): self.metrics,
+            ("POST", "/invoke"): self.invoke,
+            ("POST", "/stream"): self.stream,
+        }
+
+    def startup(self) -> None:
+        """Build the graph and the shared clients so the first request does not pay for them."""
+        if self.graph is None:
+            from graph import graph
+
+            self.graph = graph
+        if self.admission is None:
+            self.admission = Admission(
+                max_concurrency=int(os.environ.get("SERVER_MAX_CONCURRENCY", 16)),
+                max_queue=int(os.environ.get("SERVER_MAX_QUEUE", 64)),
+                queue_timeout=float(os.environ.get("SERVER_QUEUE_TIMEOUT", 30)),
+            )
+        from answer_cache import get_answer_cache
+        from catalog import get_catalog
+        from dynamo import get_dynamodb
+        from tools import get_kb_retriever
+
+        get_dynamodb()
+        get_kb_retriever()
+        get_answer_cache()
+        catalog = get_catalog()
+        if catalog is not None:
+            catalog.snapshot()
+        self.ready = True
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+        handler = self._routes.get((scope["method"], scope["path"]))
+        try:
+            if handler is None:
+                if any(path == scope["path"] for _, path in self._routes):
+                    raise HTTPError(405, "method not allowed")
+                raise HTTPError(404, "not found")
+            if not self.ready and handler not in (self.healthz, self.readyz):
+                # Servidores sin lifespan: se arranca con la primera petición
+                async with self._startup_lock:
+                    if not self.ready:
+                        await asyncio.to_thread(self.startup)
+            await handler(scope, receive, send)
+        except HTTPError as e:
+            await self._json(send, e.status, {"error": e.message}, e.headers)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await asyncio.to_thread(self.startup)
+                except Exception as e:
+                    logger.exception("startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.ready = False
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _json(send, status: int, payload: Any, headers: Optional[list[tuple[bytes, bytes]]] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *(headers or [])],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    async def _read_json(receive) -> dict[str, Any]:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise HTTPError(400, "client disconnected")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "body too large")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        try:
+            body = json.loads(b"".join(chunks) or b"{}")
+        except ValueError:
+            raise HTTPError(400, "invalid JSON") from None
+        if not isinstance(body, dict):
+            raise HTTPError(400, "expected a JSON object")
+        return body
+
+    async def healthz(self, scope, receive, send) -> None:
+        await self._json(send, 200, {"status": "ok"})
+
+    async def readyz(self, scope, receive, send) -> None:
+        if not self.ready:
+            await self._json(send, 503, {"status": "starting"})
+            return
+        if self.admission.saturated:
+            await self._json(send, 503, {"status": "saturated", **self.admission.stats()})
+            return
+        await self._json(send, 200, {"status": "ready"})
+
+    async def stats(self, scope, receive, send) -> None:
+        from answer_cache import get_answer_cache
+        from cascade import tier_stats
+        from singleflight import dynamo_flight, kb_flight
+
+        cache = get_answer_cache()
+        await self._json(send, 200, {
+            "admission": self.admission.stats(),
+            "errors": self.errors,
+            "latency": {name: recorder.summary() for name, recorder in self.latency.items()},
+            "answer_cache": cache.stats() if cache is not None else None,
+            "singleflight": {flight.name: flight.stats() for flight in (kb_flight, dynamo_flight)},
+            "models": tier_stats.summary(),
+        })
+
+    async def metrics(self, scope, receive, send) -> None:
+        sink = tracing.find_sink(tracing.OpenMetricsSink)
+        if sink is None:
+            raise HTTPError(404, "tracing has no OpenMetrics sink (TRACE_SINKS=openmetrics)")
+        body = sink.render().encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/openmetrics-text; version=1.0.0; charset=utf-8")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def invoke(self, scope, receive, send) -> None:
+        from answer_cache import cached_ainvoke
+
+        inputs, config = parse_request(await self._read_json(receive))
+        config = ensure_thread_id(config, self.graph)
+        async with self.admission.slot():
+            start = time.perf_counter()
+            try:
+                output = await cached_ainvoke(inputs, config, graph=self.graph)
+            except Exception as e:
+                self.errors += 1
+                if is_throttling(e):
+                    logger.warning("invoke throttled: %s", e)
+                    raise HTTPError(503, "throttled", [(b"retry-after", b"1")]) from None
+                logger.exception("invoke failed")
+                raise HTTPError(500, type(e).__name__) from None
+            elapsed = time.perf_counter() - start
+        self.latency["invoke"].record(elapsed)
+        await self._json(send, 200, {
+            "answer": _answer_text(output),
+            "route": (output.get("router") or {}).get("type"),
+            "latency_ms": round(elapsed * 1000, 3),
+            "answer_cache": output.get("answer_cache"),
+            "thread_id": config["configurable"].get("thread_id"),
+        })
+
+    async def stream(self, scope, receive, send) -> None:
+        from streaming import stream_graph
+
+        inputs, config = parse_request(await self._read_json(receive))
+        config = ensure_thread_id(config, self.graph)
+        async with self.admission.slot():
+            start = time.perf_counter()
+            headers = [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")]
+            thread_id = config["configurable"].get("thread_id")
+            if thread_id:
+                headers.append((b"x-thread-id", str(thread_id).encode("utf-8")))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            try:
+                async for event in stream_graph(inputs, config, graph=self.graph):
+                    data = {"node": event.node, "text": event.text, "elapsed_ms": event.elapsed_ms}
+                    if event.metrics is not None:
+                        data["metrics"] = vars(event.metrics)
+                    payload = json.dumps(data, ensure_ascii=False)
+                    await send({"type": "http.response.body", "body": f"event: {event.type}\ndata: {payload}\n\n".encode("utf-8"), "more_body": True})
+            except Exception as e:
+                # Los encabezados ya se enviaron: el error viaja como evento
+                self.errors += 1
+                logger.exception("stream failed")
+                payload = json.dumps({"error": type(e).__name__})
+                await send({"type": "http.response.body", "body": f"event: error\ndata: {payload}\n\n".encode("utf-8"), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+        self.latency["stream"].record(time.perf_counter() - start)
+
+
+app = Server()
+"""Module-level application for ``uvicorn server:app``."""
@@ -0,0 +1,489 @@
+"""SQLite checkpointer for multi-turn sessions with delta-encoded messages.
+
+Without a checkpointer every caller resends the whole conversation on each
+turn. :class:`SQLiteSessionSaver` is a LangGraph ``BaseCheckpointSaver`` that
+persists the graph state per ``thread_id``, so a turn only sends the new user
+message::
+
+    graph = builder.compile(checkpointer=SQLiteSessionSaver("sessions.db"))
+    await graph.ainvoke({"messages": [HumanMessage(...)]},
+                        {"configurable": {"thread_id": "customer-42"}})
+
+The ``messages`` channel dominates the state, and a checkpoint is written
+after every node. Storing the full list each time would write the same
+messages over and over. Instead:
+
+* messages are kept once per thread in an append-only log (``messages``
+  table); a checkpoint only stores its position in the log, and ``put``
+  writes just the messages that are not logged yet;
+* large string contents (tool results with film items, mostly) are stored
+  once in ``payloads`` under their SHA-256 and referenced by hash, both from
+  the log and from pending writes, so the same catalog excerpt returned in
+  many turns or sessions takes space once;
+* reads load only the last ``window`` messages of the log (starting at a
+  user message, so no tool result is left without its call); pass
+  ``window=None`` or ``{"configurable": {"session_window": 0}}`` for the
+  whole history.
+
+The graph only appends messages: messages already in the log are never
+rewritten, and ``RemoveMessage`` is not supported. Other channels are stored
+per version like LangGraph's own savers.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+DEFAULT_WINDOW = 40
+"""Messages loaded per checkpoint by default."""
+
+PAYLOAD_MIN_CHARS = 512
+"""Message contents at least this long are stored once, by hash."""
+
+LOG_TYPE = "message_log"
+REFS_PREFIX = "refs:"
+SQLITE_MAX_PARAMS = 900
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checkpoints ("
+    " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+    " parent_id TEXT, type TEXT NOT NULL, checkpoint BLOB NOT NULL, metadata TEXT NOT NULL,"
+    " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))",
+    "CREATE TABLE IF NOT EXISTS blobs ("
+    " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, channel TEXT NOT NULL, version TEXT NOT NULL,"
+    " type TEXT NOT NULL, blob BLOB, PRIMARY KEY (thread_id, checkpoint_ns, channel, version))",
+    "CREATE TABLE IF NOT EXISTS messages ("
+    " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, seq INTEGER NOT NULL, message_id TEXT NOT NULL,"
+    " type TEXT NOT NULL, message BLOB NOT NULL, payload_hash TEXT,"
+    " PRIMARY KEY (thread_id, checkpoint_ns, seq))",
+    "CREATE UNIQUE INDEX IF NOT EXISTS messages_id ON messages (thread_id, checkpoint_ns, message_id)",
+    "CREATE TABLE IF NOT EXISTS payloads (hash TEXT PRIMARY KEY, content TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS writes ("
+    " thread_id TEXT NOT NULL, checkpoint_ns TEXT NOT NULL, checkpoint_id TEXT NOT NULL,"
+    " task_id TEXT NOT NULL, idx INTEGER NOT NULL, channel TEXT NOT NULL, type TEXT NOT NULL,"
+    " blob BLOB, task_path TEXT NOT NULL DEFAULT '', payload_hashes TEXT,"
+    " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))",
+)
+
+
+def _chunks(values: Sequence[Any], size: int = SQLITE_MAX_PARAMS) -> Iterator[Sequence[Any]]:
+    for offset in range(0, len(values), size):
+        yield values[offset:offset + size]
+
+
+def _is_messages(value: Any) -> bool:
+    if isinstance(value, BaseMessage):
+        return True
+    return isinstance(value, list) and bool(value) and all(isinstance(item, BaseMessage) for item in value)
+
+
+class SQLiteSessionSaver(BaseCheckpointSaver):
+    """Checkpointer over a SQLite file with a per-thread message log.
+
+    Args:
+        path: SQLite file (``":memory:"`` is not supported: each thread opens
+            its own connection).
+        window: Messages loaded per checkpoint; ``None`` loads all of them.
+        payload_min_chars: Contents at least this long are deduplicated by hash.
+        messages_channel: State channel holding the conversation.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        window: Optional[int] = DEFAULT_WINDOW,
+        payload_min_chars: int = PAYLOAD_MIN_CHARS,
+        messages_channel: str = "messages",
+        *,
+        serde: Any = None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.window = window
+        self.payload_min_chars = payload_min_chars
+        self.messages_channel = messages_channel
+        self._local = threading.local()
+        with self._connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _window(self, config: RunnableConfig) -> Optional[int]:
+        window = config.get("configurable", {}).get("session_window", self.window)
+        return window or None
+
+    # -- messages and payloads -------------------------------------------------
+
+    def _externalize(self, conn: sqlite3.Connection, message: BaseMessage) -> tuple[BaseMessage, Optional[str]]:
+        """Move a long string content to ``payloads``; return the stub message and the hash."""
+        content = message.content
+        if not isinstance(content, str) or len(content) < self.payload_min_chars:
+            return message, None
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        conn.execute("INSERT OR IGNORE INTO payloads (hash, content) VALUES (?, ?)", (digest, content))
+        return message.model_copy(update={"content": ""}), digest
+
+    @staticmethod
+    def _payloads(conn: sqlite3.Connection, hashes: Sequence[str]) -> dict[str, str]:
+        found: dict[str, str] = {}
+        unique = list(dict.fromkeys(h for h in hashes if h))
+        for chunk in _chunks(unique):
+            rows = conn.execute(
+                f"SELECT hash, content FROM payloads WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+            found.update(rows)
+        return found
+
+    def _restore(self, type_: str, data: bytes, digest: Optional[str], payloads: dict[str, str]) -> BaseMessage:
+        message = self.serde.loads_typed((type_, data))
+        if digest:
+            message.content = payloads[digest]
+        return message
+
+    def _append_messages(
+        self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, messages: list[BaseMessage]
+    ) -> int:
+        """Log the messages not logged yet; return the log position of the last one."""
+        ids = [message.id or hashlib.sha256(repr(message).encode("utf-8")).hexdigest() for message in messages]
+        logged: dict[str, int] = {}
+        for chunk in _chunks(ids):
+            rows = conn.execute(
+                "SELECT message_id, seq FROM messages WHERE thread_id = ? AND checkpoint_ns = ?"
+                f" AND message_id IN ({','.join('?' * len(chunk))})",
+                (thread_id, checkpoint_ns, *chunk),
+            ).fetchall()
+            logged.update(rows)
+        seq = conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM messages WHERE thread_id = ? AND checkpoint_ns = ?",
+            (thread_id, checkpoint_ns),
+        ).fetchone()[0]
+        for message_id, message in zip(ids, messages):
+            if message_id in logged:
+                continue
+            seq += 1
+            stub, digest = self._externalize(conn, message)
+            type_, data = self.serde.dumps_typed(stub)
+            conn.execute(
+                "INSERT INTO messages (thread_id, checkpoint_ns, seq, message_id, type, message, payload_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, seq, message_id, type_, data, digest),
+            )
+            logged[message_id] = seq
+        return logged[ids[-1]]
+
+    def _load_messages(
+        self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, position: int, window: Optional[int]
+    ) -> list[BaseMessage]:
+        rows = conn.execute(
+            "SELECT type, message, payload_hash FROM messages WHERE thread_id = ? AND checkpoint_ns = ?"
+            " AND seq <= ? ORDER BY seq DESC LIMIT ?",
+            (thread_id, checkpoint_ns, position, window if window else -1),
+        ).fetchall()
+        rows.reverse()
+        payloads = self._payloads(conn, [row[2] for row in rows])
+        messages = [self._restore(type_, data, digest, payloads) for type_, data, digest in rows]
+        if window and len(messages) >= window:
+            # Start at a user message so no tool result is loaded without its call
+            start = next((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), 0)
+            messages = messages[start:]
+        return messages
+
+    def _pack(self, conn: sqlite3.Connection, value: Any) -> tuple[str, bytes, Optional[str]]:
+        """Serialize a pending write; messages reference their long contents by hash."""
+        if not _is_messages(value):
+            type_, data = self.serde.dumps_typed(value)
+            return type_, data, None
+        messages = [value] if isinstance(value, BaseMessage) else value
+        stubs, hashes = zip(*(self._externalize(conn, message) for message in messages))
+        type_, data = self.serde.dumps_typed(stubs[0] if isinstance(value, BaseMessage) else list(stubs))
+        return REFS_PREFIX + type_, data, json.dumps(hashes)
+
+    def _unpack(self, conn: sqlite3.Connection, type_: str, data: bytes, hashes: Optional[str]) -> Any:
+        if not type_.startswith(REFS_PREFIX):
+            return self.serde.loads_typed((type_, data))
+        value = self.serde.loads_typed((type_[len(REFS_PREFIX):], data))
+        digests = json.loads(hashes or "[]")
+        payloads = self._payloads(conn, digests)
+        for message, digest in zip([value] if isinstance(value, BaseMessage) else value, digests):
+            if digest:
+                message.content = payloads[digest]
+        return value
+
+    # -- checkpoints -----------------------------------------------------------
+
+    def _tuple(
+        self, conn: sqlite3.Connection, thread_id: str, checkpoint_ns: str, row: tuple, window: Optional[int]
+    ) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, data, metadata = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, data))
+        channel_values: dict[str, Any] = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ).fetchone()
+            if blob is None or blob[0] == "empty":
+                continue
+            if blob[0] == LOG_TYPE:
+                channel_values[channel] = self._load_messages(conn, thread_id, checkpoint_ns, int(blob[1]), window)
+            else:
+                channel_values[channel] = self.serde.loads_typed((blob[0], blob[1]))
+        writes = conn.execute(
+            "SELECT task_id, channel, type, blob, payload_hashes FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?"
+            " ORDER BY task_path, task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+
+        def config_for(cid: str) -> RunnableConfig:
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=config_for(checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=json.loads(metadata),
+            parent_config=config_for(parent_id) if parent_id else None,
+            pending_writes=[
+                (task_id, channel, self._unpack(conn, w_type, w_blob, hashes))
+                for task_id, channel, w_type, w_blob, hashes in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        conn = self._connect()
+        query = (
+            "SELECT checkpoint_id, parent_id, type, checkpoint, metadata FROM checkpoints"
+            " WHERE thread_id = ? AND checkpoint_ns = ?"
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            row = conn.execute(query + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+        else:
+            row = conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+        if row is None:
+            return None
+        return self._tuple(conn, thread_id, checkpoint_ns, row, self._window(config))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        conditions, params = [], []
+        if config:
+            conditions.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                conditions.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                conditions.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            conditions.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata"
+            f" FROM checkpoints{where} ORDER BY checkpoint_id DESC",
+            params,
+        ).fetchall()
+        window = self._window(config or {})
+        for thread_id, checkpoint_ns, *row in rows:
+            if filter:
+                metadata = json.loads(row[-1])
+                if not all(metadata.get(key) == value for key, value in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield self._tuple(conn, thread_id, checkpoint_ns, tuple(row), window)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        stored = checkpoint.copy()
+        values: dict[str, Any] = stored.pop("channel_values")
+        conn = self._connect()
+        with conn:
+            for channel, version in new_versions.items():
+                value = values.get(channel)
+                if channel not in values:
+                    type_, blob = "empty", b""
+                elif channel == self.messages_channel and isinstance(value, list) and _is_messages(value):
+                    position = self._append_messages(conn, thread_id, checkpoint_ns, value)
+                    type_, blob = LOG_TYPE, str(position).encode()
+                else:
+                    type_, blob = self.serde.dumps_typed(value)
+                conn.execute(
+                    "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, blob)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), type_, blob),
+                )
+            type_, data = self.serde.dumps_typed(stored)
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints"
+                " (thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id,
+                    checkpoint_ns,
+                    checkpoint["id"],
+                    config["configurable"].get("checkpoint_id"),
+                    type_,
+                    data,
+                    json.dumps(get_checkpoint_metadata(config, metadata), default=str),
+                ),
+            )
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        conn = self._connect()
+        with conn:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                verb = "INSERT OR IGNORE" if write_idx >= 0 else "INSERT OR REPLACE"
+                type_, blob, hashes = self._pack(conn, value) if channel == self.messages_channel else (
+                    *self.serde.dumps_typed(value), None
+                )
+                conn.execute(
+                    f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel,"
+                    " type, blob, task_path, payload_hashes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, blob, task_path, hashes),
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete a thread's checkpoints, writes and message log (payloads: :meth:`prune_payloads`)."""
+        conn = self._connect()
+        with conn:
+            for table in ("checkpoints", "blobs", "messages", "writes"):
+                conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def prune_payloads(self) -> int:
+        """Delete payloads no message or pending write refers to; return how many."""
+        conn = self._connect()
+        with conn:
+            return conn.execute(
+                "DELETE FROM payloads WHERE hash NOT IN (SELECT payload_hash FROM messages WHERE payload_hash IS NOT NULL)"
+                " AND hash NOT IN (SELECT value FROM writes, json_each(writes.payload_hashes)"
+                " WHERE writes.payload_hashes IS NOT NULL AND value IS NOT NULL)"
+            ).rowcount
+
+    def stats(self) -> dict[str, Any]:
+        """Row counts and on-disk size (database plus WAL) in bytes."""
+        conn = self._connect()
+        counts = {
+            table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("checkpoints", "blobs", "messages", "payloads", "writes")
+        }
+        size = sum(os.path.getsize(p) for p in (self.path, f"{self.path}-wal") if os.path.exists(p))
+        return {**counts, "bytes": size}
+
+    # -- async: the SQLite calls run in a worker thread --------------------------
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_saver: Optional[SQLiteSessionSaver] = None
+_saver_lock = threading.Lock()
+
+
+def get_session_saver() -> Optional[SQLiteSessionSaver]:
+    """Return the process-wide session checkpointer, or ``None`` when sessions are off.
+
+    Set ``SESSION_DB_PATH`` to persist sessions (callers must then pass a
+    ``thread_id``) and ``SESSION_WINDOW`` to change how many messages are
+    loaded per turn (``0`` loads all of them).
+    """
+    global _saver
+    path = os.environ.get("SESSION_DB_PATH")
+    if not path:
+        return None
+    if _saver is None:
+        with _saver_lock:
+            if _saver is None:
+                window = int(os.environ.get("SESSION_WINDOW", DEFAULT_WINDOW))
+                _saver = SQLiteSessionSaver(path, window=window or None)
+    return _saver
@@ -0,0 +1,130 @@
+"""Coalesce identical upstream calls that are in flight at the same time.
+
+During bursts many sessions ask the Knowledge Base the same query, or
+DynamoDB for the same ids, within the same second. A :class:`SingleFlight`
+runs only the first call for a key (the leader); callers that arrive with
+the same key while it is running wait for it and receive the same result,
+or the same exception. Nothing is cached: once the leader finishes, the next
+call for the key goes upstream again (caching is ``retrieval_cache``'s job).
+
+Leaders and followers can be threads (:meth:`SingleFlight.do`, which is how
+the synchronous tools run under ``graph.ainvoke``) or coroutines
+(:meth:`SingleFlight.ado`), and both kinds share one table of in-flight
+calls, so a coroutine can wait on a call led by a thread and vice versa.
+
+:meth:`SingleFlight.stats` reports how many calls were served by another
+caller's upstream request (``coalescing_ratio``). Set ``SINGLEFLIGHT=0`` to
+send every call upstream.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+import tracing
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Table of in-flight calls keyed by request.
+
+    Args:
+        name: Label for logs and stats.
+        enabled: With ``False`` every call goes upstream (for comparisons).
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self.calls = 0
+        self.executions = 0
+        self._in_flight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        """Return the call for ``key`` and whether the caller leads it."""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                return future, False
+            future = self._in_flight[key] = Future()
+            self.executions += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future) -> None:
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def do(self, key: Hashable, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Return ``fn(*args, **kwargs)``, sharing the call with concurrent callers of ``key``."""
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        future, leader = self._join(key)
+        if not leader:
+            tracing.annotate(coalesced=True)
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key, future)
+
+    async def ado(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Return ``await fn(*args, **kwargs)``, sharing the call with concurrent callers of ``key``."""
+        if not self.enabled:
+            return await fn(*args, **kwargs)
+        future, leader = self._join(key)
+        if not leader:
+            tracing.annotate(coalesced=True)
+            # Cancelling a follower must not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._finish(key, future)
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    def stats(self) -> dict[str, Any]:
+        """Return calls, upstream executions, coalesced calls and the coalescing ratio."""
+        with self._lock:
+            calls, executions = self.calls, self.executions
+        coalesced = calls - executions
+        return {
+            "calls": calls,
+            "executions": executions,
+            "coalesced": coalesced,
+            "coalescing_ratio": coalesced / calls if calls else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.calls = 0
+            self.executions = 0
+
+
+_enabled = os.environ.get("SINGLEFLIGHT", "1") != "0"
+
+kb_flight = SingleFlight("kb", enabled=_enabled)
+"""Knowledge Base retrievals, keyed by normalized query."""
+
+dynamo_flight = SingleFlight("dynamo", enabled=_enabled)
+"""DynamoDB ``BatchGetItem`` lookups, keyed by table and set of ids."""
@@ -0,0 +1,214 @@
+"""Columnar index of the numeric film specifications for range queries.
+
+Each row of ``Dimensiones Estándar.Tabla`` describes one film code with
+text values such as ``'Espesor': '12.5'``, ``'Ancho': '400 a 2,000'``,
+``'Núcleo': '3" y 6"'`` and a ``'Largo y Peso'`` table per roll diameter.
+:class:`SpecIndex` parses them once into one NumPy ``float64`` pair of
+arrays (low, high) per property, in a single unit per property
+(:data:`PROPERTIES`), so a query such as "espesor between 20 and 30 µm and
+gramaje below 25 g/m²" is a couple of vectorized comparisons instead of
+sending every item to the model.
+
+* Single values have ``low == high``; ranges and lists (``'400 a 2,000'``,
+  ``'3" y 6"'``) keep their minimum and maximum, and the per-diameter
+  ``Largo`` / ``Peso`` values their extremes.
+* A row matches a ``(minimum, maximum)`` constraint when its interval
+  overlaps it; a row without the property never matches a constraint on it
+  (missing values are ``NaN``).
+
+The catalog snapshot builds its index at load time; without the catalog,
+:func:`get_spec_index` builds one per table from the projected scan shared
+with the code index (:func:`dynamo.get_code_scan`), and rebuilds it when
+that scan is reloaded.
+"""
+
+import math
+import re
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+from dynamo import CodeScan, get_code_scan, scan_code_attributes
+
+NUMBER = re.compile(r"\d+(?:,\d{3})*(?:[.,]\d+)?")
+
+
+@dataclass(frozen=True)
+class Property:
+    """A filterable property: where it comes from and its canonical unit."""
+
+    column: str
+    """Column of ``Dimensiones Estándar.Tabla``."""
+    unit: str
+    part: Optional[str] = None
+    """Key inside each ``Largo y Peso`` diameter (``"Largo"`` / ``"Peso"``)."""
+
+
+PROPERTIES: dict[str, Property] = {
+    "espesor": Property("Espesor", "µm"),
+    "gramaje": Property("Gramaje", "g/m²"),
+    "ancho": Property("Ancho", "mm"),
+    "nucleo": Property("Núcleo", "pulg"),
+    "largo": Property("Largo y Peso", "m", part="Largo"),
+    "peso": Property("Largo y Peso", "kg/cm", part="Peso"),
+}
+"""Property name -> source column and unit of the indexed values."""
+
+UNIT_FACTORS: dict[str, tuple[tuple[str, float], ...]] = {
+    "espesor": (("mil", 25.4), ("mm", 1000.0)),
+    "gramaje": (),
+    "ancho": (("cm", 10.0), ('"', 25.4), ("pulg", 25.4)),
+    "nucleo": (("mm", 1 / 25.4),),
+    "largo": (("km", 1000.0),),
+    "peso": (("kg/cm", 1.0), ("kg/m", 0.01), ("g/cm", 0.001)),
+}
+"""Per property, ``(marker, factor)`` pairs tried in order: the first marker
+found in the text converts its numbers to the canonical unit."""
+
+
+def parse_number(text: str) -> float:
+    """``'18,100'`` -> 18100.0, ``'12,5'`` -> 12.5 (a comma before three digits groups thousands)."""
+    if re.fullmatch(r"\d+(,\d{3})+(\.\d+)?", text):
+        return float(text.replace(",", ""))
+    return float(text.replace(",", "."))
+
+
+def parse_values(name: str, value: Any) -> list[float]:
+    """Return every number in ``value`` converted to the unit of property ``name``."""
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return [float(value)]
+    if not isinstance(value, str):
+        return []
+    return list(_parse_text(name, value))
+
+
+@lru_cache(maxsize=4096)
+def _parse_text(name: str, value: str) -> tuple[float, ...]:
+    # The same texts ('400 a 2,000', '3" y 6"') repeat on every row of a family
+    text = value.lower()
+    factor = 1.0
+    for marker, marker_factor in UNIT_FACTORS[name]:
+        if marker in text:
+            factor = marker_factor
+            break
+    return tuple(parse_number(number) * factor for number in NUMBER.findall(text))
+
+
+def row_values(name: str, row: dict) -> list[float]:
+    """Return the values of property ``name`` in one ``Tabla`` row."""
+    prop = PROPERTIES[name]
+    value = row.get(prop.column)
+    if prop.part is None:
+        return parse_values(name, value)
+    if not isinstance(value, dict):
+        return []
+    values: list[float] = []
+    for data in value.values():
+        if isinstance(data, dict):
+            values.extend(parse_values(name, data.get(prop.part)))
+    return values
+
+
+class SpecIndex:
+    """Parsed specification rows (one per film code) as columnar arrays."""
+
+    def __init__(self, ids: list[str], codes: list[str], low: dict[str, np.ndarray], high: dict[str, np.ndarray]):
+        self.ids = np.array(ids, dtype=object)
+        self.codes = np.array(codes, dtype=object)
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def from_items(cls, items: Iterable[dict]) -> "SpecIndex":
+        ids: list[str] = []
+        codes: list[str] = []
+        columns: dict[str, list[tuple[float, float]]] = {name: [] for name in PROPERTIES}
+        for item in items:
+            dimensions = item.get("Dimensiones Estándar")
+            rows = dimensions.get("Tabla") if isinstance(dimensions, dict) else None
+            for row in rows or []:
+                if not isinstance(row, dict):
+                    continue
+                ids.append(item["id"])
+                codes.append(str(row.get("Código") or item.get("Tipo") or item["id"]))
+                for name in PROPERTIES:
+                    values = row_values(name, row)
+                    columns[name].append((min(values), max(values)) if values else (np.nan, np.nan))
+        low = {name: np.array([pair[0] for pair in pairs], dtype=np.float64) for name, pairs in columns.items()}
+        high = {name: np.array([pair[1] for pair in pairs], dtype=np.float64) for name, pairs in columns.items()}
+        return cls(ids, codes, low, high)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def mask(self, ranges: dict[str, tuple[Optional[float], Optional[float]]]) -> np.ndarray:
+        """Boolean mask of the rows that satisfy every ``name: (minimum, maximum)`` range."""
+        selected = np.ones(len(self.ids), dtype=bool)
+        for name, (minimum, maximum) in ranges.items():
+            if name not in PROPERTIES:
+                raise ValueError(f"unknown property {name!r}; expected one of {tuple(PROPERTIES)}")
+            if minimum is not None:
+                selected &= self.high[name] >= minimum
+            if maximum is not None:
+                selected &= self.low[name] <= maximum
+        return selected
+
+    def query(
+        self,
+        ranges: dict[str, tuple[Optional[float], Optional[float]]],
+        fields: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None,
+    ) -> list[dict[str, Any]]:
+        """Return ``{"id", "code", <field>: value or [low, high]}`` for each matching row.
+
+        ``fields`` defaults to the constrained properties.
+        """
+        ranges = {name: bounds for name, bounds in ranges.items() if bounds != (None, None)}
+        fields = list(fields) if fields is not None else list(ranges)
+        rows = np.flatnonzero(self.mask(ranges))
+        if limit is not None:
+            rows = rows[:limit]
+        # Gather whole columns at once; per-element NumPy indexing is far slower
+        ids = self.ids[rows].tolist()
+        codes = self.codes[rows].tolist()
+        columns = {name: (self.low[name][rows].tolist(), self.high[name][rows].tolist()) for name in fields}
+        results = []
+        for i, item_id in enumerate(ids):
+            result: dict[str, Any] = {"id": item_id, "code": codes[i]}
+            for name, (low, high) in columns.items():
+                if math.isnan(low[i]):
+                    result[name] = None
+                else:
+                    result[name] = low[i] if low[i] == high[i] else [low[i], high[i]]
+            results.append(result)
+        return results
+
+    def match_ids(self, ranges: dict[str, tuple[Optional[float], Optional[float]]]) -> np.ndarray:
+        """Item id of every matching row (an item appears once per matching code)."""
+        return self.ids[self.mask(ranges)]
+
+    def count(self, ranges: dict[str, tuple[Optional[float], Optional[float]]]) -> int:
+        return int(self.mask(ranges).sum())
+
+
+_indexes: dict[str, tuple[CodeScan, SpecIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def build_spec_index(table) -> SpecIndex:
+    """Build an index for ``table`` from a fresh projected scan."""
+    return SpecIndex.from_items(scan_code_attributes(table))
+
+
+def get_spec_index(table, refresh: bool = False) -> SpecIndex:
+    """Return the index for ``table``, rebuilt whenever :func:`dynamo.get_code_scan` reloads."""
+    scan = get_code_scan(table, refresh=refresh)
+    with _indexes_lock:
+        cached = _indexes.get(table.name)
+        if cached is None or cached[0] is not scan:
+            cached = _indexes[table.name] = (scan, SpecIndex.from_items(scan.items))
+        return cached[1]
@@ -0,0 +1,128 @@
+"""Speculative retrieval while the router classifies the query.
+
+Most questions end up on the semantic path, which pays for the router call,
+a second LLM call whose only output is the ``semantic_search_tool`` call, and
+then the retrieval itself. :func:`start` launches ``semantic_search_tool``
+on the raw user message as an asyncio task as soon as the router starts.
+If the route is ``semantic_search`` the finished ``ToolMessage`` is kept in
+the state, ``semantic_search`` emits the matching tool call without calling
+the model and ``semantic_retriever`` returns the stored result; otherwise the
+task is cancelled.
+
+:data:`stats` counts hits and misses and records, per hit, how much of the
+retrieval overlapped with the router call (latency saved on top of the
+skipped LLM call).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+import tracing
+from dynamo import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+TOOL_CALL_PREFIX = "speculative_"
+
+
+class SpeculationStats:
+    """Hit/miss counters and saved latency of speculative retrievals."""
+
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.saved = LatencyRecorder()
+        """Seconds of retrieval that overlapped with the router, per hit."""
+        self._lock = threading.Lock()
+
+    def count(self, outcome: str) -> None:
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    @property
+    def hit_rate(self) -> float:
+        resolved = self.hits + self.misses + self.failures
+        return self.hits / resolved if resolved else 0.0
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+            "hit_rate": round(self.hit_rate, 3),
+            "saved": self.saved.summary(),
+        }
+
+
+stats = SpeculationStats()
+
+
+@dataclass
+class SpeculativeRetrieval:
+    """A running ``semantic_search_tool`` call started before routing."""
+
+    query: str
+    tool_call_id: str
+    task: asyncio.Task
+    started: float
+    finished: Optional[float] = None
+
+    def _mark_finished(self, _task: asyncio.Task) -> None:
+        self.finished = time.perf_counter()
+
+    async def resolve(self, routed_at: float, timeout: Optional[float] = None) -> Optional[ToolMessage]:
+        """Wait for the retrieval the route needs; ``None`` if it failed or timed out."""
+        try:
+            message = await asyncio.wait_for(self.task, timeout)
+        except Exception as e:
+            stats.count("failures")
+            logger.warning("speculative retrieval failed: %s", e)
+            return None
+        if getattr(message, "status", "success") == "error":
+            stats.count("failures")
+            return None
+        stats.count("hits")
+        stats.saved.record(max(0.0, min(self.finished or routed_at, routed_at) - self.started))
+        return message
+
+    def cancel(self) -> None:
+        """Drop the retrieval because the route does not need it.
+
+        A tool already running in an executor thread finishes in the
+        background; its result is discarded.
+        """
+        self.task.cancel()
+        stats.count("misses")
+
+
+async def _traced_call(tool: Any, tool_call: dict, config: RunnableConfig) -> ToolMessage:
+    with tracing.span(tool.name, "tool", speculative=True) as span:
+        message = await tool.ainvoke(tool_call, config)
+        span.set(status=getattr(message, "status", "success"))
+        return message
+
+
+def start(tool: Any, query: str, config: RunnableConfig) -> SpeculativeRetrieval:
+    """Start ``tool`` (``semantic_search_tool``) on ``query`` as an asyncio task."""
+    tool_call_id = f"{TOOL_CALL_PREFIX}{uuid.uuid4().hex}"
+    tool_call = {"name": tool.name, "args": {"query": query}, "id": tool_call_id, "type": "tool_call"}
+    speculative = SpeculativeRetrieval(
+        query=query,
+        tool_call_id=tool_call_id,
+        task=asyncio.ensure_future(_traced_call(tool, tool_call, config)),
+        started=time.perf_counter(),
+    )
+    speculative.task.add_done_callback(speculative._mark_finished)
+    stats.count("started")
+    return speculative
@@ -5,10 +5,10 @@ definitions for agent state, input state, and router classification schema.
 """
 
 from dataclasses import dataclass, field
-from typing import Annotated, Literal, TypedDict
+from typing import Annotated, Literal, Optional, TypedDict
 
 from langchain_core.documents import Document
-from langchain_core.messages import AnyMessage
+from langchain_core.messages import AnyMessage, ToolMessage
 from langgraph.graph import add_messages
 
 
@@ -63,6 +63,12 @@ class Router(TypedDict):
     type: Literal["technical_retriever", "ask_for_more_info", "semantic_search", "respond_to_question_with_same_context"]
 
 
+class ScoredRouter(Router):
+    """Classify user query and rate how sure the classification is, from 0 to 1."""
+
+    confidence: float
+
+
 # This is the primary state of your agent, where you can store any information
 
 
@@ -73,5 +79,13 @@ class AgentState(InputState):
     router: Router = field(default_factory=lambda: Router(type="", logic=""))
     """The router's classification of the user's query."""
 
+    speculative_result: Optional[ToolMessage] = None
+    """Result of the ``semantic_search_tool`` call started while routing.
+
+    Only set for the current turn when speculation is enabled and the query was
+    routed to ``semantic_search``; ``semantic_retriever`` returns it instead of
+    running the tool again.
+    """
+
     # Feel free to add additional attributes to your state as needed.
     # Common examples include retrieved documents, extracted entities, API connections, etc.
@@ -0,0 +1,133 @@
+"""Streaming entry point for the retrieval graph.
+
+``graph.ainvoke`` only returns once the final answer is complete.
+:func:`stream_graph` runs the graph with ``astream_events`` and yields, as
+they happen:
+
+* ``node_start`` / ``node_end`` events for every graph node, and
+* ``token`` events with the text chunks generated by the answering nodes
+  (:data:`STREAMING_NODES`),
+
+followed by a single ``done`` event carrying the request's
+:class:`StreamMetrics`. Time to first token and total latency of every
+request are also kept in :data:`ttft_latency` and :data:`total_latency`.
+
+Chat models stream automatically under ``astream_events``, so the nodes keep
+calling ``model.ainvoke``; ``ChatBedrock`` then uses the Bedrock streaming
+API.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Literal, Optional
+
+from langchain_core.runnables import RunnableConfig
+
+from dynamo import LatencyRecorder
+
+STREAMING_NODES = frozenset({"respond", "ask_for_more_info", "respond_to_question_with_same_context"})
+"""Nodes whose model output is the answer shown to the user."""
+
+ttft_latency = LatencyRecorder()
+"""Time from the start of a request to its first streamed token."""
+
+total_latency = LatencyRecorder()
+"""Time from the start of a request to the end of the graph run."""
+
+
+@dataclass
+class StreamMetrics:
+    """Latency of one streamed request."""
+
+    ttft_ms: Optional[float]
+    """Milliseconds to the first token, ``None`` if no answering node produced text."""
+    total_ms: float
+    tokens: int
+    """Number of streamed chunks."""
+    nodes: list[str] = field(default_factory=list)
+    """Nodes that ran, in order."""
+
+
+@dataclass
+class StreamEvent:
+    """One event of :func:`stream_graph`."""
+
+    type: Literal["node_start", "node_end", "token", "done"]
+    node: Optional[str] = None
+    text: str = ""
+    elapsed_ms: float = 0.0
+    """Milliseconds since the start of the request."""
+    metrics: Optional[StreamMetrics] = None
+    """Only set on the ``done`` event."""
+
+
+def chunk_text(chunk: Any) -> str:
+    """Return the text of a message chunk, skipping tool-use blocks."""
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+            if not isinstance(part, dict) or part.get("type", "text") == "text"
+        )
+    return ""
+
+
+async def stream_graph(
+    inputs: dict[str, Any],
+    config: Optional[RunnableConfig] = None,
+    *,
+    graph: Any = None,
+    streaming_nodes: frozenset[str] = STREAMING_NODES,
+) -> AsyncIterator[StreamEvent]:
+    """Run ``graph`` on ``inputs`` and yield node transitions and answer tokens.
+
+    Args:
+        inputs: Graph input, e.g. ``{"messages": [HumanMessage(...)]}``.
+        config: Run configuration (``configurable`` fields of ``AgentConfiguration``).
+        graph: Compiled graph; defaults to ``graph.graph``.
+        streaming_nodes: Nodes whose model tokens are yielded.
+    """
+    if graph is None:
+        from graph import graph
+
+    node_names = {name for name in graph.nodes if not name.startswith("__")}
+    started = time.perf_counter()
+    first_token: Optional[float] = None
+    tokens = 0
+    nodes: list[str] = []
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 3)
+
+    async for event in graph.astream_events(inputs, config, version="v2"):
+        kind = event["event"]
+        name = event.get("name")
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind in ("on_chain_start", "on_chain_end") and name in node_names and node == name:
+            if kind == "on_chain_start":
+                nodes.append(name)
+            yield StreamEvent(type="node_start" if kind == "on_chain_start" else "node_end", node=name, elapsed_ms=elapsed_ms())
+        elif kind == "on_chat_model_stream" and node in streaming_nodes:
+            text = chunk_text(event["data"].get("chunk"))
+            if not text:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            tokens += 1
+            yield StreamEvent(type="token", node=node, text=text, elapsed_ms=elapsed_ms())
+
+    total = time.perf_counter() - started
+    total_latency.record(total)
+    if first_token is not None:
+        ttft_latency.record(first_token)
+    metrics = StreamMetrics(
+        ttft_ms=round(first_token * 1000, 3) if first_token is not None else None,
+        total_ms=round(total * 1000, 3),
+        tokens=tokens,
+        nodes=nodes,
+    )
+    yield StreamEvent(type="done", elapsed_ms=metrics.total_ms, metrics=metrics)
@@ -1,110 +1,155 @@
+from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
-from typing import Annotated, List
-import boto3
+from typing import Annotated, List, Optional
 import re
-from langchain_aws.retrievers import AmazonKnowledgeBasesRetriever
 import logging
-import decimal
-from boto3.dynamodb.conditions import Key, Attr
+import threading
+import tracing
+from catalog import get_catalog
+from code_resolver import get_code_resolver
+from codec import DEFAULT_FIELDS, get_codec
+from configuration import AgentConfiguration
+from dynamo import (
+    TABLE_NAME,
+    batch_get_items,
+    batch_get_latency,
+    expand_film_codes,
+    get_code_index,
+    get_dynamodb,
+    get_table,
+    is_throttling,
+    resolve_film_ids,
+)
+from local_retriever import get_local_retriever
+from retrieval_cache import get_retrieval_cache, normalize_query
+from singleflight import dynamo_flight, kb_flight
+from spec_index import PROPERTIES, get_spec_index
+
+logger = logging.getLogger(__name__)
+
+# Bloques de 100 ids que se piden en paralelo al hidratar resultados del Knowledge Base
+HYDRATION_MAX_WORKERS = 4
+
+KNOWLEDGE_BASE_ID = "2FHZ6TI9US"
+NUMBER_OF_RESULTS = 5
+
+# Los clientes de AWS se crean en el primer uso, no al importar el módulo
+_kb_retriever = None
+_kb_retriever_lock = threading.Lock()
+
+
+def get_kb_retriever():
+    """Devuelve el retriever del Knowledge Base compartido, creándolo la primera vez."""
+    global _kb_retriever
+    if _kb_retriever is None:
+        with _kb_retriever_lock:
+            if _kb_retriever is None:
+                from langchain_aws.retrievers import AmazonKnowledgeBasesRetriever
+
+                _kb_retriever = AmazonKnowledgeBasesRetriever(
+                    knowledge_base_id=KNOWLEDGE_BASE_ID,
+                    retrieval_config={"vectorSearchConfiguration": {"numberOfResults": NUMBER_OF_RESULTS}},
+                )
+    return _kb_retriever
+
+
+def set_kb_retriever(retriever) -> None:
+    """Usa ``retriever`` en lugar del Knowledge Base (sustitutos locales, benchmarks)."""
+    global _kb_retriever
+    with _kb_retriever_lock:
+        _kb_retriever = retriever
+
+
+def serialize_items(items, configuration: AgentConfiguration, version=None) -> str:
+    """Serializa los items para el modelo con el codec (proyección y formato configurables).
+
+    ``version`` es la versión del catálogo cuando todos los items vienen de él; si no,
+    el codec usa una huella de cada item como clave de caché.
+    """
+    codec = get_codec(
+        configuration.item_fields if configuration.item_fields is not None else DEFAULT_FIELDS,
+        configuration.item_format,
+    )
+    return codec.encode_many(items, version)
 
-# Cliente de DynamoDB
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('obenGroup_films')
 
 @tool
 def specific_search_tool(
     FilmCodes: Annotated[List[str], "códigos o categorías de películas plásticas de ObenGroup para recuperar información. Los ejemplos incluyen ['CC 60', 'CWC 20', 'SCx 30'] para códigos o ['CC', 'CWC', 'SCx'] para los tipos."],
-) -> dict:
+    config: RunnableConfig,
+) -> str:
     """Función de búsqueda específica y obtención de datos de DynamoDB."""
     try:
-        def convert_decimals(obj):
-            """Recursively convert DynamoDB Decimals to int or float for JSON serialization."""
-            if isinstance(obj, list):
-                return [convert_decimals(i) for i in obj]
-            elif isinstance(obj, dict):
-                return {k: convert_decimals(v) for k, v in obj.items()}
-            elif isinstance(obj, set):  # Agregado para manejar los sets
-                return [convert_decimals(i) for i in obj]
-            elif isinstance(obj, decimal.Decimal):
-                return int(obj) if obj % 1 == 0 else float(obj)  # Convert to int if whole number, else to float
-            else:
-                return obj
-        
-        dynamodb_client = boto3.resource('dynamodb', region_name="us-east-1")
-        films_table = dynamodb_client.Table('obenGroup_films')  # Tabla para buscar por características
-
-        logger = logging.getLogger(__name__)
-        logging.basicConfig(level=logging.INFO)
+        configuration = AgentConfiguration.from_runnable_config(config)
 
         if isinstance(FilmCodes, list) and FilmCodes:
-            # Crear un conjunto de códigos originales y sus versiones sin números
-            FilmCodes_extended = set(FilmCodes)
-            for code in FilmCodes:
-                code_without_numbers = re.sub(r'\d+', '', code).strip()
-                if code_without_numbers and code_without_numbers != code:
-                    FilmCodes_extended.add(code_without_numbers)
-
-            # Convertir el conjunto a una lista para evitar problemas de serialización
-            FilmCodes_extended = list(FilmCodes_extended)
-            print("Códigos de película con y sin números, búsqueda específica:")
-            print(FilmCodes_extended)
-
-            # Transformar cada string
-            transformed_FilmCodes = [code.replace(" ", "").lower() for code in FilmCodes_extended]
-
-            # Crear una sola expresión de filtro con in_
-            final_filter_expression = Attr('id').is_in(transformed_FilmCodes)
-
-            # Variable para almacenar los resultados finales
-            all_items = []
-
-            # Paginación de DynamoDB
-            exclusive_start_key = None
-            while True:
-                if exclusive_start_key:
-                    response = films_table.scan(
-                        FilterExpression=final_filter_expression,
-                        ExclusiveStartKey=exclusive_start_key
-                    )
-                else:
-                    response = films_table.scan(
-                        FilterExpression=final_filter_expression
-                    )
-
-                # Agregar los ítems recuperados
-                all_items.extend(response.get('Items', []))
-
-                # Verificar si hay más páginas
-                if 'LastEvaluatedKey' in response:
-                    exclusive_start_key = response['LastEvaluatedKey']
-                else:
-                    break
+            catalog = get_catalog()
+            # Una sola copia del catálogo para corregir, buscar y versionar: si se refresca
+            # a mitad de la llamada, los items y la versión (clave del codec) no coincidirían
+            snapshot = catalog.snapshot() if catalog is not None else None
+            # Corregir códigos con ruido o errores ("SCX-30", "cwc20 micras", "sxc 30")
+            # a su forma en el catálogo antes de buscarlos por coincidencia exacta
+            if snapshot is not None:
+                resolver = snapshot.resolver
+            else:
+                # Los clientes de DynamoDB solo se crean cuando no se sirve desde el catálogo
+                films_table = get_table()
+                resolver = get_code_resolver(films_table)
+            corrected = resolver.correct(FilmCodes)
+            if corrected != FilmCodes:
+                logger.debug("Códigos corregidos: %s -> %s", FilmCodes, corrected)
+                tracing.annotate(corrected_codes=True)
 
-            #print("Todos los resultados recuperados:")
-            #print(all_items)
+            # Crear una lista de códigos originales y sus versiones sin números
+            FilmCodes_extended = expand_film_codes(corrected)
+            logger.debug("Códigos de película con y sin números: %s", FilmCodes_extended)
 
-            # Convertir los valores Decimal a tipos serializables
-            all_items = convert_decimals({"Items": all_items})
+            version = None
+            if snapshot is not None:
+                # Servir desde la copia en memoria del catálogo
+                version = snapshot.version
+                all_items = catalog.find_codes(FilmCodes_extended, snapshot)
+                tracing.annotate(source="catalog")
+            else:
+                # Resolver los códigos a ids con el índice precalculado (código/familia -> ids)
+                # y leer solo esos items con BatchGetItem en lugar de escanear toda la tabla
+                dynamodb_client = get_dynamodb()
+                film_ids = resolve_film_ids(FilmCodes_extended, get_code_index(films_table))
+                # Las consultas idénticas en curso comparten una sola llamada a DynamoDB
+                with tracing.span("batch_get_item", "dynamo"):
+                    all_items = dynamo_flight.do(
+                        (films_table.name, tuple(sorted(film_ids))),
+                        batch_get_items, dynamodb_client, film_ids, table_name=films_table.name,
+                    )
+            tracing.count("items", len(all_items))
 
-            return  all_items.get("Items", []),
+            # Conversión de Decimal y serialización compacta en una sola pasada, con caché por item
+            return serialize_items(all_items, configuration, version)
     
         else:
-            return []
+            return ""
 
     except Exception as e:
+        if is_throttling(e):
+            raise
         logger.error(f"Specific search error: {str(e)}")
         return None    
 
 @tool
 def semantic_search_tool(
     query: Annotated[str, "Frase a buscar en la base de datos semántica, por ejemplo: 'película que se puede usar para empacar o envolver café'."],
-) -> dict:
+    config: RunnableConfig,
+) -> str:
     """Función maestra que integra todo el proceso de búsqueda semántica y obtención de datos de DynamoDB."""
-    # Inicializa el retriever
-    retriever = AmazonKnowledgeBasesRetriever(
-        knowledge_base_id="2FHZ6TI9US",
-        retrieval_config={"vectorSearchConfiguration": {"numberOfResults": 5}},
-    )
+    configuration = AgentConfiguration.from_runnable_config(config)
+    if configuration.retriever_backend == "local":
+        # Índice local (denso + BM25) construido con los mismos documentos de películas
+        retriever = get_local_retriever(configuration.local_retriever_path)
+        retrieval_cache = None
+    else:
+        # Retriever compartido del Knowledge Base
+        retriever = get_kb_retriever()
+        retrieval_cache = get_retrieval_cache()
 
     def extract_uris(documents):
         """Extraer todos los URIs de los documentos y obtener los nombres entre '/' y '.json'."""
@@ -124,41 +169,146 @@ def semantic_search_tool(
         return names
 
     def fetch_items_from_dynamo(ids):
-        """Obtener los items desde DynamoDB utilizando los IDs proporcionados."""
-        items = []
+        """Obtener los items desde DynamoDB utilizando los IDs proporcionados.
+
+        Todos los ids se piden en una sola llamada BatchGetItem (en bloques de 100,
+        concurrentes si hay varios) y se devuelven en el orden de relevancia del retriever,
+        junto con la versión del catálogo si todos salieron de él (clave de caché del codec).
+        """
+        cached_items = {}
+        catalog = get_catalog()
+        snapshot = catalog.snapshot() if catalog is not None else None
+        if snapshot is not None:
+            # Servir desde la copia en memoria; solo los ids que falten van a DynamoDB
+            found, _ = catalog.get_many(ids, snapshot)
+            cached_items = {item["id"]: item for item in found}
 
-        for item_id in ids:
+        missing_ids = [item_id for item_id in ids if item_id not in cached_items]
+        fetched_items = {}
+        if missing_ids:
             try:
-                # Obtener el item de DynamoDB por ID (partition key)
-                response = table.get_item(Key={'id': item_id})
-                item = response.get('Item')  # La respuesta puede no tener un item si no se encuentra
-                if item:
-                    items.append(item)
+                with tracing.span("batch_get_item", "dynamo"):
+                    fetched = dynamo_flight.do(
+                        (TABLE_NAME, tuple(sorted(missing_ids))),
+                        batch_get_items, get_dynamodb(), missing_ids, max_workers=HYDRATION_MAX_WORKERS,
+                    )
+                fetched_items = {item["id"]: item for item in fetched}
             except Exception as e:
-                print(f"Error al obtener el item con id {item_id}: {e}")
+                # El throttling se propaga para que quien llama (run_batch) espere y reintente
+                # en lugar de responder sin los datos
+                if is_throttling(e):
+                    raise
+                logger.error(f"Error al obtener los items con ids {missing_ids}: {e}")
+            logger.debug(
+                "BatchGetItem de %d ids: %s", len(missing_ids), batch_get_latency.summary()
+            )
 
-        return items
+        items_by_id = {**fetched_items, **cached_items}
+        version = snapshot.version if snapshot is not None and not missing_ids else None
+        return [items_by_id[item_id] for item_id in dict.fromkeys(ids) if item_id in items_by_id], version
     
         # 1. Obtener la respuesta del retriever
     
-    response = retriever.invoke(query)
-    
+    # Las consultas repetidas (normalizadas) se sirven desde la caché sin llamar al KB
+    with tracing.span("retrieve", "kb", backend=configuration.retriever_backend) as span:
+        if retrieval_cache is not None:
+            span.set(cache="hit")
+
+            def retrieve(text):
+                span.set(cache="miss")
+                return kb_flight.do(normalize_query(text), retriever.invoke, text)
+
+            response = retrieval_cache.get_or_retrieve(query, retrieve)
+        elif configuration.retriever_backend == "local":
+            span.set(cache="off")
+            response = retriever.invoke(query)
+        else:
+            # Sin caché, las consultas iguales en curso comparten la llamada al KB
+            span.set(cache="off")
+            response = kb_flight.do(normalize_query(query), retriever.invoke, query)
+        span.add("documents", len(response))
+
     # 2. Extraer los IDs de los documentos (que están en los URIs)
     fuente_película_tipo = extract_uris(response)
-    print("fuente_película_tipo: ")
-    print(fuente_película_tipo)
+    logger.debug("Ids de películas del retriever: %s", fuente_película_tipo)
     
     # 3. Obtener los items desde DynamoDB usando los IDs extraídos
-    items_from_dynamo = fetch_items_from_dynamo(fuente_película_tipo)
+    items_from_dynamo, version = fetch_items_from_dynamo(fuente_película_tipo)
     #
     # print("Query: " + query)
     #print("items from dynamo")
     #print(items_from_dynamo)
-    # 4. Retornar un objeto con los items y el contador
-    return items_from_dynamo
+    # 4. Retornar los items serializados en forma compacta para el prompt
+    return serialize_items(items_from_dynamo, configuration, version)
+
+
+def format_spec_rows(rows, total: int) -> str:
+    """Una línea por código: ``SC 20 [id: sc] | espesor: 20 µm | gramaje: 18.1 g/m²``."""
+    if not rows:
+        return "Ningún código cumple todas las condiciones."
+
+    def value(name, v):
+        if v is None:
+            return f"{name}: s/d"
+        if isinstance(v, list):
+            return f"{name}: {v[0]:g} a {v[1]:g} {PROPERTIES[name].unit}"
+        return f"{name}: {v:g} {PROPERTIES[name].unit}"
+
+    lines = [f"{total} códigos cumplen las condiciones" + (f" (se muestran {len(rows)})" if total > len(rows) else "") + ":"]
+    for row in rows:
+        fields = [value(name, v) for name, v in row.items() if name not in ("id", "code")]
+        lines.append(" | ".join([f"{row['code']} [id: {row['id']}]", *fields]))
+    return "\n".join(lines)
+
+
+@tool
+def spec_filter_tool(
+    espesor_min: Annotated[Optional[float], "Espesor mínimo en micras (µm)."] = None,
+    espesor_max: Annotated[Optional[float], "Espesor máximo en micras (µm)."] = None,
+    gramaje_min: Annotated[Optional[float], "Gramaje mínimo en g/m²."] = None,
+    gramaje_max: Annotated[Optional[float], "Gramaje máximo en g/m²."] = None,
+    ancho_min: Annotated[Optional[float], "Ancho mínimo en mm."] = None,
+    ancho_max: Annotated[Optional[float], "Ancho máximo en mm."] = None,
+    nucleo_min: Annotated[Optional[float], "Diámetro de núcleo mínimo en pulgadas."] = None,
+    nucleo_max: Annotated[Optional[float], "Diámetro de núcleo máximo en pulgadas."] = None,
+    largo_min: Annotated[Optional[float], "Largo de rollo mínimo en metros."] = None,
+    largo_max: Annotated[Optional[float], "Largo de rollo máximo en metros."] = None,
+    limit: Annotated[int, "Máximo de códigos a devolver."] = 50,
+    config: RunnableConfig = None,
+) -> str:
+    """Filtra los códigos de película por rangos de especificaciones numéricas (todas las condiciones a la vez).
+
+    Usar para preguntas como "películas entre 20 y 30 micras con gramaje menor a 25": devuelve solo
+    los códigos que cumplen y los valores de las propiedades consultadas, sin el resto de la ficha.
+    """
+    bounds = {
+        "espesor": (espesor_min, espesor_max),
+        "gramaje": (gramaje_min, gramaje_max),
+        "ancho": (ancho_min, ancho_max),
+        "nucleo": (nucleo_min, nucleo_max),
+        "largo": (largo_min, largo_max),
+    }
+    ranges = {name: pair for name, pair in bounds.items() if pair != (None, None)}
+    if not ranges:
+        return "Indica al menos un rango de espesor, gramaje, ancho, núcleo o largo."
+
+    # El índice columnar se construye al cargar el catálogo (o una vez por tabla sin él)
+    catalog = get_catalog()
+    index = catalog.snapshot().specs if catalog is not None else get_spec_index(get_table())
+    total = index.count(ranges)
+    rows = index.query(ranges, limit=max(1, limit))
+    tracing.count("items", len(rows))
+    return format_spec_rows(rows, total)
 
 
 tools = [semantic_search_tool]
-query = "película que sirve para empacar o envolver café"
-tool_output = semantic_search_tool.invoke(query)
-print(tool_output)
+
+technical_tools = [specific_search_tool, spec_filter_tool]
+"""Herramientas de ``technical_retriever``: búsqueda por código y filtro por especificaciones."""
+
+
+if __name__ == "__main__":
+    query = "película que sirve para empacar o envolver café"
+    tool_output = semantic_search_tool.invoke(query)
+    print(tool_output)
+
@@ -0,0 +1,328 @@
+"""Structured spans and metrics for graph nodes, tools and AWS calls.
+
+A span times one unit of work (a node, a tool call, a Knowledge Base
+retrieval, a DynamoDB request) and carries
+
+* ``attributes``: labels such as the route taken or a cache outcome
+  (``route="semantic_search"``, ``cache="hit"``), and
+* ``counters``: amounts such as ``input_tokens``, ``output_tokens`` or
+  ``read_units`` (DynamoDB consumed capacity).
+
+Spans nest through a context variable, so code deep inside a tool can
+annotate the enclosing span with :func:`annotate` / :func:`count` without
+passing it around. Finished spans go to every configured sink:
+
+* :class:`LogSink`: one structured log line per span;
+* :class:`MemorySink`: per ``(kind, name)`` aggregates (calls, errors,
+  latency percentiles, counter totals, attribute outcomes) plus the most
+  recent spans;
+* :class:`OpenMetricsSink`: a :class:`MemorySink` that renders its
+  aggregates in the OpenMetrics text format.
+
+With no sinks configured (the default) :func:`span` returns a shared no-op
+span and nothing is measured or allocated.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Iterable, Optional, Protocol
+
+from dynamo import LatencyRecorder
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+RECENT_SPANS = 256
+
+
+class Span:
+    """One timed unit of work; use it as a context manager."""
+
+    __slots__ = ("tracer", "name", "kind", "attributes", "counters", "started_at", "duration", "error", "parent", "_start", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, kind: str, attributes: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.counters: dict[str, float] = {}
+        self.started_at = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+        self.parent: Optional[Span] = None
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, name: str, amount: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def __enter__(self) -> "Span":
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self._start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self.tracer.export(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "parent": self.parent.name if self.parent is not None else None,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "counters": self.counters,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled."""
+
+    __slots__ = ()
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def add(self, name: str, amount: float = 1) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanSink(Protocol):
+    """Receives every finished span."""
+
+    def export(self, span: Span) -> None: ...
+
+
+class LogSink:
+    """Write one ``logger`` line per span."""
+
+    def __init__(self, log: logging.Logger = logger, level: int = logging.INFO):
+        self.log = log
+        self.level = level
+
+    def export(self, span: Span) -> None:
+        if not self.log.isEnabledFor(self.level):
+            return
+        fields = " ".join(f"{key}={value}" for key, value in {**span.attributes, **span.counters}.items())
+        self.log.log(
+            self.level,
+            "span %s/%s %.1f ms%s%s",
+            span.kind,
+            span.name,
+            span.duration * 1000,
+            f" error={span.error}" if span.error else "",
+            f" {fields}" if fields else "",
+        )
+
+
+class SpanAggregate:
+    """Totals for every span with the same ``(kind, name)``."""
+
+    def __init__(self):
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.latency = LatencyRecorder()
+        self.counters: Counter = Counter()
+        self.outcomes: Counter = Counter()
+        """``(attribute, value)`` -> spans, for string attributes."""
+
+    def add(self, span: Span) -> None:
+        self.latency.record(span.duration)
+        self.total_seconds += span.duration
+        if span.error:
+            self.errors += 1
+        self.counters.update(span.counters)
+        for key, value in span.attributes.items():
+            if isinstance(value, (str, bool)):
+                self.outcomes[(key, str(value))] += 1
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            **self.latency.summary(),
+            "errors": self.errors,
+            "counters": dict(self.counters),
+            "outcomes": {f"{key}={value}": n for (key, value), n in sorted(self.outcomes.items())},
+        }
+
+
+class MemorySink:
+    """Aggregate spans in memory and keep the last ``recent`` ones."""
+
+    def __init__(self, recent: int = RECENT_SPANS):
+        self.aggregates: dict[tuple[str, str], SpanAggregate] = {}
+        self.recent: deque[Span] = deque(maxlen=recent)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            aggregate = self.aggregates.get((span.kind, span.name))
+            if aggregate is None:
+                aggregate = self.aggregates[(span.kind, span.name)] = SpanAggregate()
+            aggregate.add(span)
+            self.recent.append(span)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Return ``{"kind/name": aggregate summary}``."""
+        with self._lock:
+            items = sorted(self.aggregates.items())
+        return {f"{kind}/{name}": aggregate.summary() for (kind, name), aggregate in items}
+
+    def clear(self) -> None:
+        with self._lock:
+            self.aggregates.clear()
+            self.recent.clear()
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+class OpenMetricsSink(MemorySink):
+    """:class:`MemorySink` that renders its aggregates as OpenMetrics text."""
+
+    def __init__(self, prefix: str = "retrieval", recent: int = RECENT_SPANS):
+        super().__init__(recent=recent)
+        self.prefix = prefix
+
+    def render(self) -> str:
+        with self._lock:
+            items = sorted(self.aggregates.items())
+        p = self.prefix
+        lines = [
+            f"# TYPE {p}_span_seconds summary",
+            f"# HELP {p}_span_seconds Duration of graph nodes, tools and AWS calls.",
+        ]
+        counters: dict[str, list[str]] = {}
+        outcomes: list[str] = []
+        errors: list[str] = []
+        for (kind, name), aggregate in items:
+            labels = f'kind="{_label(kind)}",name="{_label(name)}"'
+            for q in QUANTILES:
+                value = aggregate.latency.percentile(q * 100)
+                lines.append(f'{p}_span_seconds{{{labels},quantile="{q}"}} {value or 0.0:.6f}')
+            lines.append(f"{p}_span_seconds_sum{{{labels}}} {aggregate.total_seconds:.6f}")
+            lines.append(f"{p}_span_seconds_count{{{labels}}} {aggregate.latency.calls}")
+            errors.append(f"{p}_span_errors_total{{{labels}}} {aggregate.errors}")
+            for counter, total in sorted(aggregate.counters.items()):
+                counters.setdefault(_metric_name(counter), []).append(f"{{{labels}}} {total:g}")
+            for (key, value), n in sorted(aggregate.outcomes.items()):
+                outcomes.append(f'{p}_span_outcomes_total{{{labels},attribute="{_label(key)}",value="{_label(value)}"}} {n}')
+        lines += [f"# TYPE {p}_span_errors counter", *errors]
+        for counter, samples in sorted(counters.items()):
+            lines.append(f"# TYPE {p}_{counter} counter")
+            lines.extend(f"{p}_{counter}_total{sample}" for sample in samples)
+        lines += [f"# TYPE {p}_span_outcomes counter", *outcomes, "# EOF"]
+        return "\n".join(lines) + "\n"
+
+
+class Tracer:
+    """Create spans and hand finished ones to the sinks."""
+
+    def __init__(self, sinks: Iterable[SpanSink] = ()):
+        self.sinks = list(sinks)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.sinks)
+
+    def span(self, name: str, kind: str, **attributes: Any):
+        if not self.sinks:
+            return NOOP_SPAN
+        return Span(self, name, kind, attributes)
+
+    def export(self, span: Span) -> None:
+        for sink in self.sinks:
+            try:
+                sink.export(span)
+            except Exception as e:
+                logger.warning("span sink %s failed: %s", type(sink).__name__, e)
+
+
+SINKS = {"log": LogSink, "memory": MemorySink, "openmetrics": OpenMetricsSink}
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def configure_tracing(sinks: Iterable[SpanSink] = ()) -> Tracer:
+    """Install a process-wide tracer exporting to ``sinks`` (none disables tracing)."""
+    global _tracer
+    with _tracer_lock:
+        _tracer = Tracer(sinks)
+        return _tracer
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, creating it on first use.
+
+    Set ``TRACE_SINKS`` to a comma-separated list of :data:`SINKS` names
+    (``log,openmetrics``) to enable tracing without code changes.
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                names = [name.strip() for name in os.environ.get("TRACE_SINKS", "").split(",") if name.strip()]
+                _tracer = Tracer(SINKS[name]() for name in names)
+    return _tracer
+
+
+def span(name: str, kind: str, **attributes: Any):
+    """Start a span on the process-wide tracer (a no-op while tracing is disabled)."""
+    tracer = _tracer if _tracer is not None else get_tracer()
+    if not tracer.sinks:
+        return NOOP_SPAN
+    return Span(tracer, name, kind, attributes)
+
+
+def current_span():
+    """Return the innermost active span, or the no-op span."""
+    active = _current_span.get()
+    return active if active is not None else NOOP_SPAN
+
+
+def annotate(**attributes: Any) -> None:
+    """Set attributes on the innermost active span."""
+    active = _current_span.get()
+    if active is not None:
+        active.attributes.update(attributes)
+
+
+def count(name: str, amount: float = 1) -> None:
+    """Add ``amount`` to a counter of the innermost active span."""
+    active = _current_span.get()
+    if active is not None:
+        active.add(name, amount)
+
+
+def find_sink(kind: type) -> Optional[Any]:
+    """Return the first configured sink of type ``kind``, if any."""
+    return next((sink for sink in get_tracer().sinks if isinstance(sink, kind)), None)
@@ -1,8 +1,9 @@
 """Shared functions for state management."""
 
 import hashlib
+import threading
 import uuid
-from typing import Any, Literal, Optional, Union
+from typing import Any, Iterable, Literal, Optional, Sequence, Union
 
 from langchain_core.documents import Document
 
@@ -13,8 +14,68 @@ def _generate_uuid(page_content: str) -> str:
     return str(uuid.UUID(md5_hash))
 
 
+class _UuidIndex:
+    """``uuid -> position`` index shared by the :class:`DocumentList` built on top of each other."""
+
+    __slots__ = ("positions", "length", "lock")
+
+    def __init__(self, documents: Iterable[Document] = ()):
+        self.positions: dict[Optional[str], int] = {}
+        self.length = 0
+        self.lock = threading.Lock()
+        for document in documents:
+            self.add(document.metadata.get("uuid"))
+
+    def add(self, item_id: Optional[str]) -> None:
+        self.positions.setdefault(item_id, self.length)
+        self.length += 1
+
+
+class DocumentList(list):
+    """List of Documents with a persistent uuid index.
+
+    It is a plain ``list`` to everything else (checkpoint serializers,
+    ``isinstance`` checks, equality), but :func:`reduce_docs` answers "is
+    this uuid already here?" from the index instead of rebuilding a set, and
+    a new list only indexes its new documents: the index is shared with the
+    list it was built from, and positions past a list's length are ignored.
+    Treat it as immutable; in-place changes are not indexed.
+    """
+
+    __slots__ = ("_index",)
+
+    def __init__(self, documents: Iterable[Document] = ()):
+        super().__init__(documents)
+        self._index = _UuidIndex(self)
+
+    def __reduce__(self):
+        return (DocumentList, (list(self),))
+
+    def has_uuid(self, item_id: Optional[str]) -> bool:
+        """Whether a document with ``item_id`` is in this list, in O(1)."""
+        position = self._index.positions.get(item_id)
+        return position is not None and position < len(self)
+
+    def appended(self, entries: list[tuple[Optional[str], Document]]) -> "DocumentList":
+        """Return a new list with the ``(uuid, document)`` entries appended."""
+        if not entries:
+            return self
+        index = self._index
+        with index.lock:
+            if index.length != len(self):
+                # Another list was already built on this one (or it was changed in place)
+                index = _UuidIndex(self)
+            for item_id, _ in entries:
+                index.add(item_id)
+        result = DocumentList.__new__(DocumentList)
+        list.__init__(result, self)
+        list.extend(result, (document for _, document in entries))
+        result._index = index
+        return result
+
+
 def reduce_docs(
-    existing: Optional[list[Document]],
+    existing: Optional[Sequence[Document]],
     new: Union[
         list[Document],
         list[dict[str, Any]],
@@ -22,13 +83,17 @@ def reduce_docs(
         str,
         Literal["delete"],
     ],
-) -> list[Document]:
+) -> DocumentList:
     """Reduce and process documents based on the input type.
 
     This function handles various input types and converts them into a sequence of Document objects.
     It can delete existing documents, create new ones from strings or dictionaries, or return the existing documents.
     It also combines existing documents with the new one based on the document ID.
 
+    The result is a :class:`DocumentList`, a ``list`` that checkpointers store
+    as usual: the existing documents are indexed once, and every later call
+    only hashes and indexes its new documents.
+
     Args:
         existing (Optional[Sequence[Document]]): The existing docs in the state, if any.
         new (Union[Sequence[Document], Sequence[dict[str, Any]], Sequence[str], str, Literal["delete"]]):
@@ -36,22 +101,24 @@ def reduce_docs(
             or the literal "delete".
     """
     if new == "delete":
-        return []
+        return DocumentList()
 
-    existing_list = list(existing) if existing else []
+    if isinstance(existing, DocumentList):
+        existing_list = existing
+    else:
+        existing_list = DocumentList(existing or ())
     if isinstance(new, str):
-        return existing_list + [
-            Document(page_content=new, metadata={"uuid": _generate_uuid(new)})
-        ]
+        item_id = _generate_uuid(new)
+        return existing_list.appended([(item_id, Document(page_content=new, metadata={"uuid": item_id}))])
 
-    new_list = []
+    entries: list[tuple[Optional[str], Document]] = []
     if isinstance(new, list):
-        existing_ids = set(doc.metadata.get("uuid") for doc in existing_list)
+        batch_ids: set[str] = set()
         for item in new:
             if isinstance(item, str):
                 item_id = _generate_uuid(item)
-                new_list.append(Document(page_content=item, metadata={"uuid": item_id}))
-                existing_ids.add(item_id)
+                entries.append((item_id, Document(page_content=item, metadata={"uuid": item_id})))
+                batch_ids.add(item_id)
 
             elif isinstance(item, dict):
                 metadata = item.get("metadata", {})
@@ -59,23 +126,23 @@ def reduce_docs(
                     item.get("page_content", "")
                 )
 
-                if item_id not in existing_ids:
-                    new_list.append(
-                        Document(**{**item, "metadata": {**metadata, "uuid": item_id}})
+                if item_id not in batch_ids and not existing_list.has_uuid(item_id):
+                    entries.append(
+                        (item_id, Document(**{**item, "metadata": {**metadata, "uuid": item_id}}))
                     )
-                    existing_ids.add(item_id)
+                    batch_ids.add(item_id)
 
             elif isinstance(item, Document):
                 item_id = item.metadata.get("uuid", "")
                 if not item_id:
                     item_id = _generate_uuid(item.page_content)
-                    new_item = item.copy(deep=True)
-                    new_item.metadata["uuid"] = item_id
+                    # Shallow copy: only the metadata dict is replaced
+                    new_item = item.model_copy(update={"metadata": {**item.metadata, "uuid": item_id}})
                 else:
                     new_item = item
 
-                if item_id not in existing_ids:
-                    new_list.append(new_item)
-                    existing_ids.add(item_id)
+                if item_id not in batch_ids and not existing_list.has_uuid(item_id):
+                    entries.append((item_id, new_item))
+                    batch_ids.add(item_id)
 
-    return existing_list + new_list
+    return existing_list.appended(entries)
@@ -1,41 +1,280 @@
-import boto3
+"""Carga masiva de los JSON de ``./obenGroup_films`` a la tabla de DynamoDB.
+
+La versión anterior hacía un ``put_item`` síncrono por archivo, sin reintentos
+y empezando de cero tras cualquier fallo. Ahora:
+
+* los JSON se parsean en paralelo (procesos) con ``parse_float=Decimal``,
+  porque DynamoDB no acepta ``float``;
+* si varios archivos tienen el mismo ``id`` solo se escribe el último (en
+  orden de nombre), como haría la carga secuencial;
+* los items se escriben en lotes de 25 con ``batch_write_item`` y
+  ``ReturnConsumedCapacity``, reintentando con backoff los ``UnprocessedItems``
+  y los errores de throttling (``ProvisionedThroughputExceededException``...);
+* como mucho ``--writers`` lotes están en vuelo a la vez;
+* cada lote escrito se anota en un checkpoint (``nombre<TAB>mtime``), así que
+  una ejecución interrumpida continúa donde se quedó y los archivos
+  modificados se vuelven a cargar;
+* al final se reporta items/s, capacidad consumida, reintentos y fallos.
+
+Uso:
+    python updateDYnamo.py [--input-dir ./obenGroup_films] [--writers 8] [--checkpoint .load_checkpoint] [--json]
+"""
+
+import argparse
 import json
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 from decimal import Decimal
+from typing import Iterable, Iterator, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'retrieval_graph'))
 
-# Función para convertir Decimal a float en el item (para DynamoDB)
-def decimal_default(obj):
-    if isinstance(obj, Decimal):
-        return float(obj)
-    raise TypeError(f"Tipo no serializable: {obj}")
+from dynamo import is_throttling  # noqa: E402
 
-# Crear el cliente de DynamoDB utilizando la librería de alto nivel
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('obenGroup_films')
+TABLE_NAME = 'obenGroup_films'
+BATCH_WRITE_LIMIT = 25
+MAX_UNPROCESSED_RETRIES = 8
 
 # Directorio donde están los archivos JSON guardados
 input_dir = './obenGroup_films'
 
-# Función para cargar los datos de los archivos JSON a DynamoDB
-def load_items_from_json():
-    for filename in os.listdir(input_dir):
-        file_path = os.path.join(input_dir, filename)
 
-        # Asegurarse de que el archivo es un JSON y no un archivo erróneo
-        if filename.endswith('.json'):
+@dataclass
+class LoadReport:
+    """Resultado de una carga."""
+
+    files: int = 0
+    loaded: int = 0
+    skipped: int = 0
+    """Archivos ya cargados según el checkpoint."""
+    superseded: int = 0
+    """Archivos cuyo ``id`` reaparece en un archivo posterior; solo se escribe el último."""
+    failed: dict[str, str] = field(default_factory=dict)
+    """Archivo -> error (parseo o escritura); se reintentan en la siguiente ejecución."""
+    requests: int = 0
+    retries: int = 0
+    consumed_capacity: float = 0.0
+    seconds: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return round(self.loaded / self.seconds, 1) if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        report = asdict(self)
+        report["seconds"] = round(self.seconds, 3)
+        report["items_per_second"] = self.items_per_second
+        return report
+
+
+def checkpoint_key(path: str) -> str:
+    """Identifica un archivo por nombre y fecha de modificación."""
+    return f"{os.path.basename(path)}\t{os.stat(path).st_mtime_ns}"
+
+
+def read_checkpoint(path: Optional[str]) -> set[str]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def parse_file(path: str) -> tuple[str, Optional[dict], Optional[str]]:
+    """Parsea un JSON; devuelve ``(ruta, item, error)``. Se ejecuta en un proceso aparte."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            item = json.load(f, parse_float=Decimal)
+        if not isinstance(item, dict) or not item.get('id'):
+            return path, None, "el archivo no contiene un item con 'id'"
+        return path, item, None
+    except (OSError, ValueError) as e:
+        return path, None, str(e)
+
+
+def parse_files(paths: list[str], workers: int) -> Iterator[tuple[str, Optional[dict], Optional[str]]]:
+    """Parsea los archivos en paralelo, en el orden de ``paths``."""
+    if workers <= 1 or len(paths) < 2 * BATCH_WRITE_LIMIT:
+        yield from map(parse_file, paths)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(parse_file, paths, chunksize=max(1, len(paths) // (workers * 8)))
+
+
+def latest_by_id(parsed: Iterable[tuple[str, dict]]) -> list[tuple[list[str], dict]]:
+    """Agrupa por ``id``: ``(archivos con ese id, item del último)``, en orden de primera aparición.
+
+    DynamoDB rechaza claves repetidas en un lote y, en lotes concurrentes, no
+    se sabría cuál versión queda guardada.
+    """
+    latest: dict[str, tuple[list[str], dict]] = {}
+    for path, item in parsed:
+        paths, _ = latest.get(item['id'], ([], None))
+        paths.append(path)
+        latest[item['id']] = (paths, item)
+    return list(latest.values())
+
+
+def _batches(entries: list[tuple[list[str], dict]], size: int) -> Iterator[list[tuple[list[str], dict]]]:
+    for start in range(0, len(entries), size):
+        yield entries[start:start + size]
+
+
+class BulkLoader:
+    """Escribe items en lotes con concurrencia acotada y checkpoint.
+
+    Args:
+        dynamodb: Recurso de DynamoDB (``boto3.resource('dynamodb')`` o un sustituto local).
+        table_name: Tabla destino.
+        writers: Lotes de escritura en vuelo a la vez.
+        checkpoint_path: Archivo de checkpoint; ``None`` lo desactiva.
+        max_retries: Reintentos por lote (``UnprocessedItems`` o throttling).
+    """
+
+    def __init__(self, dynamodb, table_name: str = TABLE_NAME, writers: int = 8,
+                 checkpoint_path: Optional[str] = None, max_retries: int = MAX_UNPROCESSED_RETRIES):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.writers = max(1, writers)
+        self.checkpoint_path = checkpoint_path
+        self.max_retries = max_retries
+        self.report = LoadReport()
+        self._lock = threading.Lock()
+
+    def _backoff(self, attempt: int) -> None:
+        with self._lock:
+            self.report.retries += 1
+        time.sleep(min(0.05 * 2 ** attempt, 2.0))
+
+    def _write_batch(self, batch: list[tuple[list[str], dict]]) -> None:
+        request = {self.table_name: [{'PutRequest': {'Item': item}} for _, item in batch]}
+        attempt = 0
+        while request:
+            with self._lock:
+                self.report.requests += 1
+            try:
+                response = self.dynamodb.batch_write_item(RequestItems=request, ReturnConsumedCapacity='TOTAL')
+            except Exception as e:
+                # La tabla pide bajar el ritmo: se reintenta el lote completo con el mismo backoff
+                if not is_throttling(e) or attempt >= self.max_retries:
+                    raise
+                self._backoff(attempt)
+                attempt += 1
+                continue
+            capacity = sum(entry.get('CapacityUnits', 0.0) for entry in response.get('ConsumedCapacity', []))
+            with self._lock:
+                self.report.consumed_capacity += capacity
+            request = response.get('UnprocessedItems') or {}
+            if request:
+                if attempt >= self.max_retries:
+                    raise RuntimeError(f"{len(request[self.table_name])} items sin procesar tras {attempt} reintentos")
+                self._backoff(attempt)
+                attempt += 1
+
+    def _commit(self, batch: list[tuple[list[str], dict]], checkpoint, error: Optional[Exception]) -> None:
+        with self._lock:
+            if error is not None:
+                for paths, _ in batch:
+                    for path in paths:
+                        self.report.failed[os.path.basename(path)] = str(error)
+                return
+            self.report.loaded += len(batch)
+            if checkpoint is not None:
+                checkpoint.write(''.join(checkpoint_key(path) + '\n' for paths, _ in batch for path in paths))
+                checkpoint.flush()
+
+    def load(self, paths: list[str], parse_workers: Optional[int] = None) -> LoadReport:
+        """Carga ``paths`` (archivos JSON), saltando los que ya están en el checkpoint."""
+        start = time.perf_counter()
+        done = read_checkpoint(self.checkpoint_path)
+        pending = [path for path in paths if checkpoint_key(path) not in done]
+        self.report.files = len(paths)
+        self.report.skipped = len(paths) - len(pending)
+
+        def parsed() -> Iterator[tuple[str, dict]]:
+            for path, item, error in parse_files(pending, parse_workers or os.cpu_count() or 1):
+                if error is not None:
+                    with self._lock:
+                        self.report.failed[os.path.basename(path)] = error
+                else:
+                    yield path, item
+
+        checkpoint = open(self.checkpoint_path, 'a', encoding='utf-8') if self.checkpoint_path else None
+        # El semáforo limita los lotes en memoria a los que se están escribiendo
+        in_flight = threading.BoundedSemaphore(self.writers)
+
+        def write(batch):
             try:
-                # Leer el archivo JSON
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    item = json.load(f)
-
-                # Subir el item a DynamoDB
-                response = table.put_item(
-                    Item=item
-                )
-                print(f"Item con id {item.get('id')} cargado en DynamoDB.")
+                self._write_batch(batch)
+                self._commit(batch, checkpoint, None)
             except Exception as e:
-                print(f"Error al cargar el archivo {filename}: {e}")
+                self._commit(batch, checkpoint, e)
+            finally:
+                in_flight.release()
+
+        entries = latest_by_id(parsed())
+        self.report.superseded = sum(len(paths) - 1 for paths, _ in entries)
+        try:
+            with ThreadPoolExecutor(max_workers=self.writers) as pool:
+                for batch in _batches(entries, BATCH_WRITE_LIMIT):
+                    in_flight.acquire()
+                    pool.submit(write, batch)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        self.report.seconds = time.perf_counter() - start
+        return self.report
+
+
+def json_files(directory: str) -> list[str]:
+    """Archivos ``*.json`` de ``directory``, ordenados."""
+    return [
+        os.path.join(directory, filename)
+        for filename in sorted(os.listdir(directory))
+        if filename.endswith('.json')
+    ]
+
+
+# Función para cargar los datos de los archivos JSON a DynamoDB
+def load_items_from_json(directory: str = input_dir, dynamodb=None, table_name: str = TABLE_NAME,
+                         writers: int = 8, checkpoint_path: Optional[str] = None,
+                         parse_workers: Optional[int] = None) -> LoadReport:
+    if dynamodb is None:
+        import boto3
+
+        # Crear el cliente de DynamoDB utilizando la librería de alto nivel
+        dynamodb = boto3.resource('dynamodb')
+    loader = BulkLoader(dynamodb, table_name=table_name, writers=writers, checkpoint_path=checkpoint_path)
+    return loader.load(json_files(directory), parse_workers=parse_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--input-dir', default=input_dir)
+    parser.add_argument('--table', default=TABLE_NAME)
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--parse-workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default=os.path.join(input_dir, '.load_checkpoint'),
+                        help="Archivo de checkpoint; '' para desactivarlo")
+    parser.add_argument('--json', action='store_true', help='Imprimir el reporte como JSON')
+    args = parser.parse_args()
+
+    report = load_items_from_json(args.input_dir, table_name=args.table, writers=args.writers,
+                                  checkpoint_path=args.checkpoint or None, parse_workers=args.parse_workers)
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2, ensure_ascii=False))
+    else:
+        print(f"{report.loaded} items cargados ({report.skipped} ya en el checkpoint) en {report.seconds:.1f} s: "
+              f"{report.items_per_second} items/s, {report.consumed_capacity:g} WCU, "
+              f"{report.requests} peticiones, {report.retries} reintentos")
+        for filename, error in report.failed.items():
+            print(f"Error al cargar el archivo {filename}: {error}")
+    raise SystemExit(1 if report.failed else 0)
+
 
 if __name__ == '__main__':
     # Cargar los items desde los archivos JSON a DynamoDB
-    load_items_from_json()
+    main()